@@ -0,0 +1,92 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from tk_db_columnar import read_table
+from tk_db_repository import connect
+from tk_db_schema import migrate
+
+# Rows inserted per executemany call while building the database
+FILL_BATCH = 100_000
+
+
+def build_database(db_path, students, courses, per_student):
+    """
+    Creates a database with ``students * per_student`` dated enrollments.
+    """
+    conn = connect(db_path)
+    migrate(conn)
+    conn.executemany("INSERT INTO courses (course_id, course_name) VALUES (?, ?)",
+                     ((i, f'Course {i}') for i in range(1, courses + 1)))
+    conn.executemany("INSERT INTO students (student_id, name, age, email) VALUES (?, ?, ?, ?)",
+                     ((i, f'Student {i}', 18 + i % 10, f's{i}@example.com') for i in range(1, students + 1)))
+    rows = ((1 + (i * 7 + k) % courses, i, f'{2015 + i % 10}-09-01')
+            for i in range(1, students + 1) for k in range(per_student))
+    while True:
+        batch = [row for _, row in zip(range(FILL_BATCH), rows)]
+        if not batch:
+            break
+        conn.executemany("INSERT INTO enrollments (course_id, student_id, enrolled_at) VALUES (?, ?, ?)", batch)
+    conn.commit()
+    conn.close()
+
+
+def measure(label, read):
+    """
+    Runs ``read`` twice and prints its wall time and, from the second run, its peak traced memory.
+    Tracing slows every allocation down, so the time comes from the untraced run.
+    """
+    start = time.perf_counter()
+    result = read()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    read()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<34} {elapsed:>7.2f} s  peak {peak / 2 ** 20:>8.1f} MiB  -> {result}")
+
+
+def main():
+    """
+    Compares loading the enrollments with fetchall() into a NumPy array against the chunked columnar reader,
+    and computes the number of enrollments per course both ways.
+    """
+    parser = argparse.ArgumentParser(description="fetchall() versus chunked columnar reads of tk_db enrollments.")
+    parser.add_argument('--students', type=int, default=1_000_000)
+    parser.add_argument('--courses', type=int, default=500)
+    parser.add_argument('--per-student', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, 'columnar.db')
+        build_database(db_path, args.students, args.courses, args.per_student)
+        conn = connect(db_path)
+
+        def fetchall():
+            rows = conn.execute("SELECT course_id, student_id, enrolled_at FROM enrollments").fetchall()
+            course_ids = np.array([row[0] for row in rows], dtype=np.int64)
+            return f"{len(rows):,} rows, busiest course {np.bincount(course_ids).argmax()}"
+
+        def columnar():
+            counts = np.zeros(args.courses + 1, dtype=np.int64)
+            rows = 0
+            for chunk in read_table(conn, "enrollments").chunks():
+                counts += np.bincount(chunk["course_id"], minlength=len(counts))
+                rows += len(chunk)
+            return f"{rows:,} rows, busiest course {counts.argmax()}"
+
+        measure("fetchall() + np.array", fetchall)
+        measure("read_table(...).chunks()", columnar)
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
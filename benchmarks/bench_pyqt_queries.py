@@ -0,0 +1,128 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import insert
+from sqlalchemy.orm import with_polymorphic
+
+import pyqt
+from pyqt import Instructor, Person, Session, Student, fetch_students, instructor_names
+from pyqt_engine import DATABASE_URL_ENV
+from pyqt_records import PAGE_SIZE
+
+# Rows inserted per executemany call while building the database
+FILL_BATCH = 50_000
+
+
+def build_database(persons, instructor_share):
+    """
+    Fills the database with ``persons`` people, one in ``instructor_share`` of them an instructor.
+    """
+    session = Session()
+    for start in range(1, persons + 1, FILL_BATCH):
+        ids = range(start, min(persons, start + FILL_BATCH - 1) + 1)
+        kinds = ['instructor' if i % instructor_share == 0 else 'student' for i in ids]
+        session.execute(insert(Person.__table__), [
+            {'id': i, 'name': f'Person {i}', 'age': 18 + i % 50, 'email': f'p{i}@example.com', 'type': kind}
+            for i, kind in zip(ids, kinds)
+        ])
+        session.execute(insert(Student.__table__), [{'student_id': i} for i, kind in zip(ids, kinds) if kind == 'student'])
+        session.execute(insert(Instructor.__table__), [{'instructor_id': i} for i, kind in zip(ids, kinds) if kind == 'instructor'])
+    session.commit()
+    session.close()
+
+
+def hydrated_lists():
+    # What update_display_table and update_instructor_dropdown used to do
+    session = Session()
+    try:
+        students = [(s.name, s.student_id) for s in session.query(Student).all()]
+        instructors = [i.name for i in session.query(Instructor).all()]
+        return len(students) + len(instructors)
+    finally:
+        session.close()
+
+
+def polymorphic_entities():
+    session = Session()
+    try:
+        people = with_polymorphic(Person, [Student, Instructor])
+        return len(session.query(people).all())
+    finally:
+        session.close()
+
+
+def projected_lists():
+    session = Session()
+    try:
+        rows = [tuple(row) for row in session.query(Person.type, Person.name, Person.id)]
+        return len(rows)
+    finally:
+        session.close()
+
+
+def hydrated_page():
+    session = Session()
+    try:
+        page = session.query(Student).order_by(Student.student_id).limit(PAGE_SIZE).all()
+        return len([(s.name, s.student_id) for s in page])
+    finally:
+        session.close()
+
+
+def projected_page():
+    return len(fetch_students(None, PAGE_SIZE))
+
+
+def dropdown():
+    return len(instructor_names())
+
+
+def measure(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000, rows
+
+
+def main():
+    """
+    Compares loading every person as polymorphic ORM objects with the column-projected tuple queries
+    used by the Records tab and the instructor dropdown.
+    """
+    parser = argparse.ArgumentParser(description="Hydrated ORM objects versus projected tuples in pyqt.")
+    parser.add_argument('--persons', type=int, default=100_000)
+    parser.add_argument('--instructor-share', type=int, default=20, help="one person in N is an instructor")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ[DATABASE_URL_ENV] = 'sqlite:///' + os.path.join(directory, 'school.db')
+        pyqt.get_engine()
+        start = time.perf_counter()
+        build_database(args.persons, args.instructor_share)
+        print(f"built {args.persons:,} persons in {time.perf_counter() - start:.1f} s")
+
+        for label, function in (
+            ('all students + instructors, hydrated', hydrated_lists),
+            ('all persons, with_polymorphic entities', polymorphic_entities),
+            ('all persons, projected tuples', projected_lists),
+            ('instructor dropdown, projected', dropdown),
+            (f'first page of {PAGE_SIZE}, hydrated', hydrated_page),
+            (f'first page of {PAGE_SIZE}, projected', projected_page),
+        ):
+            elapsed, rows = measure(function, args.repeat)
+            print(f"{label:<42} {rows:>8,} rows  {elapsed:>9.1f} ms")
+
+        pyqt.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
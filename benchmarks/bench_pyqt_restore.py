@@ -0,0 +1,116 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import MetaData, insert
+
+import pyqt
+from pyqt import Course, Instructor, Person, Session, Student, registrations
+from pyqt_backup import RESTORE_BATCH_ROWS, read_backup, restore_backup, write_backup
+from pyqt_engine import DATABASE_URL_ENV
+
+# Rows inserted per executemany call while building the database
+FILL_BATCH = 50_000
+
+
+def build_database(students, courses, registration_rows):
+    """
+    Fills the database with ``students`` students, ``courses`` courses taught by one instructor each,
+    and ``registration_rows`` registrations.
+    """
+    session = Session()
+    instructors = range(students + 1, students + courses + 1)
+    session.execute(insert(Person.__table__), [
+        {'id': i, 'name': f'Person {i}', 'age': 18 + i % 50, 'email': f'p{i}@example.com',
+         'type': 'student' if i <= students else 'instructor'}
+        for i in range(1, students + courses + 1)
+    ])
+    session.execute(insert(Student.__table__), [{'student_id': i} for i in range(1, students + 1)])
+    session.execute(insert(Instructor.__table__), [{'instructor_id': i} for i in instructors])
+    session.execute(insert(Course.__table__), [
+        {'course_id': c, 'course_name': f'Course {c}', 'instructor_id': i}
+        for c, i in enumerate(instructors, start=1)
+    ])
+    for start in range(0, registration_rows, FILL_BATCH):
+        session.execute(insert(registrations), [
+            {'student_id': 1 + n % students, 'course_id': 1 + (n // students) % courses}
+            for n in range(start, min(registration_rows, start + FILL_BATCH))
+        ])
+    session.commit()
+    session.close()
+
+
+def restore_row_by_row(connection, metadata, path, limit):
+    """
+    The previous restore: one INSERT per row. Stops after ``limit`` rows and returns how many it inserted.
+    """
+    order = [table.name for table in metadata.sorted_tables]
+    table_names, tables = read_backup(path, order)
+    for table in reversed(metadata.sorted_tables):
+        if table.name in table_names:
+            connection.execute(table.delete())
+    count = 0
+    for table_name, columns, rows in tables:
+        table = metadata.tables[table_name]
+        for row in rows:
+            if count == limit:
+                return count
+            connection.execute(table.insert().values(**dict(zip(columns, row))))
+            count += 1
+    return count
+
+
+def main():
+    """
+    Times restoring a backup with 1M registration rows through ``restore_backup``, against the previous
+    row-by-row restore run on the first rows and extrapolated.
+    """
+    parser = argparse.ArgumentParser(description="Bulk restore versus row-by-row restore of a pyqt backup.")
+    parser.add_argument('--registrations', type=int, default=1_000_000)
+    parser.add_argument('--students', type=int, default=20_000)
+    parser.add_argument('--courses', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=RESTORE_BATCH_ROWS)
+    parser.add_argument('--row-by-row', type=int, default=50_000, help="rows restored by the old method")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ[DATABASE_URL_ENV] = 'sqlite:///' + os.path.join(directory, 'school.db')
+        engine = pyqt.get_engine()
+        start = time.perf_counter()
+        build_database(args.students, args.courses, args.registrations)
+        print(f"built in {time.perf_counter() - start:.1f} s")
+
+        metadata = MetaData()
+        metadata.reflect(bind=engine)
+        path = os.path.join(directory, 'backup.jsonl')
+        with engine.connect() as connection:
+            start = time.perf_counter()
+            rows = write_backup(connection, metadata, path)
+            print(f"backup of {rows:,} rows: {time.perf_counter() - start:.1f} s")
+
+        with engine.connect() as connection:
+            start = time.perf_counter()
+            done = restore_row_by_row(connection, metadata, path, args.row_by_row)
+            elapsed = time.perf_counter() - start
+            connection.rollback()
+        rate = done / elapsed
+        print(f"row by row: {done:,} rows in {elapsed:.1f} s ({rate:,.0f} rows/s, "
+              f"~{rows / rate:.0f} s for the whole backup)")
+
+        with engine.connect() as connection:
+            start = time.perf_counter()
+            restored = restore_backup(connection, metadata, path, batch_size=args.batch_size)
+            connection.commit()
+            elapsed = time.perf_counter() - start
+        print(f"bulk, batches of {args.batch_size:,}: {restored:,} rows in {elapsed:.1f} s "
+              f"({restored / elapsed:,.0f} rows/s)")
+
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tk_db_repository import Repository, connect
+
+SCHEMA = '''
+    CREATE TABLE students (student_id INTEGER PRIMARY KEY, name TEXT, age INTEGER, email TEXT);
+    CREATE TABLE courses (course_id INTEGER PRIMARY KEY, course_name TEXT, instructor_id INTEGER);
+    CREATE TABLE enrollments (course_id INTEGER, student_id INTEGER);
+'''
+
+
+def create_database(path):
+    """
+    Creates an empty database with the tk_db tables and one course to enroll into.
+
+    :param path: Path of the database file.
+    :type path: str
+    :return: None
+    :rtype: None
+    """
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    conn.execute("INSERT INTO courses VALUES (1, 'Benchmarking', NULL)")
+    conn.commit()
+    conn.close()
+
+
+def per_click_commits(path, count):
+    """
+    Adds ``count`` students and enrollments the way the original tk_db handlers did: a new cursor,
+    inline SQL and a commit for every single operation.
+
+    :return: Elapsed seconds.
+    :rtype: float
+    """
+    conn = sqlite3.connect(path)
+    start = time.perf_counter()
+    for i in range(count):
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO students (student_id, name, age, email)
+            VALUES (?, ?, ?, ?)
+        ''', (i, f'Student {i}', 20, f's{i}@example.com'))
+        conn.commit()
+
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO enrollments (course_id, student_id) VALUES (?, ?)", (1, i))
+        conn.commit()
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+
+def repository_unit_of_work(path, count, batch_size, cached_statements):
+    """
+    Adds ``count`` students and enrollments through the repository, committing one unit of work
+    every ``batch_size`` operations.
+
+    :return: Elapsed seconds.
+    :rtype: float
+    """
+    conn = connect(path, cached_statements=cached_statements)
+    repo = Repository(conn)
+    start = time.perf_counter()
+    for batch_start in range(0, count, batch_size):
+        with repo.unit_of_work():
+            for i in range(batch_start, min(batch_start + batch_size, count)):
+                repo.add_student(i, f'Student {i}', 20, f's{i}@example.com')
+                repo.enroll(1, i)
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+
+def repository_executemany(path, count, cached_statements):
+    """
+    Adds ``count`` students and enrollments through the repository's ``executemany`` batch writes
+    in a single unit of work.
+
+    :return: Elapsed seconds.
+    :rtype: float
+    """
+    conn = connect(path, cached_statements=cached_statements)
+    repo = Repository(conn)
+    start = time.perf_counter()
+    with repo.unit_of_work():
+        repo.add_students((i, f'Student {i}', 20, f's{i}@example.com') for i in range(count))
+        repo.enroll_many((1, i) for i in range(count))
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+
+def main():
+    """
+    Runs each strategy on a fresh database file and prints operations per second.
+    """
+    parser = argparse.ArgumentParser(description="Compare per-click commits with repository batched writes.")
+    parser.add_argument('--count', type=int, default=2000, help="students added per strategy")
+    parser.add_argument('--batch-size', type=int, default=500, help="operations per unit of work")
+    parser.add_argument('--cached-statements', type=int, default=128, help="sqlite3 statement cache size")
+    args = parser.parse_args()
+
+    strategies = [
+        ("per-click commits", lambda path: per_click_commits(path, args.count)),
+        (f"unit of work ({args.batch_size}/txn)",
+         lambda path: repository_unit_of_work(path, args.count, args.batch_size, args.cached_statements)),
+        ("executemany, one txn", lambda path: repository_executemany(path, args.count, args.cached_statements)),
+    ]
+
+    with tempfile.TemporaryDirectory() as directory:
+        for index, (label, run) in enumerate(strategies):
+            path = os.path.join(directory, f'bench_{index}.db')
+            create_database(path)
+            elapsed = run(path)
+            # Each student is two writes: the insert and the enrollment
+            print(f"{label:<28} {2 * args.count / elapsed:>12,.0f} writes/s  ({elapsed:.3f}s)")
+
+
+if __name__ == '__main__':
+    main()
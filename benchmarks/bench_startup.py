@@ -0,0 +1,86 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from tk_db_repository import connect
+from tk_db_schema import migrate
+from tk_db_search import install_search
+from tk_db_sync import prune_change_log
+
+# Rows inserted per executemany call while building the large database
+FILL_BATCH = 50_000
+
+
+def build_database(db_path, rows):
+    """
+    Creates a migrated, indexed database with ``rows`` students, so that the timed launches measure
+    a normal start and not the one-off migration of a new file.
+    """
+    conn = connect(db_path)
+    migrate(conn)
+    install_search(conn)
+    for start in range(0, rows, FILL_BATCH):
+        conn.executemany(
+            "INSERT INTO students (student_id, name, age, email) VALUES (?, ?, ?, ?)",
+            ((i, f'Student {i}', 18 + i % 10, f's{i}@example.com') for i in range(start + 1, min(rows, start + FILL_BATCH) + 1)),
+        )
+        conn.commit()
+    prune_change_log(conn)
+    conn.execute("VACUUM")
+    conn.close()
+
+
+def launch(directory):
+    """
+    Starts tk_db in ``directory`` with startup tracing on and returns the milliseconds to the first
+    frame and to the loaded records.
+    """
+    env = dict(os.environ, TK_DB_STARTUP_TRACE='1')
+    output = subprocess.run(
+        [sys.executable, os.path.join(ROOT, 'tk_db.py')],
+        cwd=directory, env=env, capture_output=True, text=True, timeout=600, check=True,
+    ).stdout
+    times = dict(line.split()[:2] for line in output.splitlines() if line.startswith(('first_frame', 'ready')))
+    return float(times['first_frame']), float(times['ready'])
+
+
+def run(label, rows, repeat):
+    """
+    Builds a database with ``rows`` students and prints the median startup times over ``repeat`` launches.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        build_database(os.path.join(directory, 'school_management.db'), rows)
+        built = time.perf_counter() - start
+
+        results = [launch(directory) for _ in range(repeat)]
+
+    first_frame = statistics.median(r[0] for r in results)
+    ready = statistics.median(r[1] for r in results)
+    print(f"{label:<10} {rows:>9,} rows  first frame {first_frame:>8.1f} ms  records loaded {ready:>8.1f} ms  "
+          f"(built in {built:.1f} s)")
+
+
+def main():
+    """
+    Measures time to the first interactive frame and to the first page of records on an empty and on a
+    large database. Needs a display, since it launches the real window.
+    """
+    parser = argparse.ArgumentParser(description="Startup time of tk_db on an empty and a large database.")
+    parser.add_argument('--rows', type=int, default=1_000_000, help="students in the large database")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    run('empty', 0, args.repeat)
+    run('large', args.rows, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
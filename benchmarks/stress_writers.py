@@ -0,0 +1,148 @@
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tk_db_repository import Repository, connect
+from tk_db_schema import migrate
+from tk_db_writer import WriteQueue, retry_on_lock
+
+# Student IDs of different worker processes never collide
+ID_STRIDE = 10_000_000
+
+
+def direct_writer(db_path, worker, duration, busy_timeout, results):
+    """
+    Adds students one committed write at a time, retrying lock errors with backoff, like a tk_db
+    window whose clerk clicks "Submit" as fast as possible.
+    """
+    conn = connect(db_path, timeout=busy_timeout)
+    repo = Repository(conn)
+    lock_errors = 0
+    failures = 0
+    writes = 0
+
+    def count_retry(attempt, error):
+        nonlocal lock_errors
+        lock_errors += 1
+
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        student_id = worker * ID_STRIDE + writes + failures
+        try:
+            retry_on_lock(lambda: repo.add_student(student_id, f'Student {student_id}', 20, 's@example.com'),
+                          conn=conn, on_retry=count_retry)
+            writes += 1
+        except sqlite3.OperationalError:
+            lock_errors += 1
+            failures += 1
+    conn.close()
+    results.put((writes, failures, lock_errors, writes + failures + lock_errors))
+
+
+def queued_writer(db_path, worker, duration, busy_timeout, batch_size, results):
+    """
+    Adds students through a WriteQueue, which commits them in batches from a single writer thread.
+    """
+    write_queue = WriteQueue(db_path, batch_size=batch_size, busy_timeout=busy_timeout)
+    outcome = {"writes": 0, "failures": 0}
+    pending = []
+    submitted = 0
+
+    # Callbacks run on the single writer thread, so the counters need no lock
+    def count(future):
+        outcome["failures" if future.exception() is not None else "writes"] += 1
+
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        student_id = worker * ID_STRIDE + submitted
+        future = write_queue.submit(
+            lambda repo, student_id=student_id: repo.add_student(student_id, f'Student {student_id}', 20, 's@example.com')
+        )
+        future.add_done_callback(count)
+        pending.append(future)
+        submitted += 1
+        # Keep the backlog bounded, like a UI that waits for its writes to finish
+        if len(pending) >= batch_size:
+            pending[0].exception()
+            pending = [future for future in pending if not future.done()]
+
+    write_queue.close()
+    writes, failures = outcome["writes"], outcome["failures"]
+    results.put((writes, failures, write_queue.lock_errors, write_queue.batches + write_queue.lock_errors))
+
+
+def run(mode, processes, duration, busy_timeout, batch_size, wal):
+    """
+    Runs ``processes`` writer processes against one fresh database file and prints the sustained
+    write rate and the share of attempts that hit a lock error.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, 'stress.db')
+        conn = connect(db_path)
+        migrate(conn)
+        if wal:
+            conn.execute("PRAGMA journal_mode = WAL")
+        conn.close()
+
+        results = multiprocessing.Queue()
+        if mode == 'direct':
+            workers = [
+                multiprocessing.Process(target=direct_writer, args=(db_path, i, duration, busy_timeout, results))
+                for i in range(processes)
+            ]
+        else:
+            workers = [
+                multiprocessing.Process(target=queued_writer,
+                                        args=(db_path, i, duration, busy_timeout, batch_size, results))
+                for i in range(processes)
+            ]
+
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        totals = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        writes = sum(t[0] for t in totals)
+        failures = sum(t[1] for t in totals)
+        lock_errors = sum(t[2] for t in totals)
+        attempts = sum(t[3] for t in totals)
+
+        conn = sqlite3.connect(db_path)
+        stored = conn.execute("SELECT COUNT(*) FROM students").fetchone()[0]
+        conn.close()
+
+    label = mode if mode == 'direct' else f'queue ({batch_size}/batch)'
+    print(f"{label:<18} {processes} procs  {writes / elapsed:>10,.0f} writes/s  "
+          f"lock errors {lock_errors} / {attempts} attempts ({100 * lock_errors / max(attempts, 1):.2f}%)  "
+          f"failed {failures}  stored {stored}")
+
+
+def main():
+    """
+    Parses the command line and runs the stress test for the selected modes.
+    """
+    parser = argparse.ArgumentParser(description="Multi-process write stress test for tk_db.")
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=5.0, help="seconds each process keeps writing")
+    parser.add_argument('--busy-timeout', type=float, default=5.0)
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--mode', choices=['direct', 'queue', 'both'], default='both')
+    parser.add_argument('--wal', action='store_true', help="put the database in WAL journal mode")
+    args = parser.parse_args()
+
+    modes = ['direct', 'queue'] if args.mode == 'both' else [args.mode]
+    for mode in modes:
+        run(mode, args.processes, args.duration, args.busy_timeout, args.batch_size, args.wal)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,775 @@
+import datetime
+import gzip
+import json
+import os
+import queue
+import shutil
+import tempfile
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import ExitStack, contextmanager
+from itertools import islice
+
+from sqlalchemy import select, text, tuple_
+
+from pyqt_changes import CHANGE_TABLE, changed_keys, key_columns, last_change_id, last_restore_id, log_restore
+
+# First line of every backup file names the format, so readers can tell it from the old single-document backups
+BACKUP_FORMAT = "school-backup"
+BACKUP_VERSION = 1
+
+# Rows fetched from the server per round trip, and written between flushes of the file
+BATCH_ROWS = 1000
+
+# Rows inserted per executemany call during a restore
+RESTORE_BATCH_ROWS = 5000
+
+# Tables dumped or loaded at once by the parallel backup and restore, each on its own pooled connection
+PARALLEL_WORKERS = min(4, os.cpu_count() or 1)
+
+# Backups whose name ends with this are gzip-compressed
+COMPRESSED_SUFFIX = ".gz"
+
+
+class PartialRestore(Exception):
+    """
+    Raised by ``restore_backup_parallel`` when it fails or is stopped after the tables were emptied. The
+    tables loaded before that stay committed, so the database holds only part of the backup. The error
+    that stopped the restore is the exception's ``__cause__``.
+
+    :param loaded: Names of the tables that were completely loaded.
+    :type loaded: list
+    :param total: Number of tables in the backup.
+    :type total: int
+    :param reason: Why the restore stopped.
+    :type reason: str
+    """
+    def __init__(self, loaded, total, reason):
+        """
+        Initialize a new PartialRestore.
+        """
+        self.loaded = loaded
+        self.total = total
+        super().__init__(
+            f"The parallel restore stopped after loading {len(loaded)} of {total} tables: {reason}. "
+            "The database is only partly restored; restore the backup again."
+        )
+
+
+def open_backup_file(path, mode):
+    """
+    Opens a backup file as text, through gzip if its name ends with ``COMPRESSED_SUFFIX``.
+
+    :param path: Path of the backup file.
+    :type path: str
+    :param mode: "r" or "w".
+    :type mode: str
+    :return: The open file.
+    :rtype: io.TextIOBase
+    """
+    if path.endswith(COMPRESSED_SUFFIX):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _line(value):
+    return json.dumps(value, default=str, separators=(",", ":")) + "\n"
+
+
+def _header(kind, tables, **fields):
+    return dict(
+        {
+            "format": BACKUP_FORMAT,
+            "version": BACKUP_VERSION,
+            "kind": kind,
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "tables": [table.name for table in tables],
+        },
+        **fields,
+    )
+
+
+def _key_filter(columns, keys):
+    if len(columns) == 1:
+        return columns[0].in_([key[0] for key in keys])
+    return tuple_(*columns).in_(keys)
+
+
+def _dump_table(connection, table, f, on_batch):
+    f.write(_line({"table": table.name, "columns": [column.name for column in table.columns]}))
+    count = 0
+    result = connection.execution_options(yield_per=BATCH_ROWS).execute(select(table))
+    for rows in result.partitions():
+        f.writelines(_line(list(row)) for row in rows)
+        f.flush()
+        count += len(rows)
+        if on_batch:
+            on_batch()
+    f.write(_line({"end": table.name, "rows": count}))
+    f.flush()
+    return count
+
+
+def write_backup(connection, metadata, path, on_progress=None):
+    """
+    Streams every table of ``metadata`` into a JSON Lines backup file, one table after another in
+    dependency order. The change log is not backed up; its latest change ID is recorded instead, so
+    that delta backups can follow this one (see ``write_delta_backup``).
+
+    The file starts with a header object naming the format, the kind of backup and the tables. Each table is an object
+    ``{"table": name, "columns": [...]}``, followed by one JSON array per row, followed by
+    ``{"end": name, "rows": count}``. The last line is ``{"complete": true}``. Rows are read with a
+    server-side cursor ``BATCH_ROWS`` at a time and written as they arrive, so memory does not grow
+    with the size of the tables, and each flushed line can be read while the backup is still running.
+
+    :param connection: The connection to back up from.
+    :type connection: sqlalchemy.engine.Connection
+    :param metadata: The tables to back up.
+    :type metadata: sqlalchemy.MetaData
+    :param path: Path of the backup file; a name ending with ``COMPRESSED_SUFFIX`` is gzip-compressed.
+    :type path: str
+    :param on_progress: Called with ``(tables done, total tables)`` after every batch, defaults to none.
+        An exception raised by it stops the backup.
+    :type on_progress: callable, optional
+    :return: The number of rows written.
+    :rtype: int
+    """
+    tables = [table for table in metadata.sorted_tables if table.name != CHANGE_TABLE]
+    change_table = metadata.tables.get(CHANGE_TABLE)
+    # Read before the data: a change made meanwhile may then be both in this backup and in the next
+    # delta, which is harmless, but never in neither
+    change_id = last_change_id(connection, change_table) if change_table is not None else None
+    total = 0
+    try:
+        with open_backup_file(path, "w") as f:
+            f.write(_line(_header("full", tables, change_id=change_id)))
+            for done, table in enumerate(tables):
+                report = (lambda done=done: on_progress(done, len(tables))) if on_progress else None
+                total += _dump_table(connection, table, f, report)
+                if on_progress:
+                    on_progress(done + 1, len(tables))
+
+            f.write(_line({"complete": True}))
+    except BaseException:
+        # A partial backup must not be mistaken for a good one
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return total
+
+
+def write_delta_backup(connection, metadata, path, since, on_progress=None):
+    """
+    Writes a delta backup: the rows changed since change ``since``, usually the ``change_id`` in the
+    header of the previous backup. The changes are taken from the change log.
+
+    The file has the layout of a full backup, with ``"kind": "delta"``, ``since`` and ``change_id`` in
+    the header, and only the tables with changes. Each table's object also lists ``key_columns`` and
+    the ``keys`` of every changed row; its rows are the current versions of those that still exist,
+    so a changed row is replaced and a key without a row was deleted.
+
+    :param connection: The connection to back up from.
+    :type connection: sqlalchemy.engine.Connection
+    :param metadata: The tables of the database, including the change log.
+    :type metadata: sqlalchemy.MetaData
+    :param path: Path of the backup file; a name ending with ``COMPRESSED_SUFFIX`` is gzip-compressed.
+    :type path: str
+    :param since: The change ID the delta starts after.
+    :type since: int
+    :param on_progress: Called with ``(tables done, total tables)`` after every batch, defaults to none.
+        An exception raised by it stops the backup.
+    :type on_progress: callable, optional
+    :raises ValueError: If the database has no change log, or was restored after change ``since``.
+    :return: The number of rows written.
+    :rtype: int
+    """
+    change_table = metadata.tables.get(CHANGE_TABLE)
+    if change_table is None:
+        raise ValueError("The database has no change log for delta backups")
+    if last_restore_id(connection, change_table) > since:
+        raise ValueError(f"The database was restored after change {since}; make a full backup to base deltas on")
+    change_id = last_change_id(connection, change_table)
+    keys = changed_keys(connection, change_table, since, change_id)
+    tables = [table for table in metadata.sorted_tables if table.name in keys]
+
+    total = 0
+    try:
+        with open_backup_file(path, "w") as f:
+            f.write(_line(_header("delta", tables, since=since, change_id=change_id)))
+            for done, table in enumerate(tables):
+                columns = key_columns(table)
+                table_keys = sorted(keys[table.name], key=repr)
+                f.write(_line({
+                    "table": table.name,
+                    "columns": [column.name for column in table.columns],
+                    "key_columns": [column.name for column in columns],
+                    "keys": table_keys,
+                }))
+
+                count = 0
+                for start in range(0, len(table_keys), BATCH_ROWS):
+                    batch = table_keys[start:start + BATCH_ROWS]
+                    rows = connection.execute(select(table).where(_key_filter(columns, batch))).all()
+                    f.writelines(_line(list(row)) for row in rows)
+                    count += len(rows)
+                    if on_progress:
+                        on_progress(done, len(tables))
+
+                f.write(_line({"end": table.name, "rows": count}))
+                f.flush()
+                total += count
+                if on_progress:
+                    on_progress(done + 1, len(tables))
+
+            f.write(_line({"complete": True}))
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return total
+
+
+def _read_rows(f, table_name):
+    for line in f:
+        value = json.loads(line)
+        if isinstance(value, list):
+            yield value
+        elif value.get("end") == table_name:
+            return
+        else:
+            raise ValueError(f"Unexpected line in table {table_name} of the backup")
+    raise ValueError(f"The backup ends inside table {table_name}")
+
+
+def read_backup_header(path):
+    """
+    Reads the header of a backup file.
+
+    :param path: Path of the backup file.
+    :type path: str
+    :return: The header. Old backups, and full backups from before change tracking, have a
+        ``change_id`` of None.
+    :rtype: dict
+    """
+    with open_backup_file(path, "r") as f:
+        first = f.readline()
+    try:
+        header = json.loads(first)
+    except ValueError:
+        header = None
+
+    if not isinstance(header, dict) or header.get("format") != BACKUP_FORMAT:
+        return {"kind": "full", "change_id": None}
+    if header.get("version") != BACKUP_VERSION:
+        raise ValueError(f"Unsupported backup version: {header.get('version')}")
+    return dict({"kind": "full", "change_id": None}, **header)
+
+
+def _read_tables(path):
+    # Yields the object starting each table and a generator of its rows
+    with open_backup_file(path, "r") as f:
+        f.readline()
+        for line in f:
+            value = json.loads(line)
+            if value.get("complete"):
+                return
+            yield value, _read_rows(f, value["table"])
+    raise ValueError("The backup is incomplete")
+
+
+def read_backup(path, order=None):
+    """
+    Reads a backup file written by ``write_backup`` without loading it whole. Old backups, a single
+    JSON object mapping each table name to a list of row objects, are read as well.
+
+    :param path: Path of the backup file.
+    :type path: str
+    :param order: Table names in the order to read the tables of an old backup, which were saved in no
+        particular order, defaults to the order of the file. New backups are always in dependency order.
+    :type order: list, optional
+    :raises ValueError: If the file is not a backup or the backup is incomplete.
+    :return: The table names in the backup, and a generator of ``(table name, column names, rows)``
+        where ``rows`` yields each row as a list. Each table's rows must be consumed before the next
+        table is taken.
+    :rtype: tuple
+    """
+    header = read_backup_header(path)
+    if "format" not in header:
+        return _read_old_backup(path, order)
+    tables = ((table["table"], table["columns"], rows) for table, rows in _read_tables(path))
+    return header["tables"], tables
+
+
+def _read_old_backup(path, order):
+    with open_backup_file(path, "r") as f:
+        backup_data = json.load(f)
+
+    names = list(backup_data)
+    if order is not None:
+        names.sort(key=lambda name: order.index(name) if name in order else len(order))
+
+    def tables():
+        for table_name in names:
+            rows = backup_data[table_name]
+            columns = list(rows[0]) if rows else []
+            yield table_name, columns, ([row.get(column) for column in columns] for row in rows)
+
+    return list(backup_data), tables()
+
+
+@contextmanager
+def foreign_keys_deferred(connection):
+    """
+    Postpones foreign key checks on ``connection`` while the block runs, so tables can be loaded in any
+    order and rows are not checked one by one.
+
+    SQLite defers the checks to the end of the block, where the whole database is checked at once, and
+    PostgreSQL defers them to the commit for constraints declared deferrable. MySQL turns the checks off
+    for the session and back on afterwards; it does not check the loaded rows later.
+
+    :param connection: The connection to restore into, inside a transaction.
+    :type connection: sqlalchemy.engine.Connection
+    :raises ValueError: On SQLite, if the rows loaded in the block break a foreign key.
+    """
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        # Reset automatically when the transaction ends
+        connection.execute(text("PRAGMA defer_foreign_keys = ON"))
+        yield
+        # Check now rather than at COMMIT: a COMMIT refused by SQLite leaves its transaction open while
+        # SQLAlchemy considers it over, so the caller's rollback would not undo the load
+        violation = connection.execute(text("PRAGMA foreign_key_check")).first()
+        if violation is not None:
+            raise ValueError(f"The restored rows of {violation[0]} reference missing rows of {violation[2]}")
+    elif dialect == "mysql":
+        connection.execute(text("SET FOREIGN_KEY_CHECKS = 0"))
+        try:
+            yield
+        finally:
+            connection.execute(text("SET FOREIGN_KEY_CHECKS = 1"))
+    elif dialect == "postgresql":
+        connection.execute(text("SET CONSTRAINTS ALL DEFERRED"))
+        yield
+    else:
+        yield
+
+
+def _insert_rows(connection, table, columns, rows, batch_size, on_batch):
+    insert = table.insert()
+    count = 0
+    while True:
+        batch = [dict(zip(columns, row)) for row in islice(rows, batch_size)]
+        if not batch:
+            return count
+        connection.execute(insert, batch)
+        count += len(batch)
+        if on_batch:
+            on_batch()
+
+
+def _log_restore(connection, metadata):
+    # Restored rows bypass the change log, so deltas must not span the restore
+    change_table = metadata.tables.get(CHANGE_TABLE)
+    if change_table is not None:
+        log_restore(connection, change_table)
+
+
+def _load_full(connection, metadata, path, on_progress, batch_size):
+    order = [table.name for table in metadata.sorted_tables]
+    table_names, tables = read_backup(path, order)
+    for table in reversed(metadata.sorted_tables):
+        if table.name in table_names:
+            connection.execute(table.delete())
+
+    total = 0
+    for done, (table_name, columns, rows) in enumerate(tables):
+        report = (lambda done=done: on_progress(done, len(table_names))) if on_progress else None
+        total += _insert_rows(connection, metadata.tables[table_name], columns, rows, batch_size, report)
+        if on_progress:
+            on_progress(done + 1, len(table_names))
+    return total
+
+
+def _apply_delta(connection, metadata, path, on_progress, batch_size):
+    total = 0
+    header = read_backup_header(path)
+    for done, (value, rows) in enumerate(_read_tables(path)):
+        table = metadata.tables[value["table"]]
+        columns = [table.c[name] for name in value["key_columns"]]
+        keys = value["keys"]
+        # Remove every changed row, then insert the ones that still exist
+        for start in range(0, len(keys), batch_size):
+            connection.execute(table.delete().where(_key_filter(columns, keys[start:start + batch_size])))
+        report = (lambda done=done: on_progress(done, len(header["tables"]))) if on_progress else None
+        total += _insert_rows(connection, table, value["columns"], rows, batch_size, report)
+        if on_progress:
+            on_progress(done + 1, len(header["tables"]))
+    return total
+
+
+def restore_backup(connection, metadata, path, on_progress=None, batch_size=RESTORE_BATCH_ROWS):
+    """
+    Replaces the contents of the tables in a backup with the backup's rows. The tables are emptied in
+    reverse dependency order and then filled in dependency order, ``batch_size`` rows per executemany
+    call, with foreign key checks deferred (see ``foreign_keys_deferred``). Everything happens in the
+    connection's transaction, which the caller commits or rolls back. The restore is recorded in the
+    change log, so the next delta backup has to follow a full backup made after it.
+
+    :param connection: The connection to restore into, inside a transaction.
+    :type connection: sqlalchemy.engine.Connection
+    :param metadata: The tables of the database.
+    :type metadata: sqlalchemy.MetaData
+    :param path: Path of the backup file.
+    :type path: str
+    :param on_progress: Called with ``(tables done, total tables)`` after every batch, defaults to none.
+        An exception raised by it stops the restore.
+    :type on_progress: callable, optional
+    :param batch_size: Rows inserted per executemany call, defaults to ``RESTORE_BATCH_ROWS``.
+    :type batch_size: int, optional
+    :raises ValueError: If the file is not a complete backup, or on SQLite if its rows break a foreign key.
+    :raises KeyError: If the backup has a table the database does not.
+    :return: The number of rows restored.
+    :rtype: int
+    """
+    with foreign_keys_deferred(connection):
+        total = _load_full(connection, metadata, path, on_progress, batch_size)
+    _log_restore(connection, metadata)
+    return total
+
+
+def restore_backups(connection, metadata, paths, on_progress=None, batch_size=RESTORE_BATCH_ROWS):
+    """
+    Restores a full backup and then replays delta backups on top of it, in order of change ID, all in
+    the connection's transaction. Deltas may overlap, since replaying a change twice has no further
+    effect, but must not leave a gap. As with ``restore_backup``, the restore is recorded in the change log.
+
+    :param connection: The connection to restore into, inside a transaction.
+    :type connection: sqlalchemy.engine.Connection
+    :param metadata: The tables of the database.
+    :type metadata: sqlalchemy.MetaData
+    :param paths: Paths of one full backup and any number of delta backups, in any order.
+    :type paths: list
+    :param on_progress: Called with ``(files done, total files)`` after every batch, defaults to none.
+        An exception raised by it stops the restore.
+    :type on_progress: callable, optional
+    :param batch_size: Rows inserted or deleted per statement, defaults to ``RESTORE_BATCH_ROWS``.
+    :type batch_size: int, optional
+    :raises ValueError: If there is not exactly one full backup, the deltas do not continue it without a
+        gap, a file is not a complete backup, or on SQLite if the rows break a foreign key.
+    :raises KeyError: If a backup has a table the database does not.
+    :return: The number of rows restored.
+    :rtype: int
+    """
+    headers = [(read_backup_header(path), path) for path in paths]
+    fulls = [path for header, path in headers if header["kind"] == "full"]
+    if len(fulls) != 1:
+        raise ValueError("Select exactly one full backup, and any delta backups that follow it")
+    deltas = sorted((header["change_id"], header["since"], path) for header, path in headers if header["kind"] == "delta")
+
+    applied = read_backup_header(fulls[0])["change_id"]
+    for change_id, since, path in deltas:
+        if applied is None:
+            raise ValueError("The full backup was made without change tracking; deltas cannot follow it")
+        if since > applied:
+            raise ValueError(f"{path} starts after change {since}, but the backups before it end at change {applied}")
+        applied = max(applied, change_id)
+
+    total = 0
+    with foreign_keys_deferred(connection):
+        for done, (load, path) in enumerate([(_load_full, fulls[0])] + [(_apply_delta, path) for _, _, path in deltas]):
+            report = (lambda _, __, done=done: on_progress(done, len(paths))) if on_progress else None
+            total += load(connection, metadata, path, report, batch_size)
+            if on_progress:
+                on_progress(done + 1, len(paths))
+    _log_restore(connection, metadata)
+    return total
+
+
+def _begin_snapshot_sqlite(coordinator, connections):
+    # While the coordinator holds the write lock no change can commit, so every reader starts from the
+    # same state; once a reader has read, its view stays fixed (WAL) or blocks writers (rollback journal)
+    coordinator.exec_driver_sql("BEGIN IMMEDIATE")
+    for connection in connections:
+        connection.exec_driver_sql("BEGIN")
+        connection.exec_driver_sql("SELECT COUNT(*) FROM sqlite_master").all()
+    coordinator.exec_driver_sql("ROLLBACK")
+
+
+def _begin_snapshot_mysql(coordinator, connections):
+    # As mysqldump does; needs the RELOAD privilege
+    coordinator.exec_driver_sql("FLUSH TABLES WITH READ LOCK")
+    try:
+        for connection in connections:
+            connection.exec_driver_sql("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+    finally:
+        coordinator.exec_driver_sql("UNLOCK TABLES")
+
+
+def _begin_snapshot_postgresql(coordinator, connections):
+    coordinator.exec_driver_sql("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+    snapshot = coordinator.exec_driver_sql("SELECT pg_export_snapshot()").scalar()
+    for connection in connections:
+        connection.exec_driver_sql("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        connection.exec_driver_sql("SET TRANSACTION SNAPSHOT %(snapshot)s", {"snapshot": snapshot})
+
+
+@contextmanager
+def snapshot_connections(engine, count):
+    """
+    Opens ``count`` pooled connections that all read the same consistent state of the database, so
+    tables dumped on different connections fit together.
+
+    SQLite starts every read transaction while writers are locked out, MySQL holds a global read lock
+    while the transactions start, and PostgreSQL shares one exported snapshot. On other databases the
+    connections are opened without any guarantee.
+
+    :param engine: The engine of the database.
+    :type engine: sqlalchemy.engine.Engine
+    :param count: The number of connections.
+    :type count: int
+    :return: The connections, closed when the block ends.
+    :rtype: list
+    """
+    begin = {
+        "sqlite": _begin_snapshot_sqlite,
+        "mysql": _begin_snapshot_mysql,
+        "postgresql": _begin_snapshot_postgresql,
+    }.get(engine.dialect.name)
+    with ExitStack() as stack:
+        connections = [stack.enter_context(engine.connect()) for _ in range(count)]
+        if begin is not None:
+            if engine.dialect.name == "postgresql":
+                # The exporting transaction must stay open while the snapshot is in use
+                begin(connections[0], connections[1:])
+            else:
+                with engine.connect() as coordinator:
+                    begin(coordinator, connections)
+        yield connections
+
+
+def _parallel(engine):
+    # An in-memory SQLite database has a single connection, so it cannot be read or written in parallel
+    return not (engine.dialect.name == "sqlite" and engine.url.database in (None, "", ":memory:"))
+
+
+def _parallel_writers(engine):
+    # SQLite allows only one writer at a time, so loading tables on several connections only queues them
+    return engine.dialect.name != "sqlite"
+
+
+def write_backup_parallel(engine, metadata, path, workers=PARALLEL_WORKERS, on_progress=None):
+    """
+    Writes the same backup as ``write_backup``, dumping up to ``workers`` tables at once, each on its own
+    pooled connection, all reading one consistent snapshot (see ``snapshot_connections``).
+
+    Each table is written to a part file next to the backup; the parts are then joined in dependency
+    order. Compressed parts are separate gzip members, which together form one valid gzip file.
+
+    :param engine: The engine of the database.
+    :type engine: sqlalchemy.engine.Engine
+    :param metadata: The tables to back up.
+    :type metadata: sqlalchemy.MetaData
+    :param path: Path of the backup file; a name ending with ``COMPRESSED_SUFFIX`` is gzip-compressed.
+    :type path: str
+    :param workers: Tables dumped at once, defaults to ``PARALLEL_WORKERS``.
+    :type workers: int, optional
+    :param on_progress: Called with ``(tables done, total tables)`` after every batch, from the worker
+        threads, defaults to none. An exception raised by it stops the backup.
+    :type on_progress: callable, optional
+    :return: The number of rows written.
+    :rtype: int
+    """
+    tables = [table for table in metadata.sorted_tables if table.name != CHANGE_TABLE]
+    workers = max(1, min(workers, len(tables)))
+    if workers == 1 or not _parallel(engine):
+        with engine.connect() as connection:
+            return write_backup(connection, metadata, path, on_progress)
+
+    change_table = metadata.tables.get(CHANGE_TABLE)
+    suffix = COMPRESSED_SUFFIX if path.endswith(COMPRESSED_SUFFIX) else ""
+    parts = tempfile.mkdtemp(prefix=".backup-", dir=os.path.dirname(os.path.abspath(path)))
+    lock = threading.Lock()
+    finished = [0]
+
+    def report():
+        if on_progress:
+            with lock:
+                done = finished[0]
+            on_progress(done, len(tables))
+
+    def dump(connections, i, table):
+        connection = connections.get()
+        try:
+            with open_backup_file(os.path.join(parts, f"{i + 1}.part{suffix}"), "w") as f:
+                count = _dump_table(connection, table, f, report)
+        finally:
+            connections.put(connection)
+        with lock:
+            finished[0] += 1
+        report()
+        return count
+
+    try:
+        with snapshot_connections(engine, workers) as snapshot:
+            change_id = last_change_id(snapshot[0], change_table) if change_table is not None else None
+            connections = queue.Queue()
+            for connection in snapshot:
+                connections.put(connection)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(dump, connections, i, table) for i, table in enumerate(tables)]
+                try:
+                    total = sum(future.result() for future in futures)
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+
+        with open_backup_file(os.path.join(parts, f"0.part{suffix}"), "w") as f:
+            f.write(_line(_header("full", tables, change_id=change_id)))
+        with open_backup_file(os.path.join(parts, f"{len(tables) + 1}.part{suffix}"), "w") as f:
+            f.write(_line({"complete": True}))
+
+        with open(path, "wb") as backup:
+            for i in range(len(tables) + 2):
+                with open(os.path.join(parts, f"{i}.part{suffix}"), "rb") as part:
+                    shutil.copyfileobj(part, backup)
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    finally:
+        shutil.rmtree(parts, ignore_errors=True)
+    return total
+
+
+def _table_dependencies(metadata, names):
+    # The tables among ``names`` that each table references, itself included for self-references
+    names = set(names)
+    return {
+        name: {key.column.table.name for key in metadata.tables[name].foreign_keys} & names
+        for name in names
+    }
+
+
+def _loadable_in_order(depends):
+    # True when every table can be loaded after the tables it references: no self-references or cycles
+    remaining = dict(depends)
+    while remaining:
+        ready = [name for name, referenced in remaining.items() if not referenced & set(remaining)]
+        if not ready:
+            return False
+        for name in ready:
+            del remaining[name]
+    return True
+
+
+def restore_backup_parallel(engine, metadata, path, workers=PARALLEL_WORKERS, on_progress=None,
+                            batch_size=RESTORE_BATCH_ROWS):
+    """
+    Restores a full backup loading up to ``workers`` tables at once, each on its own pooled connection.
+    A table starts loading once every table it references has been loaded.
+
+    Unlike ``restore_backup`` this is not one transaction: the tables are emptied in one transaction,
+    and then each table is loaded and committed in its own, with foreign key checks deferred on every
+    connection (see ``foreign_keys_deferred``). A restore that fails or is stopped part way leaves the
+    tables loaded so far, and should be run again.
+
+    Loading in dependency order only works when no table references itself and no tables reference each
+    other in a cycle; otherwise rows could reference rows another transaction has not inserted yet. Such
+    schemas, and SQLite, which allows only one writer at a time, are restored by ``restore_backup`` in a
+    single transaction instead.
+
+    :param engine: The engine of the database.
+    :type engine: sqlalchemy.engine.Engine
+    :param metadata: The tables of the database.
+    :type metadata: sqlalchemy.MetaData
+    :param path: Path of the full backup file.
+    :type path: str
+    :param workers: Tables loaded at once, defaults to ``PARALLEL_WORKERS``.
+    :type workers: int, optional
+    :param on_progress: Called with ``(tables done, total tables)`` after every batch, from the worker
+        threads, defaults to none. An exception raised by it stops the restore.
+    :type on_progress: callable, optional
+    :param batch_size: Rows inserted per executemany call, defaults to ``RESTORE_BATCH_ROWS``.
+    :type batch_size: int, optional
+    :raises ValueError: If the file is not a complete full backup.
+    :raises KeyError: If the backup has a table the database does not.
+    :raises PartialRestore: If loading fails or is stopped after the tables were emptied.
+    :return: The number of rows restored.
+    :rtype: int
+    """
+    if read_backup_header(path)["kind"] != "full":
+        raise ValueError("Only a full backup can be restored in parallel")
+    depends = _table_dependencies(metadata, read_backup(path)[0])
+    if workers <= 1 or not _parallel_writers(engine) or not _loadable_in_order(depends):
+        with engine.begin() as connection:
+            return restore_backup(connection, metadata, path, on_progress, batch_size)
+
+    order = [table.name for table in metadata.sorted_tables]
+    parts = tempfile.mkdtemp(prefix=".restore-")
+    try:
+        # Split the backup into one plain file per table, so that tables can be read independently
+        table_names, tables = read_backup(path, order)
+        columns = {}
+        for table_name, table_columns, rows in tables:
+            columns[table_name] = table_columns
+            with open(os.path.join(parts, table_name), "w", encoding="utf-8") as f:
+                f.writelines(_line(row) for row in rows)
+
+        with engine.begin() as connection:
+            with foreign_keys_deferred(connection):
+                for table in reversed(metadata.sorted_tables):
+                    if table.name in table_names:
+                        connection.execute(table.delete())
+            _log_restore(connection, metadata)
+
+        # From here on a failure leaves committed changes behind, so it is reported as a partial restore
+        lock = threading.Lock()
+        loaded = set()
+
+        def report():
+            if on_progress:
+                with lock:
+                    done = len(loaded)
+                on_progress(done, len(columns))
+
+        def load(name):
+            with open(os.path.join(parts, name), encoding="utf-8") as f:
+                rows = (json.loads(line) for line in f)
+                with engine.begin() as connection:
+                    with foreign_keys_deferred(connection):
+                        count = _insert_rows(
+                            connection, metadata.tables[name], columns[name], rows, batch_size, report,
+                        )
+            # Committed, even if the restore is stopped from here on
+            with lock:
+                loaded.add(name)
+            report()
+            return count
+
+        total = 0
+        waiting = list(columns)
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                running = {}
+                while waiting or running:
+                    with lock:
+                        ready = [name for name in waiting if depends[name] <= loaded]
+                    for name in ready:
+                        waiting.remove(name)
+                        running[executor.submit(load, name)] = name
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        running.pop(future)
+                        try:
+                            total += future.result()
+                        except BaseException:
+                            for other in running:
+                                other.cancel()
+                            raise
+        except Exception as e:
+            # Leaving the executor waited for the loads already running, so ``loaded`` is final
+            raise PartialRestore(sorted(loaded), len(columns), str(e) or "it was cancelled") from e
+        return total
+    finally:
+        shutil.rmtree(parts, ignore_errors=True)
@@ -0,0 +1,186 @@
+import json
+
+from sqlalchemy import event, func, insert, inspect, select
+
+# Table logging which rows were changed, read by delta backups
+CHANGE_TABLE = "changes"
+
+# Table name of the change log entry written by a restore, which changes rows without logging them
+RESTORE_MARKER = "*restore*"
+
+
+def key_columns(table):
+    """
+    Returns the columns identifying a row of ``table``: its primary key, or every column for a table
+    without one, such as an association table.
+
+    :param table: The table.
+    :type table: sqlalchemy.Table
+    :return: The key columns.
+    :rtype: list
+    """
+    return list(table.primary_key.columns) or list(table.columns)
+
+
+def _association_keys(state, relationship, related):
+    # Rebuilds the association table row linking the object to each related object
+    table = relationship.secondary
+    obj = state.obj()
+    for other in related:
+        values = {}
+        for local, column in relationship.synchronize_pairs:
+            values[column.name] = getattr(obj, relationship.parent.get_property_by_column(local).key)
+        for remote, column in relationship.secondary_synchronize_pairs:
+            values[column.name] = getattr(other, relationship.mapper.get_property_by_column(remote).key)
+        yield table.name, tuple(values.get(column.name) for column in key_columns(table))
+
+
+def changed_rows(session):
+    """
+    Lists the rows a flush of ``session`` inserts, updates or deletes, including the rows of association
+    tables behind many-to-many relationships. Must be called from ``after_flush``, while the session
+    still holds the flushed objects and their history.
+
+    :param session: The session being flushed.
+    :type session: sqlalchemy.orm.Session
+    :return: Pairs of ``(table name, key values)``.
+    :rtype: set
+    """
+    rows = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        state = inspect(obj)
+        mapper = state.mapper
+        if mapper.local_table.name == CHANGE_TABLE:
+            continue
+
+        deleted = obj in session.deleted
+        if deleted or obj in session.new or session.is_modified(obj, include_collections=False):
+            # Joined-table subclasses share the primary key of their base table
+            identity = mapper.primary_key_from_instance(obj)
+            for table in mapper.tables:
+                rows.add((table.name, tuple(identity)))
+
+        for relationship in mapper.relationships:
+            if relationship.secondary is None:
+                continue
+            history = state.attrs[relationship.key].history
+            if deleted:
+                # Deleting the object deletes all of its association rows
+                related = history.sum()
+            else:
+                related = list(history.added) + list(history.deleted)
+            rows.update(_association_keys(state, relationship, related))
+    return rows
+
+
+def install_change_tracking(session_factory, change_table):
+    """
+    Logs every row changed through sessions of ``session_factory`` in ``change_table``, in the same
+    transaction as the change. Changes made with plain SQL are not logged.
+
+    :param session_factory: A ``sessionmaker`` or ``scoped_session``.
+    :type session_factory: sqlalchemy.orm.sessionmaker
+    :param change_table: The change log, with ``change_id``, ``table_name`` and ``row_key`` columns.
+    :type change_table: sqlalchemy.Table
+    :return: None
+    :rtype: None
+    """
+    def log_changes(session, flush_context):
+        rows = changed_rows(session)
+        if rows:
+            session.connection().execute(insert(change_table), [
+                {"table_name": table_name, "row_key": json.dumps(list(key), default=str)}
+                for table_name, key in sorted(rows, key=repr)
+            ])
+
+    event.listen(session_factory, "after_flush", log_changes)
+
+
+def last_change_id(connection, change_table):
+    """
+    :param connection: The connection to read from.
+    :type connection: sqlalchemy.engine.Connection
+    :param change_table: The change log.
+    :type change_table: sqlalchemy.Table
+    :return: The ID of the latest logged change, or 0 if there is none.
+    :rtype: int
+    """
+    return connection.execute(select(func.max(change_table.c.change_id))).scalar() or 0
+
+
+def log_restore(connection, change_table):
+    """
+    Records in the change log that the database was restored. The restored rows are not logged one by
+    one, so no delta backup can span this entry (see ``last_restore_id``).
+
+    :param connection: The connection restoring the database, inside its transaction.
+    :type connection: sqlalchemy.engine.Connection
+    :param change_table: The change log.
+    :type change_table: sqlalchemy.Table
+    :return: None
+    :rtype: None
+    """
+    connection.execute(insert(change_table), {"table_name": RESTORE_MARKER, "row_key": "[]"})
+
+
+def last_restore_id(connection, change_table):
+    """
+    :param connection: The connection to read from.
+    :type connection: sqlalchemy.engine.Connection
+    :param change_table: The change log.
+    :type change_table: sqlalchemy.Table
+    :return: The change ID of the latest restore, or 0 if the database was never restored.
+    :rtype: int
+    """
+    query = select(func.max(change_table.c.change_id)).where(change_table.c.table_name == RESTORE_MARKER)
+    return connection.execute(query).scalar() or 0
+
+
+def changed_keys(connection, change_table, since, until):
+    """
+    Collects the rows changed after one change and up to another.
+
+    :param connection: The connection to read from.
+    :type connection: sqlalchemy.engine.Connection
+    :param change_table: The change log.
+    :type change_table: sqlalchemy.Table
+    :param since: Changes with a higher ID are included.
+    :type since: int
+    :param until: Changes with this ID or lower are included.
+    :type until: int
+    :return: The keys of the changed rows of each table.
+    :rtype: dict
+    """
+    keys = {}
+    query = (
+        select(change_table.c.table_name, change_table.c.row_key)
+        .where(
+            change_table.c.change_id > since,
+            change_table.c.change_id <= until,
+            change_table.c.table_name != RESTORE_MARKER,
+        )
+        .distinct()
+    )
+    for table_name, row_key in connection.execute(query):
+        keys.setdefault(table_name, set()).add(tuple(json.loads(row_key)))
+    return keys
+
+
+def prune_changes(connection, change_table, up_to):
+    """
+    Deletes logged changes up to a change ID. Delta backups since an earlier change are no longer
+    possible afterwards; prune only up to the change ID of a full backup that is kept. Restore entries
+    are kept, so deltas can never span a restore.
+
+    :param connection: The connection, inside a transaction that the caller commits.
+    :type connection: sqlalchemy.engine.Connection
+    :param change_table: The change log.
+    :type change_table: sqlalchemy.Table
+    :param up_to: Changes with this ID or lower are deleted.
+    :type up_to: int
+    :return: The number of deleted changes.
+    :rtype: int
+    """
+    return connection.execute(
+        change_table.delete().where(change_table.c.change_id <= up_to, change_table.c.table_name != RESTORE_MARKER)
+    ).rowcount
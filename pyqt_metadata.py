@@ -0,0 +1,183 @@
+import hashlib
+import os
+import pickle
+import stat
+import tempfile
+import threading
+
+from sqlalchemy import MetaData
+from sqlalchemy.engine import Engine
+
+# Directory holding reflected metadata between runs, one file per database and schema. Loading a
+# cache file runs pickle, so it lives in the user's own cache directory and is checked before use.
+METADATA_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "school_db", "metadata",
+)
+
+# Catalog queries whose combined result changes whenever tables, columns, keys or indexes change
+FINGERPRINT_QUERIES = {
+    "sqlite": (
+        "SELECT type, name, tbl_name, sql FROM sqlite_master ORDER BY type, name",
+    ),
+    "mysql": (
+        "SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE, COLUMN_KEY, COLUMN_DEFAULT, EXTRA "
+        "FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() ORDER BY TABLE_NAME, ORDINAL_POSITION",
+        "SELECT TABLE_NAME, CONSTRAINT_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME "
+        "FROM information_schema.KEY_COLUMN_USAGE WHERE TABLE_SCHEMA = DATABASE() "
+        "ORDER BY TABLE_NAME, CONSTRAINT_NAME, ORDINAL_POSITION",
+        "SELECT TABLE_NAME, INDEX_NAME, NON_UNIQUE, COLUMN_NAME FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX",
+    ),
+    "postgresql": (
+        "SELECT table_name, column_name, data_type, is_nullable, column_default "
+        "FROM information_schema.columns WHERE table_schema = current_schema() "
+        "ORDER BY table_name, ordinal_position",
+        "SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE connamespace = current_schema()::regnamespace ORDER BY 1, 2",
+        "SELECT tablename, indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() ORDER BY 1, 2",
+    ),
+}
+
+# Reflected metadata already loaded by this process, by cache file name
+_loaded = {}
+_lock = threading.Lock()
+
+
+def schema_fingerprint(connection):
+    """
+    Computes a fingerprint of the database schema from a few catalog queries, far cheaper than
+    reflecting every table.
+
+    :param connection: The connection to the database.
+    :type connection: sqlalchemy.engine.Connection
+    :return: A hex digest that changes whenever the schema changes, or None for databases without
+        fingerprint queries.
+    :rtype: str or None
+    """
+    queries = FINGERPRINT_QUERIES.get(connection.dialect.name)
+    if queries is None:
+        return None
+    digest = hashlib.sha256()
+    for query in queries:
+        for row in connection.exec_driver_sql(query):
+            digest.update(repr(tuple(row)).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _reflect(connection):
+    metadata = MetaData()
+    metadata.reflect(bind=connection)
+    return metadata
+
+
+def _is_private(status):
+    # Owned by this user and not writable, or for files readable, by anyone else
+    return status.st_uid == os.getuid() and not status.st_mode & 0o077
+
+
+def _private_dir(cache_dir):
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+    return _is_private(os.stat(cache_dir))
+
+
+def _read_cache(cache_dir, name):
+    # The directory and the file are checked through the descriptors that are then used, so neither
+    # can be swapped, or replaced by a symlink, between the check and the load
+    try:
+        directory = os.open(cache_dir, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW)
+    except OSError:
+        return None
+    try:
+        if not _is_private(os.fstat(directory)):
+            return None
+        try:
+            descriptor = os.open(name, os.O_RDONLY | os.O_NOFOLLOW, dir_fd=directory)
+        except OSError:
+            return None
+    finally:
+        os.close(directory)
+    with os.fdopen(descriptor, "rb") as f:
+        status = os.fstat(f.fileno())
+        if not stat.S_ISREG(status.st_mode) or not _is_private(status):
+            return None
+        return pickle.load(f)
+
+
+def _write_cache(cache_dir, name, metadata, url_key):
+    if not _private_dir(cache_dir):
+        return
+    # mkstemp creates the file readable and writable by its owner only
+    descriptor, temporary = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(descriptor, "wb") as f:
+        pickle.dump(metadata, f)
+    os.replace(temporary, os.path.join(cache_dir, name))
+    # Older schemas of the same database will not be needed again
+    for other in os.listdir(cache_dir):
+        if other.startswith(url_key + "-") and other != name:
+            try:
+                os.remove(os.path.join(cache_dir, other))
+            except OSError:
+                pass
+
+
+def reflected_metadata(bind, cache_dir=METADATA_CACHE_DIR):
+    """
+    Returns the reflected tables of the database, reflecting only when the schema has changed since
+    they were last cached.
+
+    The schema is identified by ``schema_fingerprint``. Reflected metadata is kept in memory for the
+    rest of the process and pickled into ``cache_dir``, keyed by the database URL and the fingerprint,
+    so later runs skip reflection as well. Any change to tables, columns, keys or indexes changes the
+    fingerprint and causes a fresh reflection. The returned metadata is shared and must not be modified.
+
+    Cache files are only read from a directory and files owned by the current user and closed to
+    everyone else; otherwise they are ignored and the schema is reflected. On systems without POSIX
+    file ownership the cache is kept in memory only.
+
+    :param bind: The engine, or a connection to use for the queries.
+    :type bind: sqlalchemy.engine.Engine or sqlalchemy.engine.Connection
+    :param cache_dir: Directory of the cache files, defaults to ``METADATA_CACHE_DIR``; None keeps the
+        cache in memory only.
+    :type cache_dir: str, optional
+    :return: The reflected tables.
+    :rtype: sqlalchemy.MetaData
+    """
+    if not hasattr(os, "getuid"):
+        cache_dir = None
+    if isinstance(bind, Engine):
+        with bind.connect() as connection:
+            return reflected_metadata(connection, cache_dir)
+
+    fingerprint = schema_fingerprint(bind)
+    if fingerprint is None:
+        return _reflect(bind)
+
+    url = bind.engine.url.render_as_string(hide_password=True)
+    url_key = hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+    name = f"{url_key}-{fingerprint[:32]}.pickle"
+
+    with _lock:
+        metadata = _loaded.get(name)
+    if metadata is not None:
+        return metadata
+
+    if cache_dir is not None:
+        try:
+            metadata = _read_cache(cache_dir, name)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            metadata = None
+
+    if metadata is None:
+        metadata = _reflect(bind)
+        if cache_dir is not None:
+            try:
+                _write_cache(cache_dir, name, metadata, url_key)
+            except OSError:
+                # A read-only directory only costs the next run a reflection
+                pass
+
+    with _lock:
+        _loaded[name] = metadata
+    return metadata
@@ -0,0 +1,163 @@
+from bisect import bisect_left
+
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+# Rows loaded per fetchMore call; the view asks for more as the user scrolls
+PAGE_SIZE = 200
+
+HEADERS = ("Type", "Name", "ID")
+
+
+class RecordsModel(QAbstractTableModel):
+    """
+    A table model of the records shown in the Records tab, loaded a page at a time.
+
+    Records come from a list of sources, one per record type, each read in order of ID. The view pulls
+    pages through ``canFetchMore``/``fetchMore`` as it scrolls, so only the rows seen so far are held.
+    Adding or deleting a record updates just that row through ``add_record`` and ``remove_record``,
+    instead of reloading the table.
+
+    Nothing is loaded until ``reset`` is first called, so attaching the model to a view does not touch
+    the database.
+
+    :param sources: Pairs of ``(record type, fetch)``, in display order. ``fetch(after, limit)`` returns up
+        to ``limit`` rows of ``(name, id)`` with an ID greater than ``after`` (or from the start when
+        ``after`` is None), in order of ID.
+    :type sources: list
+    :param page_size: Rows loaded per ``fetchMore``, defaults to ``PAGE_SIZE``.
+    :type page_size: int, optional
+    :param parent: The Qt parent object, defaults to none.
+    :type parent: QObject, optional
+    """
+    def __init__(self, sources, page_size=PAGE_SIZE, parent=None):
+        """
+        Initialize a new, empty RecordsModel.
+        """
+        super().__init__(parent)
+        self.sources = list(sources)
+        self.page_size = page_size
+        self._order = {record_type: i for i, (record_type, _) in enumerate(self.sources)}
+        self._rows = []
+        # (source index, id) of every row, kept sorted for bisect
+        self._keys = []
+        self._active = False
+        self._source = 0
+        self._after = None
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        return str(self._rows[index.row()][index.column()])
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return HEADERS[section]
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return self._active and not parent.isValid() and self._source < len(self.sources)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+
+        page = []
+        keys = []
+        while len(page) < self.page_size and self._source < len(self.sources):
+            record_type, fetch = self.sources[self._source]
+            wanted = self.page_size - len(page)
+            rows = fetch(self._after, wanted)
+            for name, record_id in rows:
+                page.append((record_type, name, record_id))
+                keys.append((self._source, record_id))
+            if len(rows) < wanted:
+                # This source is exhausted; continue with the next one
+                self._source += 1
+                self._after = None
+            elif rows:
+                self._after = rows[-1][1]
+
+        if page:
+            first = len(self._rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+            self._rows.extend(page)
+            self._keys.extend(keys)
+            self.endInsertRows()
+
+    def reset(self):
+        """
+        Drops the loaded rows and starts loading again from the first page.
+
+        :return: None
+        :rtype: None
+        """
+        self.beginResetModel()
+        self._rows = []
+        self._keys = []
+        self._active = True
+        self._source = 0
+        self._after = None
+        self.endResetModel()
+
+    def record(self, row):
+        """
+        :param row: A row number of the model.
+        :type row: int
+        :return: The row's ``(record type, name, id)``.
+        :rtype: tuple
+        """
+        return self._rows[row]
+
+    def _loaded(self, key):
+        # Whether a record with this key falls in the part of the ordering already fetched
+        return self._source >= len(self.sources) or key[0] < self._source or (
+            key[0] == self._source and self._after is not None and key[1] <= self._after
+        )
+
+    def add_record(self, record_type, name, record_id):
+        """
+        Inserts a new record at its place in the table. A record beyond the rows fetched so far is left
+        for ``fetchMore`` to load.
+
+        :param record_type: The record type, as named in ``sources``.
+        :type record_type: str
+        :param name: The record's name.
+        :type name: str
+        :param record_id: The record's ID.
+        :type record_id: int
+        :return: None
+        :rtype: None
+        """
+        key = (self._order[record_type], record_id)
+        if not self._active or not self._loaded(key):
+            return
+        row = bisect_left(self._keys, key)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._rows.insert(row, (record_type, name, record_id))
+        self._keys.insert(row, key)
+        self.endInsertRows()
+
+    def remove_record(self, record_type, record_id):
+        """
+        Removes a record from the table, if it is loaded.
+
+        :param record_type: The record type, as named in ``sources``.
+        :type record_type: str
+        :param record_id: The record's ID.
+        :type record_id: int
+        :return: None
+        :rtype: None
+        """
+        key = (self._order[record_type], record_id)
+        row = bisect_left(self._keys, key)
+        if row < len(self._keys) and self._keys[row] == key:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._rows[row]
+            del self._keys[row]
+            self.endRemoveRows()
@@ -0,0 +1,203 @@
+import threading
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class JobCancelled(Exception):
+    """
+    Raised inside a job by ``DatabaseJob.check_cancelled`` once the job has been cancelled.
+    """
+
+
+class WorkerSignals(QObject):
+    """
+    Signals of a ``DatabaseJob``. They are emitted from the worker thread and delivered on the GUI
+    thread, so connected slots may update widgets.
+    """
+    # The job's return value
+    result = pyqtSignal(object)
+    # The error message of an exception raised by the job
+    error = pyqtSignal(str)
+    # Work done so far and the total, in the job's own units
+    progress = pyqtSignal(int, int)
+    # The job stopped early after cancel() and its changes were rolled back
+    cancelled = pyqtSignal()
+    # Emitted last, whatever the outcome
+    finished = pyqtSignal()
+
+
+class DatabaseJob(QRunnable):
+    """
+    Runs one database function on a ``QThreadPool`` thread with its own session.
+
+    The function is called as ``function(job, session, *args, **kwargs)``. It should commit its own work;
+    if it raises, the session is rolled back. Long functions call ``job.report`` to publish progress and
+    ``job.check_cancelled`` between steps so that ``cancel`` can stop them.
+
+    :param session_factory: A ``scoped_session``. Each pool thread gets its own session from it, which is
+        removed when the job ends.
+    :type session_factory: sqlalchemy.orm.scoped_session
+    :param function: The function to run.
+    :type function: callable
+    """
+    def __init__(self, session_factory, function, *args, **kwargs):
+        """
+        Initialize a new DatabaseJob.
+        """
+        super().__init__()
+        self.session_factory = session_factory
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        """
+        Asks the job to stop at its next ``check_cancelled``.
+
+        :return: None
+        :rtype: None
+        """
+        self._cancel.set()
+
+    def is_cancelled(self):
+        """
+        :return: True if ``cancel`` has been called.
+        :rtype: bool
+        """
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        """
+        Stops the job if it has been cancelled.
+
+        :raises JobCancelled: If ``cancel`` has been called.
+        :return: None
+        :rtype: None
+        """
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def report(self, done, total):
+        """
+        Publishes the job's progress through the ``progress`` signal.
+
+        :param done: Work done so far.
+        :type done: int
+        :param total: Total work.
+        :type total: int
+        :return: None
+        :rtype: None
+        """
+        self.signals.progress.emit(done, total)
+
+    def checkpoint(self, done, total):
+        """
+        Stops the job if it has been cancelled, and otherwise publishes its progress. Suitable as the
+        ``on_progress`` callback of long operations.
+
+        :param done: Work done so far.
+        :type done: int
+        :param total: Total work.
+        :type total: int
+        :raises JobCancelled: If ``cancel`` has been called.
+        :return: None
+        :rtype: None
+        """
+        self.check_cancelled()
+        self.report(done, total)
+
+    def run(self):
+        session = self.session_factory()
+        try:
+            self.check_cancelled()
+            result = self.function(self, session, *self.args, **self.kwargs)
+        except JobCancelled:
+            session.rollback()
+            self.signals.cancelled.emit()
+        except Exception as e:
+            session.rollback()
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.result.emit(result)
+        finally:
+            self.session_factory.remove()
+            self.signals.finished.emit()
+
+
+class DatabaseWorkers:
+    """
+    Runs database jobs on a ``QThreadPool`` so that the window stays responsive while they run.
+
+    :param session_factory: The ``scoped_session`` that jobs take their sessions from.
+    :type session_factory: sqlalchemy.orm.scoped_session
+    :param pool: The thread pool, defaults to a new one.
+    :type pool: QThreadPool, optional
+    """
+    def __init__(self, session_factory, pool=None):
+        """
+        Initialize new DatabaseWorkers.
+        """
+        self.session_factory = session_factory
+        self.pool = pool or QThreadPool()
+        # Running jobs, kept referenced so their signals outlive the pool's handle on them
+        self.jobs = set()
+
+    def submit(self, function, *args, on_result=None, on_error=None, on_progress=None, on_cancelled=None,
+               on_finished=None, **kwargs):
+        """
+        Starts ``function(job, session, *args, **kwargs)`` on the thread pool.
+
+        :param function: The function to run.
+        :type function: callable
+        :param on_result: Called on the GUI thread with the function's return value, defaults to none.
+        :type on_result: callable, optional
+        :param on_error: Called on the GUI thread with the error message if it raises, defaults to none.
+        :type on_error: callable, optional
+        :param on_progress: Called on the GUI thread with ``(done, total)``, defaults to none.
+        :type on_progress: callable, optional
+        :param on_cancelled: Called on the GUI thread if the job is cancelled, defaults to none.
+        :type on_cancelled: callable, optional
+        :param on_finished: Called on the GUI thread after the job has ended, whatever the outcome,
+            defaults to none.
+        :type on_finished: callable, optional
+        :return: The started job.
+        :rtype: DatabaseJob
+        """
+        job = DatabaseJob(self.session_factory, function, *args, **kwargs)
+        # Everything is connected before the job starts, or a quick job could signal unheard
+        for signal, slot in (
+            (job.signals.result, on_result),
+            (job.signals.error, on_error),
+            (job.signals.progress, on_progress),
+            (job.signals.cancelled, on_cancelled),
+            (job.signals.finished, on_finished),
+        ):
+            if slot is not None:
+                signal.connect(slot)
+        job.signals.finished.connect(lambda: self.jobs.discard(job))
+        self.jobs.add(job)
+        self.pool.start(job)
+        return job
+
+    def cancel_all(self):
+        """
+        Cancels every running job.
+
+        :return: None
+        :rtype: None
+        """
+        for job in list(self.jobs):
+            job.cancel()
+
+    def wait(self, msecs=-1):
+        """
+        Waits for the running jobs to finish.
+
+        :param msecs: The longest time to wait in milliseconds, defaults to no limit.
+        :type msecs: int, optional
+        :return: True if every job finished in time.
+        :rtype: bool
+        """
+        return self.pool.waitForDone(msecs)
@@ -0,0 +1,115 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import Column, ForeignKey, Integer, MetaData, String, Table, create_engine, func, select
+
+import pyqt_backup
+from pyqt_backup import PartialRestore, restore_backup_parallel, write_backup
+
+
+@pytest.fixture
+def deferred(monkeypatch):
+    # Records the connections foreign key checks are deferred on, without running dialect-specific SQL
+    connections = []
+
+    @contextmanager
+    def record(connection):
+        connections.append(connection)
+        yield
+
+    monkeypatch.setattr(pyqt_backup, "foreign_keys_deferred", record)
+    return connections
+
+
+@pytest.fixture
+def server_engine(tmp_path, monkeypatch):
+    # A file database the parallel restore loads on several connections, as it would a server database
+    monkeypatch.setattr(pyqt_backup, "_parallel_writers", lambda engine: True)
+    engine = create_engine(f"sqlite:///{tmp_path / 'school.db'}")
+    yield engine
+    engine.dispose()
+
+
+def backed_up(engine, metadata, tmp_path, rows):
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        for table, values in rows:
+            connection.execute(table.insert(), values)
+        path = str(tmp_path / "backup.jsonl")
+        write_backup(connection, metadata, path)
+    return path
+
+
+def test_parallel_restore_defers_foreign_keys_on_every_connection(tmp_path, deferred, server_engine):
+    metadata = MetaData()
+    persons = Table("persons", metadata, Column("id", Integer, primary_key=True), Column("name", String(50)))
+    courses = Table("courses", metadata, Column("course_id", Integer, primary_key=True), Column("name", String(50)))
+    registrations = Table(
+        "registrations", metadata,
+        Column("student_id", Integer, ForeignKey("persons.id")),
+        Column("course_id", Integer, ForeignKey("courses.course_id")),
+    )
+    engine = server_engine
+    path = backed_up(engine, metadata, tmp_path, [
+        (persons, [{"id": i, "name": f"Person {i}"} for i in range(1, 11)]),
+        (courses, [{"course_id": i, "name": f"Course {i}"} for i in range(1, 4)]),
+        (registrations, [{"student_id": i, "course_id": 1 + i % 3} for i in range(1, 11)]),
+    ])
+
+    assert restore_backup_parallel(engine, metadata, path, workers=2) == 23
+
+    # One connection empties the tables, then one loads each table
+    assert len(deferred) == 4
+    assert len({id(connection) for connection in deferred}) >= 2
+    with engine.connect() as connection:
+        assert connection.execute(select(func.count()).select_from(registrations)).scalar() == 10
+
+
+@pytest.mark.parametrize("cycle", [False, True])
+def test_parallel_restore_runs_in_one_transaction_when_tables_reference_each_other(
+        tmp_path, deferred, server_engine, monkeypatch, cycle):
+    metadata = MetaData()
+    employees = Table(
+        "employees", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("manager_id", Integer, ForeignKey("departments.id" if cycle else "employees.id")),
+    )
+    Table(
+        "departments", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("head_id", Integer, ForeignKey("employees.id", use_alter=True)),
+    )
+    engine = server_engine
+    path = backed_up(engine, metadata, tmp_path, [(employees, [{"id": 1, "manager_id": None}])])
+
+    calls = []
+    monkeypatch.setattr(pyqt_backup, "restore_backup", lambda connection, *args: calls.append(args) or 1)
+
+    assert restore_backup_parallel(engine, metadata, path, workers=4) == 1
+    assert len(calls) == 1
+    assert deferred == []
+
+
+def test_stopped_parallel_restore_reports_the_tables_it_left_loaded(tmp_path, deferred, server_engine):
+    metadata = MetaData()
+    persons = Table("persons", metadata, Column("id", Integer, primary_key=True))
+    registrations = Table("registrations", metadata, Column("student_id", Integer, ForeignKey("persons.id")))
+    engine = server_engine
+    path = backed_up(engine, metadata, tmp_path, [
+        (persons, [{"id": i} for i in range(1, 4)]),
+        (registrations, [{"student_id": i} for i in range(1, 4)]),
+    ])
+
+    def stop_after_persons(done, total):
+        if done == 1:
+            raise RuntimeError("stopped")
+
+    with pytest.raises(PartialRestore) as raised:
+        restore_backup_parallel(engine, metadata, path, workers=2, on_progress=stop_after_persons)
+
+    assert raised.value.loaded == ["persons"]
+    assert raised.value.total == 2
+    assert "1 of 2 tables" in str(raised.value)
+    with engine.connect() as connection:
+        assert connection.execute(select(func.count()).select_from(persons)).scalar() == 3
+        assert connection.execute(select(func.count()).select_from(registrations)).scalar() == 0
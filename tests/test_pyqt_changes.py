@@ -0,0 +1,82 @@
+import pytest
+from sqlalchemy import Column, Integer, String, create_engine, select
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from pyqt_backup import read_backup_header, restore_backup, restore_backups, write_backup, write_delta_backup
+from pyqt_changes import CHANGE_TABLE, install_change_tracking, prune_changes
+from pyqt_metadata import reflected_metadata
+
+Base = declarative_base()
+
+
+class Person(Base):
+    __tablename__ = "persons"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(50))
+
+
+class Change(Base):
+    __tablename__ = CHANGE_TABLE
+
+    change_id = Column(Integer, primary_key=True, autoincrement=True)
+    table_name = Column(String(100), nullable=False)
+    row_key = Column(String(255), nullable=False)
+
+
+@pytest.fixture
+def database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'school.db'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    install_change_tracking(Session, Change.__table__)
+    yield engine, Session, reflected_metadata(engine, cache_dir=None)
+    engine.dispose()
+
+
+def add_person(Session, person_id, name):
+    with Session() as session:
+        session.add(Person(id=person_id, name=name))
+        session.commit()
+
+
+def names(engine):
+    with engine.connect() as connection:
+        return connection.execute(select(Person.name).order_by(Person.id)).scalars().all()
+
+
+def test_delta_backup_cannot_span_a_restore(database, tmp_path):
+    engine, Session, metadata = database
+    add_person(Session, 1, "A")
+    with engine.connect() as connection:
+        write_backup(connection, metadata, str(tmp_path / "f0.jsonl"))
+    add_person(Session, 2, "B")
+    with engine.connect() as connection:
+        write_backup(connection, metadata, str(tmp_path / "f1.jsonl"))
+    since = read_backup_header(str(tmp_path / "f1.jsonl"))["change_id"]
+
+    with engine.begin() as connection:
+        restore_backup(connection, metadata, str(tmp_path / "f0.jsonl"))
+    assert names(engine) == ["A"]
+
+    with engine.connect() as connection:
+        with pytest.raises(ValueError, match="restored"):
+            write_delta_backup(connection, metadata, str(tmp_path / "delta.jsonl"), since)
+        # Pruning the log must not hide the restore either
+        prune_changes(connection, Change.__table__, since + 10)
+        with pytest.raises(ValueError, match="restored"):
+            write_delta_backup(connection, metadata, str(tmp_path / "delta.jsonl"), since)
+
+    # A chain based on a full backup made after the restore matches the database again
+    with engine.connect() as connection:
+        write_backup(connection, metadata, str(tmp_path / "f2.jsonl"))
+    add_person(Session, 3, "C")
+    since = read_backup_header(str(tmp_path / "f2.jsonl"))["change_id"]
+    with engine.connect() as connection:
+        write_delta_backup(connection, metadata, str(tmp_path / "delta.jsonl"), since)
+
+    with engine.begin() as connection:
+        restore_backups(connection, metadata, [str(tmp_path / "f1.jsonl")])
+    with engine.begin() as connection:
+        restore_backups(connection, metadata, [str(tmp_path / "f2.jsonl"), str(tmp_path / "delta.jsonl")])
+    assert names(engine) == ["A", "C"]
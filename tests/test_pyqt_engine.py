@@ -0,0 +1,25 @@
+import threading
+
+from sqlalchemy import text
+
+from pyqt_engine import PoolStats, create_school_engine
+
+
+def test_in_memory_database_is_shared_by_every_thread():
+    engine = create_school_engine("sqlite://", stats=PoolStats())
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE persons (id INTEGER PRIMARY KEY)"))
+        connection.execute(text("INSERT INTO persons VALUES (1)"))
+
+    counts = []
+
+    def count():
+        with engine.connect() as connection:
+            counts.append(connection.execute(text("SELECT COUNT(*) FROM persons")).scalar())
+
+    thread = threading.Thread(target=count)
+    thread.start()
+    thread.join()
+    engine.dispose()
+
+    assert counts == [1]
@@ -0,0 +1,83 @@
+import os
+import pickle
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, text
+
+import pyqt_metadata
+from pyqt_metadata import reflected_metadata
+
+
+@pytest.fixture(autouse=True)
+def empty_memory_cache(monkeypatch):
+    monkeypatch.setattr(pyqt_metadata, "_loaded", {})
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'school.db'}")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE persons (id INTEGER PRIMARY KEY, name VARCHAR(50))"))
+    yield engine
+    engine.dispose()
+
+
+def plant(cache_dir, mode):
+    # Replaces the cached file with metadata describing a table the database does not have
+    [name] = os.listdir(cache_dir)
+    planted = MetaData()
+    Table("planted", planted, Column("id", Integer, primary_key=True))
+    path = os.path.join(cache_dir, name)
+    with open(path, "wb") as f:
+        pickle.dump(planted, f)
+    os.chmod(path, mode)
+
+
+def test_cached_metadata_is_reused_until_the_schema_changes(engine, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    first = reflected_metadata(engine, cache_dir)
+    assert reflected_metadata(engine, cache_dir) is first
+    assert len(os.listdir(cache_dir)) == 1
+
+    monkeypatch.setattr(pyqt_metadata, "_loaded", {})
+    from_disk = reflected_metadata(engine, cache_dir)
+    assert from_disk is not first
+    assert sorted(from_disk.tables) == ["persons"]
+
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE courses (course_id INTEGER PRIMARY KEY)"))
+    assert sorted(reflected_metadata(engine, cache_dir).tables) == ["courses", "persons"]
+    assert len(os.listdir(cache_dir)) == 1
+
+
+def test_cache_files_open_to_other_users_are_ignored(engine, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    reflected_metadata(engine, cache_dir)
+    monkeypatch.setattr(pyqt_metadata, "_loaded", {})
+    plant(cache_dir, 0o600)
+    assert sorted(reflected_metadata(engine, cache_dir).tables) == ["planted"]
+
+    monkeypatch.setattr(pyqt_metadata, "_loaded", {})
+    plant(cache_dir, 0o666)
+    assert sorted(reflected_metadata(engine, cache_dir).tables) == ["persons"]
+
+
+def test_cache_directory_open_to_other_users_is_ignored(engine, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    reflected_metadata(engine, cache_dir)
+    monkeypatch.setattr(pyqt_metadata, "_loaded", {})
+    plant(cache_dir, 0o600)
+    os.chmod(cache_dir, 0o777)
+
+    assert sorted(reflected_metadata(engine, cache_dir).tables) == ["persons"]
+
+
+def test_symlinked_cache_file_is_ignored(engine, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    reflected_metadata(engine, cache_dir)
+    monkeypatch.setattr(pyqt_metadata, "_loaded", {})
+    [name] = os.listdir(cache_dir)
+    os.rename(os.path.join(cache_dir, name), str(tmp_path / "elsewhere"))
+    os.symlink(str(tmp_path / "elsewhere"), os.path.join(cache_dir, name))
+
+    assert sorted(reflected_metadata(engine, cache_dir).tables) == ["persons"]
@@ -0,0 +1,45 @@
+import os
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import QCoreApplication
+from sqlalchemy import create_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from pyqt_workers import DatabaseWorkers
+
+app = QCoreApplication.instance() or QCoreApplication([])
+
+
+def make_workers():
+    return DatabaseWorkers(scoped_session(sessionmaker(bind=create_engine("sqlite://"))))
+
+
+def settle(workers):
+    workers.wait()
+    app.processEvents()
+
+
+def test_on_finished_runs_for_a_job_that_fails_at_once():
+    workers = make_workers()
+    events = []
+
+    def fail(job, session):
+        raise ValueError("broken")
+
+    for _ in range(20):
+        workers.submit(fail, on_error=events.append, on_finished=lambda: events.append("finished"))
+    settle(workers)
+
+    assert events.count("broken") == 20
+    assert events.count("finished") == 20
+    assert not workers.jobs
+
+
+def test_on_finished_runs_after_the_result():
+    workers = make_workers()
+    events = []
+    workers.submit(lambda job, session: 42, on_result=events.append, on_finished=lambda: events.append("finished"))
+    settle(workers)
+
+    assert events == [42, "finished"]
@@ -0,0 +1,38 @@
+from tk_db_archive import archive, archived_enrollments, search_archive
+from tk_db_repository import Repository, connect
+from tk_db_schema import migrate
+
+
+def enroll(conn, course_id, student_id, enrolled_at):
+    conn.execute(
+        "INSERT INTO enrollments (course_id, student_id, enrolled_at) VALUES (?, ?, ?)",
+        (course_id, student_id, enrolled_at),
+    )
+    conn.commit()
+
+
+def test_reused_student_id_does_not_replace_the_archived_student(tmp_path):
+    conn = connect(str(tmp_path / "school.db"))
+    migrate(conn)
+    archive_file = str(tmp_path / "archive.db")
+    repository = Repository(conn)
+    repository.add_course(1, "Math")
+    repository.add_student(7, "Old Student", 20, "old@example.com")
+    enroll(conn, 1, 7, "2020-01-01")
+
+    assert archive(conn, "2021-01-01", archive_file) == {"enrollments": 1, "students": 1}
+
+    # A new student is given the archived student's ID and has not enrolled in anything yet
+    repository.add_student(7, "New Student", 19, "new@example.com")
+    repository.add_student(8, "Other Student", 19, "other@example.com")
+    assert archive(conn, "2021-01-01", archive_file) == {"enrollments": 0, "students": 0}
+    assert conn.execute("SELECT student_id FROM students ORDER BY student_id").fetchall() == [(7,), (8,)]
+
+    # The new student's own old enrollments are archived, but the student stays live
+    enroll(conn, 1, 7, "2020-06-01")
+    assert archive(conn, "2021-01-01", archive_file) == {"enrollments": 1, "students": 0}
+    assert conn.execute("SELECT name FROM students WHERE student_id = 7").fetchone() == ("New Student",)
+
+    assert search_archive(conn) == [("Student", "Old Student", 20, 7)]
+    assert len(archived_enrollments(conn, 7)) == 2
+    conn.close()
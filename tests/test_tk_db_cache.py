@@ -0,0 +1,32 @@
+from tk_db_cache import QueryCache
+
+
+def test_evicted_keys_leave_the_table_index():
+    cache = QueryCache(max_entries=8)
+    for n in range(1000):
+        cache.get(("search", f"term {n}"), ("students", "instructors"), lambda: n)
+
+    assert cache.stats()["entries"] == 8
+    assert {table: len(keys) for table, keys in cache._keys_by_table.items()} == {"students": 8, "instructors": 8}
+
+
+def test_invalidate_drops_entries_of_every_table_they_read():
+    cache = QueryCache()
+    cache.get(("search", "ann"), ("students", "instructors"), lambda: ["Ann"])
+    cache.get(("courses",), ("courses",), lambda: ["Math"])
+
+    cache.invalidate("students")
+
+    assert cache.stats()["entries"] == 1
+    assert dict(cache._keys_by_table) == {"courses": {("courses",)}}
+
+
+def test_hits_return_the_cached_value():
+    cache = QueryCache()
+    calls = []
+    for _ in range(3):
+        value = cache.get(("courses",), ("courses",), lambda: calls.append(1) or ["Math"])
+
+    assert value == ["Math"]
+    assert len(calls) == 1
+    assert cache.stats() == {"hits": 2, "misses": 1, "entries": 1}
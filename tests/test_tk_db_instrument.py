@@ -0,0 +1,51 @@
+import logging
+import sqlite3
+import time
+
+from tk_db_instrument import InstrumentedConnection, instrument
+
+
+def slow_connection(slow_ms):
+    conn = sqlite3.connect(":memory:", factory=InstrumentedConnection)
+    conn.create_function("pause", 1, lambda seconds: time.sleep(seconds) or seconds)
+    return conn, instrument(conn, slow_ms=slow_ms, report_at_exit=False)
+
+
+def test_slow_fetchone_is_logged_with_its_plan(caplog):
+    conn, stats = slow_connection(slow_ms=20)
+    with caplog.at_level(logging.WARNING, logger="tk_db.sql"):
+        row = conn.execute("SELECT pause(?)", (0.05,)).fetchone()
+
+    assert row == (0.05,)
+    statement = stats.statements["SELECT pause(?)"]
+    assert statement.calls == 1
+    assert statement.slow_calls == 1
+    assert statement.max_time >= 0.05
+    assert statement.plan is not None
+    assert "Slow query" in caplog.text
+
+
+def test_rows_fetched_after_fetchone_are_counted_but_logged_once(caplog):
+    conn, stats = slow_connection(slow_ms=0)
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(3)])
+    caplog.clear()
+    with caplog.at_level(logging.WARNING, logger="tk_db.sql"):
+        cursor = conn.execute("SELECT x FROM t")
+        cursor.fetchone()
+        rest = cursor.fetchall()
+
+    assert len(rest) == 2
+    statement = stats.statements["SELECT x FROM t"]
+    assert statement.rows == 3
+    assert statement.slow_calls == 1
+    assert caplog.text.count("Slow query") == 1
+
+
+def test_fully_iterated_statement_is_logged(caplog):
+    conn, stats = slow_connection(slow_ms=20)
+    with caplog.at_level(logging.WARNING, logger="tk_db.sql"):
+        rows = list(conn.execute("SELECT pause(?)", (0.05,)))
+
+    assert rows == [(0.05,)]
+    assert stats.statements["SELECT pause(?)"].slow_calls == 1
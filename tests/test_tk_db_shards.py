@@ -0,0 +1,19 @@
+from tk_db_shards import ShardRouter
+
+
+def test_instructor_report_keeps_instructors_of_different_shards_apart(tmp_path):
+    router = ShardRouter(str(tmp_path / "shards"))
+    fall = router.repository("2024-fall", create=True)
+    fall.add_instructor(1, "Alice", 40, "alice@example.com")
+    fall.add_course(1, "Math", 1)
+    fall.add_course(2, "Physics", 1)
+    spring = router.repository("2025-spring", create=True)
+    spring.add_instructor(1, "Bob", 50, "bob@example.com")
+    spring.add_course(1, "History", 1)
+
+    try:
+        report = router.instructor_report()
+    finally:
+        router.close()
+
+    assert report == [("2024-fall", 1, "Alice", 2), ("2025-spring", 1, "Bob", 1)]
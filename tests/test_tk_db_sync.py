@@ -0,0 +1,50 @@
+from tk_db_backup import BackupManager
+from tk_db_repository import Repository, connect
+from tk_db_schema import migrate
+from tk_db_sync import ChangeFeed
+
+
+def open_database(db_path):
+    conn = connect(str(db_path))
+    migrate(conn)
+    return conn
+
+
+def test_poll_reloads_after_the_change_log_is_restored_to_an_older_copy(tmp_path):
+    db_path = tmp_path / "school.db"
+    writer = open_database(db_path)
+    reader = open_database(db_path)
+    feed = ChangeFeed(reader)
+    manager = BackupManager(str(db_path), backup_dir=str(tmp_path / "backups"))
+    backup_path = manager.backup()
+
+    repository = Repository(writer)
+    for student_id in range(1, 6):
+        repository.add_student(student_id, f"Student {student_id}", 20, f"s{student_id}@example.com")
+    assert len(feed.poll()) == 5
+
+    manager.restore(backup_path)
+    # Written after the restore, with a sequence number the feed has already passed
+    Repository(writer).add_student(7, "Student 7", 20, "s7@example.com")
+
+    assert feed.poll() is None
+    assert feed.poll() == []
+
+
+def test_skip_to_latest_follows_a_restore(tmp_path):
+    db_path = tmp_path / "school.db"
+    writer = open_database(db_path)
+    reader = open_database(db_path)
+    feed = ChangeFeed(reader)
+    manager = BackupManager(str(db_path), backup_dir=str(tmp_path / "backups"))
+    backup_path = manager.backup()
+
+    for student_id in range(1, 4):
+        Repository(writer).add_student(student_id, f"Student {student_id}", 20, f"s{student_id}@example.com")
+    feed.poll()
+
+    manager.restore(backup_path)
+    feed.skip_to_latest()
+    Repository(writer).add_student(9, "Student 9", 20, "s9@example.com")
+
+    assert [change[2] for change in feed.poll()] == [9]
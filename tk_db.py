@@ -1,132 +1,345 @@
+import logging
+import os
+import queue
 import sqlite3
+import threading
+import time
 import tkinter as tk
 from tkinter import ttk
 from tkinter import filedialog
 from tkinter import messagebox
 from classes import Student, Instructor, Course
+from tk_db_search import SEARCHABLE_TABLES, install_search, search_records as search_index
+from tk_db_archive import archive_path, search_archive
+from tk_db_backup import BackupManager
+from tk_db_instrument import InstrumentedConnection, instrument
+from tk_db_export import EXPORTS, start_export
+from tk_db_repository import ConflictError, Repository, connect
+from tk_db_schema import migrate
+from tk_db_writer import BUSY_TIMEOUT, retry_on_lock
+from tk_db_sync import POLL_INTERVAL_MS, RECORD_TYPES, ChangeFeed, changed_rows, compact_changes, prune_change_log, record_iid
 
-# Connect to SQLite database
-conn = sqlite3.connect('school_management.db')
-cursor = conn.cursor()
+# Startup timings are measured from here
+STARTED = time.perf_counter()
 
-def init_db():
+DB_PATH = 'school_management.db'
+
+# Old enrollments and inactive students moved out by tk_db_archive; searched only on request
+ARCHIVE_PATH = archive_path(DB_PATH)
+
+# Set TK_DB_SLOW_QUERY_MS to time every statement, log the ones slower than that many milliseconds with
+# their query plan, and print a per-statement summary on exit
+SLOW_QUERY_MS = os.environ.get('TK_DB_SLOW_QUERY_MS')
+
+# Set TK_DB_STARTUP_TRACE to print the time to the first frame and to the loaded records, then exit
+STARTUP_TRACE = os.environ.get('TK_DB_STARTUP_TRACE')
+
+# The connection, the repository every read and write goes through, and the change feed are set by
+# open_database once the window is on screen and the schema is up to date
+conn = None
+repo = None
+change_feed = None
+
+# Timestamped, rotated backups copied on a worker thread
+backup_manager = BackupManager(DB_PATH)
+
+# Progress and completion events posted by the backup worker, drained on the Tk thread
+backup_events = queue.Queue()
+
+# Completion event posted by the startup worker, drained on the Tk thread
+startup_events = queue.Queue()
+
+def init_db(db_path=DB_PATH):
     """
-    Initializes the database by checking if the necessary tables ('students', 'instructors', 'courses', 'enrollments') 
-    exist, and creates them if they do not.
+    Initializes the database by applying any pending schema migrations, which create the necessary tables
+    ('students', 'instructors', 'courses', 'enrollments') on a new database and upgrade an existing one
+    to the current schema version. Uses a connection of its own, so that it can run on a worker thread
+    while the window is already responsive.
     
+    :param db_path: Path of the database file, defaults to ``DB_PATH``.
+    :type db_path: str, optional
     :raises sqlite3.Error: If there is an issue creating or interacting with the database.
     :return: None
     :rtype: None
     """
-    # Check if the 'students' table exists
-    cursor.execute('''
-        SELECT name FROM sqlite_master WHERE type='table' AND name='students';
-    ''')
-    student_table_exists = cursor.fetchone()
-
-    # Check if the 'instructors' table exists
-    cursor.execute('''
-        SELECT name FROM sqlite_master WHERE type='table' AND name='instructors';
-    ''')
-    instructor_table_exists = cursor.fetchone()
-
-    # Check if the 'courses' table exists
-    cursor.execute('''
-        SELECT name FROM sqlite_master WHERE type='table' AND name='courses';
-    ''')
-    course_table_exists = cursor.fetchone()
-
-    # Check if the 'enrollments' table exists
-    cursor.execute('''
-        SELECT name FROM sqlite_master WHERE type='table' AND name='enrollments';
-    ''')
-    enrollment_table_exists = cursor.fetchone()
-
-    # If any table does not exist, create the necessary tables
-    if not student_table_exists:
-        cursor.execute('''
-            CREATE TABLE students (
-                student_id INTEGER PRIMARY KEY, 
-                name TEXT, 
-                age INTEGER, 
-                email TEXT
-            )
-        ''')
-
-    if not instructor_table_exists:
-        cursor.execute('''
-            CREATE TABLE instructors (
-                instructor_id INTEGER PRIMARY KEY, 
-                name TEXT, 
-                age INTEGER, 
-                email TEXT
-            )
-        ''')
-
-    if not course_table_exists:
-        cursor.execute('''
-            CREATE TABLE courses (
-                course_id INTEGER PRIMARY KEY, 
-                course_name TEXT, 
-                instructor_id INTEGER,
-                FOREIGN KEY (instructor_id) REFERENCES instructors (instructor_id)
-            )
-        ''')
-
-    if not enrollment_table_exists:
-        cursor.execute('''
-            CREATE TABLE enrollments (
-                course_id INTEGER, 
-                student_id INTEGER, 
-                FOREIGN KEY (course_id) REFERENCES courses (course_id),
-                FOREIGN KEY (student_id) REFERENCES students (student_id)
-            )
-        ''')
-
-    conn.commit()
+    setup_conn = connect(db_path, timeout=BUSY_TIMEOUT)
+    try:
+        migrate(setup_conn)
+        install_search(setup_conn)
+        retry_on_lock(lambda: prune_change_log(setup_conn), conn=setup_conn)
+    finally:
+        setup_conn.close()
+
+
+def start_database():
+    """
+    Runs ``init_db`` on a worker thread and starts polling for its completion. Called once the window
+    has been drawn, so neither migrations nor building the search index delay the first frame.
+    
+    :return: None
+    :rtype: None
+    """
+    def run():
+        try:
+            init_db()
+        except Exception as e:
+            startup_events.put(e)
+            return
+        startup_events.put(None)
+
+    status_label.config(text="Opening database...")
+    threading.Thread(target=run, daemon=True).start()
+    root.after(20, poll_startup)
+
+
+def poll_startup():
+    """
+    Opens the database on the Tk thread once the startup worker is done. Reschedules itself until then.
+    
+    :return: None
+    :rtype: None
+    """
+    try:
+        error = startup_events.get_nowait()
+    except queue.Empty:
+        root.after(20, poll_startup)
+        return
+
+    if error:
+        status_label.config(text="The database could not be opened.")
+        messagebox.showerror("Error", f"The database could not be opened: {error}")
+        return
+
+    open_database()
+    if STARTUP_TRACE:
+        print(f"ready {1000 * (time.perf_counter() - STARTED):.1f} ms", flush=True)
+        root.after(0, close_app)
+
+
+def open_connection(db_path=DB_PATH):
+    """
+    Connects to the database, waiting up to ``BUSY_TIMEOUT`` seconds when another instance holds the lock.
+    The connection is instrumented when ``TK_DB_SLOW_QUERY_MS`` is set.
+    
+    :param db_path: Path of the database file, defaults to ``DB_PATH``.
+    :type db_path: str, optional
+    :return: The open connection.
+    :rtype: sqlite3.Connection
+    """
+    if not SLOW_QUERY_MS:
+        return connect(db_path, timeout=BUSY_TIMEOUT)
+
+    logging.basicConfig(format='%(asctime)s %(name)s %(message)s')
+    instrumented = connect(db_path, timeout=BUSY_TIMEOUT, factory=InstrumentedConnection)
+    instrument(instrumented, slow_ms=float(SLOW_QUERY_MS))
+    return instrumented
+
+
+def open_database():
+    """
+    Opens the UI connection to the migrated database, loads the first page of records, the course lists
+    and the current report, enables the database actions and starts polling for changes.
+    
+    :return: None
+    :rtype: None
+    """
+    global conn, repo, change_feed
+    conn = open_connection()
+    repo = Repository(conn)
+
+    # Pick up changes made by other instances sharing the database file; start before the first
+    # load so nothing committed in between is missed
+    change_feed = ChangeFeed(conn)
+
     update_course_combobox()
-    messagebox.showinfo("Success", "Database connection established, and necessary tables are ready.")
+    display_records()
+    show_report()
+
+    for widget in database_widgets:
+        widget.config(state="normal")
+    status_label.config(text="")
+
+    root.after(POLL_INTERVAL_MS, poll_changes)
+
+
+def close_app():
+    """
+    Closes the database connection, if it was opened, and the window.
+    
+    :return: None
+    :rtype: None
+    """
+    if conn is not None:
+        conn.close()
+    root.destroy()
+
+
+def run_write(operation):
+    """
+    Runs a database write from a UI handler. Writes that find the database locked by another instance
+    are retried with jittered backoff; if the write still fails, the error is shown instead of crashing.
+    
+    :param operation: The write to run; called without arguments. It must be the whole transaction.
+    :type operation: callable
+    :return: True if the write succeeded, False if an error was shown.
+    :rtype: bool
+    """
+    try:
+        retry_on_lock(operation, conn=conn)
+        return True
+    except sqlite3.Error as e:
+        if conn.in_transaction:
+            conn.rollback()
+        messagebox.showerror("Error", f"The change could not be saved: {e}")
+        return False
 
 
 # Function to save data to SQLite database
 def backup_data():
     """
-    Creates a backup of the current database by copying the data to a separate backup database file.
+    Starts an online backup of the current database into a new timestamped file in the backup directory.
+    The copy runs on a worker thread; progress is shown in the progress bar and the oldest backups are
+    removed according to the retention policy once the copy completes.
     
-    :raises sqlite3.Error: If there is an issue with the backup process.
-    :raises Exception: If any other errors occur during the backup.
     :return: None
     :rtype: None
     """
-    try:
-        # Open a connection to the backup database
-        backup_db = sqlite3.connect('school_management_backup.db')
+    start_backup_job("Backup", backup_manager.start_backup)
 
-        # Perform the backup
-        with backup_db:
-            conn.backup(backup_db)
 
-        backup_db.close()
+def restore_data():
+    """
+    Asks for a backup file and copies it over the current database on a worker thread. The application
+    keeps its connection open and refreshes the records once the restore completes.
+    
+    :return: None
+    :rtype: None
+    """
+    backup_path = filedialog.askopenfilename(
+        title="Restore Backup",
+        initialdir=backup_manager.backup_dir,
+        filetypes=[("Database Backups", "*.db"), ("All Files", "*.*")],
+    )
+    if not backup_path:
+        return
+
+    if not messagebox.askyesno("Restore Backup", "Replace all current data with the selected backup?"):
+        return
 
-        # Show success message in a Tkinter messagebox
-        messagebox.showinfo('Success', 'Backup created successfully!')
+    start_backup_job("Restore", lambda **callbacks: backup_manager.start_restore(backup_path, **callbacks))
 
-    except Exception as e:
-        # Show error message in a Tkinter messagebox
-        messagebox.showerror('Error', f'An error occurred during the backup: {e}')
+
+def export_data():
+    """
+    Asks for a file name and streams the export selected in the export combobox to it on a worker thread.
+    The file extension picks the format: ``.csv`` or ``.jsonl``, optionally followed by ``.gz``.
+    
+    :return: None
+    :rtype: None
+    """
+    name = export_combobox.get()
+    export_path = filedialog.asksaveasfilename(
+        title=f"Export {name}",
+        initialfile=f"{name}.csv",
+        filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl"), ("Compressed", "*.gz"), ("All Files", "*.*")],
+    )
+    if not export_path:
+        return
+
+    # The row count of the exported table gives the progress bar its total
+    total = repo.counts()[EXPORTS[name][2]]
+
+    def start(on_progress, on_done):
+        start_export(DB_PATH, name, export_path, on_progress=lambda written: on_progress(written, total), on_done=on_done)
+
+    start_backup_job("Export", start)
+
+
+def start_backup_job(action, start):
+    """
+    Runs a backup, restore or export job on a worker thread and starts polling for its events.
+
+    :param action: Name of the job shown in messages: "Backup", "Restore" or "Export".
+    :type action: str
+    :param start: Starts the job when called with ``on_progress`` and ``on_done`` callbacks.
+    :type start: callable
+    :return: None
+    :rtype: None
+    """
+    save_button.config(state="disabled")
+    restore_button.config(state="disabled")
+    export_button.config(state="disabled")
+    backup_progress['value'] = 0
+
+    start(
+        on_progress=lambda copied, total: backup_events.put(("progress", copied, total)),
+        on_done=lambda path, error: backup_events.put(("done", path, error)),
+    )
+    root.after(50, poll_backup_events, action)
+
+
+def poll_backup_events(action):
+    """
+    Applies the events posted by the backup worker to the UI. Reschedules itself until the job is done.
+
+    :param action: Name of the running job: "Backup", "Restore" or "Export".
+    :type action: str
+    :return: None
+    :rtype: None
+    """
+    while True:
+        try:
+            event = backup_events.get_nowait()
+        except queue.Empty:
+            root.after(50, poll_backup_events, action)
+            return
+
+        if event[0] == "progress":
+            _, copied, total = event
+            backup_progress['value'] = min(100, 100 * copied / total) if total else 100
+            continue
+
+        _, path, error = event
+        save_button.config(state="normal")
+        restore_button.config(state="normal")
+        export_button.config(state="normal")
+
+        if error:
+            # Show error message in a Tkinter messagebox
+            messagebox.showerror('Error', f'An error occurred during the {action.lower()}: {error}')
+        elif action == "Restore":
+            # Every cached lookup may describe data that was just replaced
+            repo.cache.clear()
+            # The restored change log is older than the feed's position; the reload below covers it
+            change_feed.skip_to_latest()
+            update_course_combobox()
+            refresh_treeview()
+            messagebox.showinfo('Success', f'Database restored from {path}')
+        elif action == "Export":
+            messagebox.showinfo('Success', f'Export written to {path}')
+        else:
+            # Show success message in a Tkinter messagebox
+            messagebox.showinfo('Success', f'Backup created successfully at {path}')
+        return
 
 root = tk.Tk()
 root.title('School Management System')
 root.geometry("800x600")
 
+# Shows what the application is doing while the database opens in the background
+status_label = tk.Label(root, anchor="w")
+status_label.pack(side="bottom", fill="x")
+
 notebook = ttk.Notebook(root)
 notebook.pack(expand=True, fill="both")
 
 main_tab = tk.Frame(notebook)
 records_tab = tk.Frame(notebook)
+reports_tab = tk.Frame(notebook)
 
 notebook.add(main_tab, text="Main")
 notebook.add(records_tab, text="Records")
+notebook.add(reports_tab, text="Reports")
 
 def update_course_combobox():
     """
@@ -135,11 +348,7 @@ def update_course_combobox():
     :return: None
     :rtype: None
     """
-    cursor = conn.cursor()
-    cursor.execute("SELECT course_name FROM courses")
-    courses = cursor.fetchall()
-
-    course_names = [row[0] for row in courses]
+    course_names = repo.course_names()
     course_combobox['values'] = course_names
     course_combobox_for_instructor['values'] = course_names
 
@@ -151,7 +360,7 @@ def update_course_combobox():
         course_combobox_for_instructor.set("No Courses Available")
 
 # Close the connection when the program exits
-root.protocol("WM_DELETE_WINDOW", lambda: (conn.close(), root.destroy()))
+root.protocol("WM_DELETE_WINDOW", close_app)
 
 def student_window():
     """
@@ -167,13 +376,8 @@ def student_window():
         email = student_email_entry.get()
         student_id = int(id_entry.get())
 
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO students (student_id, name, age, email) 
-            VALUES (?, ?, ?, ?)
-        ''', (student_id, name, age, email))
-
-        conn.commit()
+        if not run_write(lambda: repo.add_student(student_id, name, age, email)):
+            return
         student_window.destroy()
         refresh_treeview()  # Refresh the tree view to reflect the new data
 
@@ -219,13 +423,8 @@ def instructor_window():
         email = instructor_email_entry.get()
         instructor_id = int(id_entry.get())
 
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO instructors (instructor_id, name, age, email)
-            VALUES (?, ?, ?, ?)
-        ''', (instructor_id, name, age, email))
-
-        conn.commit()
+        if not run_write(lambda: repo.add_instructor(instructor_id, name, age, email)):
+            return
         instructor_window.destroy()
         refresh_treeview()
 
@@ -268,25 +467,17 @@ def course_window():
     def add_course():
         course_id = int(id_entry.get())
         course_name = course_name_entry.get()
-        instructor_id = None
 
-        cursor = conn.cursor()
+        def insert_course():
+            with repo.unit_of_work():
+                # Assign the first available instructor, if there is one
+                instructor_id = repo.first_instructor_id()
 
-        # Query the database for available instructors
-        cursor.execute('SELECT instructor_id FROM instructors')
-        available_instructors = cursor.fetchall()
+                # Insert the new course into the database
+                repo.add_course(course_id, course_name, instructor_id)
 
-        # Check if there are any instructors available and assign the first one if needed
-        if available_instructors:
-            instructor_id = available_instructors[0][0]  # Get the first instructor's ID
-
-        # Insert the new course into the database
-        cursor.execute('''
-            INSERT INTO courses (course_id, course_name, instructor_id)
-            VALUES (?, ?, ?)
-        ''', (course_id, course_name, instructor_id))
-
-        conn.commit()
+        if not run_write(insert_course):
+            return
         course_window.destroy()
         refresh_treeview()
 
@@ -311,9 +502,22 @@ def course_window():
 option_button_frame = tk.Frame(main_tab)
 option_button_frame.pack(pady=10, anchor="ne")
 
+restore_button = tk.Button(option_button_frame, text="Restore Backup", command=restore_data)
+restore_button.pack(side="right", padx=10)
+
 save_button = tk.Button(option_button_frame, text="Backup Data", command=backup_data)
 save_button.pack(side="right", padx=10)
 
+export_button = tk.Button(option_button_frame, text="Export", command=export_data)
+export_button.pack(side="right", padx=10)
+
+export_combobox = ttk.Combobox(option_button_frame, values=list(EXPORTS), state="readonly", width=12)
+export_combobox.set(next(iter(EXPORTS)))
+export_combobox.pack(side="right", padx=10)
+
+backup_progress = ttk.Progressbar(option_button_frame, length=150, maximum=100)
+backup_progress.pack(side="right", padx=10)
+
 add_button_frame = tk.Frame(main_tab)
 add_button_frame.pack(pady=10, anchor="center")
 
@@ -366,35 +570,28 @@ def register_course():
     student_name = student_name_for_course_entry.get()
     course_name = selected_course.get()
 
-    cursor = conn.cursor()
-
     # Find the student by name
-    cursor.execute("SELECT student_id FROM students WHERE name = ?", (student_name,))
-    student_row = cursor.fetchone()
+    student_id = repo.find_student_id(student_name)
 
-    if not student_row:
+    if student_id is None:
         messagebox.showerror("Error", "Student not found.")
         return
-    student_id = student_row[0]
 
     # Find the course by name
-    cursor.execute("SELECT course_id FROM courses WHERE course_name = ?", (course_name,))
-    course_row = cursor.fetchone()
+    course_id = repo.find_course_id(course_name)
 
-    if not course_row:
+    if course_id is None:
         messagebox.showerror("Error", "Course not found.")
         return
-    course_id = course_row[0]
 
     # Check if the student is already enrolled in the course
-    cursor.execute("SELECT * FROM enrollments WHERE course_id = ? AND student_id = ?", (course_id, student_id))
-    if cursor.fetchone():
+    if repo.is_enrolled(course_id, student_id):
         messagebox.showerror("Error", "Student is already enrolled in this course.")
         return
 
     # Register the student in the course
-    cursor.execute("INSERT INTO enrollments (course_id, student_id) VALUES (?, ?)", (course_id, student_id))
-    conn.commit()
+    if not run_write(lambda: repo.enroll(course_id, student_id)):
+        return
 
     messagebox.showinfo("Success", f"Student {student_name} has been registered for the course {course_name}.")
 
@@ -433,29 +630,23 @@ def assign_instructor_to_course():
     instructor_name = instructor_name_for_course_entry.get()
     selected_course_name = selected_course_for_instructor.get()
 
-    cursor = conn.cursor()
-
     # Find the instructor by name
-    cursor.execute("SELECT instructor_id FROM instructors WHERE name = ?", (instructor_name,))
-    instructor_row = cursor.fetchone()
+    instructor_id = repo.find_instructor_id(instructor_name)
 
-    if not instructor_row:
+    if instructor_id is None:
         messagebox.showerror("Error", "Instructor not found.")
         return
-    instructor_id = instructor_row[0]
 
     # Find the course by name
-    cursor.execute("SELECT course_id FROM courses WHERE course_name = ?", (selected_course_name,))
-    course_row = cursor.fetchone()
+    course_id = repo.find_course_id(selected_course_name)
 
-    if not course_row:
+    if course_id is None:
         messagebox.showerror("Error", "Course not found.")
         return
-    course_id = course_row[0]
 
     # Assign the instructor to the course
-    cursor.execute("UPDATE courses SET instructor_id = ? WHERE course_id = ?", (instructor_id, course_id))
-    conn.commit()
+    if not run_write(lambda: repo.assign_instructor(course_id, instructor_id)):
+        return
 
     messagebox.showinfo("Success", f"Instructor {instructor_name} has been assigned to the course {selected_course_name}.")
 
@@ -484,51 +675,38 @@ def refresh_treeview():
 
 def delete_record():
     """
-    Deletes a selected record from the database (student, instructor, or course) and refreshes the UI. 
-    Ensures associated enrollments or course assignments are properly handled.
+    Deletes the selected records from the database (students, instructors, or courses) and refreshes the UI.
+    Any number of rows can be selected; they are deleted in one transaction with one statement per record
+    type, and the schema's cascades remove associated enrollments and course assignments.
     
-    :raises sqlite3.Error: If there is an issue deleting the record.
+    :raises sqlite3.Error: If there is an issue deleting the records.
     :return: None
     :rtype: None
     """
-    selected_item = tree.focus()
-    if not selected_item:
+    selected_items = tree.selection() or ((tree.focus(),) if tree.focus() else ())
+    if not selected_items:
         messagebox.showwarning("Selection Error", "Please select a record to delete.")
         return
     
-    # Get the selected item's values
-    item = tree.item(selected_item)
-    values = item['values']
-    record_type = values[0]  # Either "Student", "Instructor", or "Course"
-    record_id = values[3]    # ID of the selected record (student_id, instructor_id, or course_id)
-
-    cursor = conn.cursor()
+    # Each row's values are (type, name, age, id)
+    records = []
+    for selected_item in selected_items:
+        values = tree.item(selected_item)['values']
+        records.append((values[0], values[3]))
+
+    if any(record_type == ARCHIVED_STUDENT for record_type, _ in records):
+        messagebox.showwarning("Selection Error", "Archived records cannot be deleted.")
+        return
 
     try:
-        if record_type == "Student":
-            # Delete student from the students table
-            cursor.execute("DELETE FROM students WHERE student_id = ?", (record_id,))
-            
-            # Delete related enrollments from the enrollments table
-            cursor.execute("DELETE FROM enrollments WHERE student_id = ?", (record_id,))
-
-        elif record_type == "Instructor":
-            # Delete instructor from the instructors table
-            cursor.execute("DELETE FROM instructors WHERE instructor_id = ?", (record_id,))
-            
-            # Unassign the instructor from any courses they were assigned to
-            cursor.execute("UPDATE courses SET instructor_id = NULL WHERE instructor_id = ?", (record_id,))
-
-        elif record_type == "Course":
-            # Delete course from the courses table
-            cursor.execute("DELETE FROM courses WHERE course_id = ?", (record_id,))
-            
-            # Delete related enrollments from the enrollments table
-            cursor.execute("DELETE FROM enrollments WHERE course_id = ?", (record_id,))
-
-        conn.commit()
+        deleted = retry_on_lock(lambda: repo.delete_records(records), conn=conn)
+
+        update_course_combobox()
         refresh_treeview()
-        messagebox.showinfo("Success", f"{record_type} record deleted successfully!")
+        if len(records) == 1:
+            messagebox.showinfo("Success", f"{records[0][0]} record deleted successfully!")
+        else:
+            messagebox.showinfo("Success", f"{deleted} records deleted successfully!")
     
     except Exception as e:
         messagebox.showerror("Error", f"An error occurred while deleting: {e}")
@@ -536,7 +714,9 @@ def delete_record():
 def edit_record_popup():
     """
     Opens a popup window to edit the selected record (student, instructor, or course) in the database. 
-    Updates the record and refreshes the UI upon saving changes.
+    Updates the record and refreshes the UI upon saving changes. No lock is held while the popup is open:
+    the save only applies if the record still has the version that was read, and otherwise the user can
+    overwrite the other change or reload the current values.
     
     :return: None
     :rtype: None
@@ -551,38 +731,37 @@ def edit_record_popup():
     record_type = values[0]  # Either "Student", "Instructor", or "Course"
     record_id = values[3]    # ID of the selected record (student_id, instructor_id, or course_id)
 
-    cursor = conn.cursor()
+    if record_type == ARCHIVED_STUDENT:
+        messagebox.showwarning("Selection Error", "Archived records cannot be edited.")
+        return
 
     # Fetch the current record from the database
     if record_type == "Student":
-        cursor.execute("SELECT * FROM students WHERE student_id = ?", (record_id,))
-        record = cursor.fetchone()
+        record = repo.get_student(record_id)
         if not record:
             messagebox.showerror("Error", "Student not found.")
             return
 
-        # record contains (student_id, name, age, email)
-        name, age, email = record[1], record[2], record[3]
+        # record contains (student_id, name, age, email, version)
+        name, age, email, version = record[1], record[2], record[3], record[4]
 
     elif record_type == "Instructor":
-        cursor.execute("SELECT * FROM instructors WHERE instructor_id = ?", (record_id,))
-        record = cursor.fetchone()
+        record = repo.get_instructor(record_id)
         if not record:
             messagebox.showerror("Error", "Instructor not found.")
             return
 
-        # record contains (instructor_id, name, age, email)
-        name, age, email = record[1], record[2], record[3]
+        # record contains (instructor_id, name, age, email, version)
+        name, age, email, version = record[1], record[2], record[3], record[4]
 
     elif record_type == "Course":
-        cursor.execute("SELECT * FROM courses WHERE course_id = ?", (record_id,))
-        record = cursor.fetchone()
+        record = repo.get_course(record_id)
         if not record:
             messagebox.showerror("Error", "Course not found.")
             return
 
-        # record contains (course_id, course_name, instructor_id)
-        course_name, instructor_id = record[1], record[2]
+        # record contains (course_id, course_name, instructor_id, version)
+        name, instructor_id, version = record[1], record[2], record[3]
 
     # Create a popup window for editing the selected record
     popup = tk.Toplevel(root)
@@ -616,7 +795,21 @@ def edit_record_popup():
         id_entry.pack(pady=5)
         id_entry.insert(0, record_id)
 
+    def reload_entries(current):
+        # Show the values another user saved, and edit from their version onwards
+        nonlocal version
+        version = current[-1]
+        name_entry.delete(0, tk.END)
+        name_entry.insert(0, current[1])
+        if record_type == "Student" or record_type == "Instructor":
+            age_entry.delete(0, tk.END)
+            age_entry.insert(0, current[2])
+            email_entry.delete(0, tk.END)
+            email_entry.insert(0, current[3])
+
     def save_changes():
+        nonlocal version
+
         # Get updated values from the entry fields
         updated_name = name_entry.get()
 
@@ -624,32 +817,39 @@ def edit_record_popup():
             updated_age = int(age_entry.get())
             updated_email = email_entry.get()
 
-        if record_type == "Student":
-            # Update the student record in the database
-            cursor.execute('''
-                UPDATE students 
-                SET name = ?, age = ?, email = ?
-                WHERE student_id = ?
-            ''', (updated_name, updated_age, updated_email, record_id))
-
-        elif record_type == "Instructor":
-            # Update the instructor record in the database
-            cursor.execute('''
-                UPDATE instructors 
-                SET name = ?, age = ?, email = ?
-                WHERE instructor_id = ?
-            ''', (updated_name, updated_age, updated_email, record_id))
-
-        elif record_type == "Course":
-            updated_course_name = name_entry.get()
-            # Update the course record in the database
-            cursor.execute('''
-                UPDATE courses 
-                SET course_name = ?
-                WHERE course_id = ?
-            ''', (updated_course_name, record_id))
-
-        conn.commit()  # Commit the changes to the database
+        def update():
+            # Only applies if nobody saved the record since this popup read it
+            nonlocal version
+            if record_type == "Student":
+                version = repo.update_student(record_id, updated_name, updated_age, updated_email, version)
+            elif record_type == "Instructor":
+                version = repo.update_instructor(record_id, updated_name, updated_age, updated_email, version)
+            elif record_type == "Course":
+                version = repo.update_course_name(record_id, updated_name, version)
+
+        try:
+            saved = run_write(update)
+        except ConflictError as e:
+            if e.current is None:
+                messagebox.showerror("Edit Conflict", f"This {record_type.lower()} was deleted by another user.", parent=popup)
+                refresh_treeview()
+                popup.destroy()
+                return
+
+            if messagebox.askyesno(
+                "Edit Conflict",
+                f"This {record_type.lower()} was changed by another user after you opened it.\n\n"
+                "Yes: save your values over theirs.\nNo: discard your values and show theirs.",
+                parent=popup,
+            ):
+                version = e.current[-1]
+                save_changes()
+            else:
+                reload_entries(e.current)
+            return
+
+        if not saved:
+            return
         refresh_treeview()  # Refresh the treeview to show the updated record
         popup.destroy()  # Close the popup window
 
@@ -659,35 +859,50 @@ def edit_record_popup():
 def display_records(search_term=""):
     """
     Displays records in the Treeview UI element, filtered by a search term if provided. 
-    Fetches students, instructors, and courses from the database.
+    Fetches students, instructors, and courses from the full-text search index, ranked by relevance
+    and capped at ``tk_db_search.SEARCH_LIMIT`` rows. Archived students are listed after them when
+    "Include archived" is checked.
     
     :param search_term: The term used to filter the records by name or ID, defaults to an empty string for no filter.
     :type search_term: str, optional
     :return: None
     :rtype: None
     """
-    cursor = conn.cursor()
-
     # Clear the tree view
     for i in tree.get_children():
         tree.delete(i)
 
-    search_term = search_term.lower()  # Case-insensitive search
+    # Matches come from the full-text index, best match first; repeated refreshes come from the cache
+    rows = repo.cache.get(
+        ("search", search_term.strip()),
+        [table for _, table, _, _, _, _ in SEARCHABLE_TABLES],
+        lambda: search_index(conn, search_term),
+    )
+    for record_type, name, age, record_id in rows:
+        tree.insert("", "end", iid=record_iid(record_type, record_id), values=(record_type, name, "" if age is None else age, record_id))
 
-    # Display Students
-    cursor.execute("SELECT student_id, name, age FROM students WHERE LOWER(name) LIKE ? OR CAST(student_id AS TEXT) LIKE ?", ('%' + search_term + '%', '%' + search_term + '%'))
-    for row in cursor.fetchall():
-        tree.insert("", "end", values=("Student", row[1], row[2], row[0]))
+    if include_archived.get():
+        # Archived rows are read-only and keyed apart from live records with the same ID
+        for _, name, age, record_id in search_archive(conn, search_term, path=ARCHIVE_PATH):
+            tree.insert("", "end", iid=record_iid(ARCHIVED_STUDENT, record_id), values=(ARCHIVED_STUDENT, name, "" if age is None else age, record_id))
 
-    # Display Instructors
-    cursor.execute("SELECT instructor_id, name, age FROM instructors WHERE LOWER(name) LIKE ? OR CAST(instructor_id AS TEXT) LIKE ?", ('%' + search_term + '%', '%' + search_term + '%'))
-    for row in cursor.fetchall():
-        tree.insert("", "end", values=("Instructor", row[1], row[2], row[0]))
+    update_record_summary()
 
-    # Display Courses
-    cursor.execute("SELECT course_id, course_name FROM courses WHERE LOWER(course_name) LIKE ? OR CAST(course_id AS TEXT) LIKE ?", ('%' + search_term + '%', '%' + search_term + '%'))
-    for row in cursor.fetchall():
-        tree.insert("", "end", values=("Course", row[1], "", row[0]))
+
+def update_record_summary():
+    """
+    Shows the number of records per table and the query cache statistics below the records.
+    
+    :return: None
+    :rtype: None
+    """
+    counts = repo.counts()
+    stats = repo.cache.stats()
+    summary_label.config(
+        text=f"Students: {counts['students']}   Instructors: {counts['instructors']}   "
+             f"Courses: {counts['courses']}   Enrollments: {counts['enrollments']}   |   "
+             f"Cache: {stats['hits']} hits / {stats['misses']} misses"
+    )
 
 
 
@@ -708,8 +923,15 @@ search_entry.pack(pady=5, anchor="w", fill="x")
 search_button = tk.Button(records_tab, text="Search", command=search_records)
 search_button.pack(pady=5, anchor="w")
 
+# Record type shown for rows found in the archive
+ARCHIVED_STUDENT = "Archived Student"
+
+include_archived = tk.BooleanVar(records_tab, value=False)
+include_archived_button = tk.Checkbutton(records_tab, text="Include archived", variable=include_archived, command=search_records)
+include_archived_button.pack(pady=5, anchor="w")
+
 # Create Treeview widget in the "Records" tab
-tree = ttk.Treeview(records_tab, columns=("Type", "Name", "Age", "ID"), show="headings")
+tree = ttk.Treeview(records_tab, columns=("Type", "Name", "Age", "ID"), show="headings", selectmode="extended")
 tree.heading("Type", text="Type")
 tree.heading("Name", text="Name")
 tree.heading("Age", text="Age")
@@ -721,16 +943,161 @@ scrollbar_y = ttk.Scrollbar(records_tab, orient="vertical", command=tree.yview)
 scrollbar_y.pack(side="right", fill="y")
 tree.config(yscrollcommand=scrollbar_y.set)
 
+summary_label = tk.Label(records_tab, anchor="w")
+summary_label.pack(fill="x")
+
 button_frame = tk.Frame(records_tab)
 button_frame.pack(pady=10)
 
 edit_button = tk.Button(button_frame, text="Edit Record", command=edit_record_popup)
 edit_button.pack(side="left", padx=10)
 
-delete_button = tk.Button(button_frame, text="Delete Record", command=delete_record)
+delete_button = tk.Button(button_frame, text="Delete Selected", command=delete_record)
 delete_button.pack(side="left", padx=10)
 
-init_db()
-update_course_combobox()
-display_records()
-root.mainloop()
\ No newline at end of file
+# Report selection and table in the "Reports" tab
+REPORTS = {
+    "Students per course": (("Course", "Students", "Average Age"), "course"),
+    "Courses per instructor": (("Instructor", "Courses"), "instructor"),
+}
+
+def show_report(event=None):
+    """
+    Displays the report selected in the reports combobox. Reports are read from the summary tables,
+    which the database keeps up to date on every insert, update and delete.
+    
+    :param event: The combobox selection event, if called from one.
+    :type event: tkinter.Event, optional
+    :return: None
+    :rtype: None
+    """
+    if repo is None:
+        # The database is still being opened; open_database shows the report once it is ready
+        return
+
+    columns, report = REPORTS[report_combobox.get()]
+
+    for i in report_tree.get_children():
+        report_tree.delete(i)
+
+    report_tree.config(columns=columns)
+    for column in columns:
+        report_tree.heading(column, text=column)
+
+    if report == "course":
+        for _, course_name, student_count, average_age in repo.course_report():
+            report_tree.insert("", "end", values=(course_name, student_count, "" if average_age is None else average_age))
+    else:
+        for _, name, course_count in repo.instructor_report():
+            report_tree.insert("", "end", values=(name, course_count))
+
+report_button_frame = tk.Frame(reports_tab)
+report_button_frame.pack(pady=5, fill="x")
+
+selected_report = tk.StringVar(reports_tab)
+report_combobox = ttk.Combobox(report_button_frame, textvariable=selected_report, values=list(REPORTS), state="readonly")
+report_combobox.set(next(iter(REPORTS)))
+report_combobox.bind("<<ComboboxSelected>>", show_report)
+report_combobox.pack(side="left", padx=10)
+
+report_refresh_button = tk.Button(report_button_frame, text="Refresh", command=show_report)
+report_refresh_button.pack(side="left", padx=10)
+
+report_tree = ttk.Treeview(reports_tab, show="headings")
+report_tree.pack(expand=True, fill="both")
+
+# Reports are cheap to redraw, so show current numbers whenever a tab is opened
+notebook.bind("<<NotebookTabChanged>>", show_report)
+
+def poll_changes():
+    """
+    Applies the changes other instances committed since the last poll, then schedules the next poll.
+    Falls back to a full reload if this window fell so far behind that the changes were pruned.
+    
+    :return: None
+    :rtype: None
+    """
+    changes = change_feed.poll()
+
+    if changes is None:
+        repo.cache.clear()
+        update_course_combobox()
+        refresh_treeview()
+        show_report()
+    elif changes:
+        apply_changes(changes)
+
+    root.after(POLL_INTERVAL_MS, poll_changes)
+
+def apply_changes(changes):
+    """
+    Updates only the affected Treeview rows, course lists and cached lookups for a batch of changes.
+    New records are added to the list unless a search filter is active.
+    
+    :param changes: Tuples of ``(seq, table_name, row_id, op)`` from the change log.
+    :type changes: list
+    :return: None
+    :rtype: None
+    """
+    latest = compact_changes(changes)
+
+    # Cached lookups of every changed table are stale
+    repo.cache.invalidate(*latest)
+
+    for table_name, operations in latest.items():
+        if table_name not in RECORD_TYPES:
+            continue
+        record_type = RECORD_TYPES[table_name]
+
+        current = changed_rows(conn, table_name, [row_id for row_id, op in operations.items() if op != 'D'])
+        for row_id in operations:
+            iid = record_iid(record_type, row_id)
+            row = current.get(row_id)
+
+            if row is None:
+                if tree.exists(iid):
+                    tree.delete(iid)
+                continue
+
+            values = (row[0], row[1], "" if row[2] is None else row[2], row[3])
+            if tree.exists(iid):
+                tree.item(iid, values=values)
+            elif not search_entry.get().strip():
+                tree.insert("", "end", iid=iid, values=values)
+
+    if "courses" in latest:
+        # Refresh the choices without resetting what the user already selected
+        course_names = repo.course_names()
+        course_combobox['values'] = course_names
+        course_combobox_for_instructor['values'] = course_names
+
+    update_record_summary()
+    show_report()
+
+# Buttons that need the database stay disabled until open_database has run
+database_widgets = [
+    restore_button, save_button, export_button, student_button, instructor_button, course_button,
+    register_button, assign_instructor_button, search_button, include_archived_button, edit_button,
+    delete_button, report_refresh_button,
+]
+
+def main():
+    """
+    Shows the window, then opens the database in the background and runs the event loop.
+    
+    :return: None
+    :rtype: None
+    """
+    for widget in database_widgets:
+        widget.config(state="disabled")
+
+    # Draw the first frame before any database work starts
+    root.update()
+    if STARTUP_TRACE:
+        print(f"first_frame {1000 * (time.perf_counter() - STARTED):.1f} ms", flush=True)
+
+    start_database()
+    root.mainloop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,303 @@
+import argparse
+import json
+import os
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from tk_db_export import EXPORTS
+from tk_db_repository import SELECT_COUNTS, connect
+from tk_db_schema import migrate
+from tk_db_search import MIN_INDEXED_TERM, TOKENIZER, match_expression, search_records
+from tk_db_writer import BUSY_TIMEOUT, retry_on_lock
+
+# Name under which the archive database is attached to a connection
+ARCHIVE_SCHEMA = 'archive'
+
+# Enrollments older than this are archived when no cutoff is given
+ARCHIVE_AFTER_DAYS = 730
+
+# Rows moved per transaction; large enough to be fast, small enough not to hold the write lock for long
+ARCHIVE_BATCH = 5000
+
+# Default number of rows returned by an archive search
+ARCHIVE_SEARCH_LIMIT = 500
+
+ARCHIVE_TABLES = (
+    f'''CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.archived_students (
+        student_id INTEGER PRIMARY KEY,
+        name TEXT,
+        age INTEGER,
+        email TEXT,
+        archived_at TEXT NOT NULL
+    )''',
+    # The course name is copied, so an archived enrollment stays readable after its course is deleted
+    f'''CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.archived_enrollments (
+        course_id INTEGER NOT NULL,
+        course_name TEXT,
+        student_id INTEGER NOT NULL,
+        enrolled_at TEXT,
+        archived_at TEXT NOT NULL
+    )''',
+    f'''CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.archived_enrollments_student_id
+        ON archived_enrollments (student_id)''',
+    f'''CREATE VIRTUAL TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.archived_students_fts
+        USING fts5(name, ident, tokenize='{TOKENIZER}')''',
+    f'''CREATE TRIGGER IF NOT EXISTS {ARCHIVE_SCHEMA}.archived_students_fts_ai AFTER INSERT ON archived_students BEGIN
+        INSERT INTO archived_students_fts (rowid, name, ident)
+        VALUES (new.student_id, new.name, CAST(new.student_id AS TEXT));
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {ARCHIVE_SCHEMA}.archived_students_fts_ad AFTER DELETE ON archived_students BEGIN
+        DELETE FROM archived_students_fts WHERE rowid = old.student_id;
+    END''',
+)
+
+SELECT_OLD_ENROLLMENTS = "SELECT rowid, student_id FROM main.enrollments WHERE enrolled_at < ? LIMIT ?"
+COPY_ENROLLMENTS = f'''
+    INSERT INTO {ARCHIVE_SCHEMA}.archived_enrollments (course_id, course_name, student_id, enrolled_at, archived_at)
+    SELECT e.course_id, c.course_name, e.student_id, e.enrolled_at, CURRENT_TIMESTAMP
+    FROM main.enrollments e LEFT JOIN main.courses c ON c.course_id = e.course_id
+    WHERE e.rowid IN (SELECT value FROM json_each(?))
+'''
+DELETE_ENROLLMENTS = "DELETE FROM main.enrollments WHERE rowid IN (SELECT value FROM json_each(?))"
+
+# Of the students whose enrollments a run archived, those with none left in the live tables. IDs are
+# typed in by users and may be reused, so a student whose ID is already archived stays live rather
+# than replacing the archived one.
+SELECT_INACTIVE_STUDENTS = f'''
+    SELECT s.student_id FROM main.students s
+    WHERE s.student_id IN (SELECT value FROM json_each(?))
+      AND NOT EXISTS (SELECT 1 FROM main.enrollments e WHERE e.student_id = s.student_id)
+      AND NOT EXISTS (SELECT 1 FROM {ARCHIVE_SCHEMA}.archived_students a WHERE a.student_id = s.student_id)
+'''
+COPY_STUDENTS = f'''
+    INSERT INTO {ARCHIVE_SCHEMA}.archived_students (student_id, name, age, email, archived_at)
+    SELECT student_id, name, age, email, CURRENT_TIMESTAMP FROM main.students
+    WHERE student_id IN (SELECT value FROM json_each(?))
+'''
+DELETE_STUDENTS = "DELETE FROM main.students WHERE student_id IN (SELECT value FROM json_each(?))"
+
+SELECT_ARCHIVED_ENROLLMENTS = f'''
+    SELECT course_id, course_name, enrolled_at, archived_at FROM {ARCHIVE_SCHEMA}.archived_enrollments
+    WHERE student_id = ? ORDER BY enrolled_at
+'''
+
+# Queries the application runs all the time, timed before and after archiving
+HOT_QUERIES = {
+    "record counts": lambda conn: conn.execute(SELECT_COUNTS).fetchall(),
+    "first page of records": lambda conn: search_records(conn, ""),
+    "short name search": lambda conn: search_records(conn, "a"),
+    "course rosters": lambda conn: conn.execute(EXPORTS["rosters"][0]).fetchall(),
+}
+
+
+def archive_path(db_path):
+    """
+    Returns the archive file that belongs to a database file.
+
+    :param db_path: Path of the live database file.
+    :type db_path: str
+    :return: The path with ``_archive`` added before the extension.
+    :rtype: str
+    """
+    root, extension = os.path.splitext(db_path)
+    return f"{root}_archive{extension or '.db'}"
+
+
+def is_attached(conn):
+    """
+    :return: True if an archive database is attached to the connection.
+    :rtype: bool
+    """
+    return any(row[1] == ARCHIVE_SCHEMA for row in conn.execute("PRAGMA database_list"))
+
+
+def attach_archive(conn, path):
+    """
+    Attaches the archive database as ``archive``, creating the file and its tables if needed.
+
+    :param conn: The open connection to the school database, outside of a transaction.
+    :type conn: sqlite3.Connection
+    :param path: Path of the archive file.
+    :type path: str
+    :return: None
+    :rtype: None
+    """
+    if not is_attached(conn):
+        conn.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (path,))
+    for statement in ARCHIVE_TABLES:
+        conn.execute(statement)
+    conn.commit()
+
+
+def _move(conn, select, params, statements):
+    # One batch, in one transaction covering both database files; the rows are identified by the first
+    # column of ``select`` and the last statement deletes the live rows. Returns the rows moved.
+    def run():
+        conn.execute("BEGIN IMMEDIATE")
+        rows = conn.execute(select, params).fetchall()
+        ids = json.dumps([row[0] for row in rows])
+        for statement in statements:
+            conn.execute(statement, (ids,))
+        conn.commit()
+        return rows
+
+    return retry_on_lock(run, conn=conn)
+
+
+def archive(conn, cutoff, path, batch_size=ARCHIVE_BATCH, inactive_students=True, on_progress=None):
+    """
+    Moves enrollments made before ``cutoff`` into the archive database in batches, then, optionally,
+    the students whose enrollments were just archived and who have none left in the live tables. A
+    student whose ID is already in the archive, from an earlier student with the same ID, is left in
+    the live tables.
+
+    Each batch is copied and deleted in one transaction that spans both files, so a record is never
+    lost or present in both places. The live tables' triggers keep the summary tables, search index
+    and change log current, so open windows drop the archived rows on their next poll.
+
+    :param conn: The open connection to the school database, outside of a transaction.
+    :type conn: sqlite3.Connection
+    :param cutoff: Enrollments dated before this ``YYYY-MM-DD`` date (or timestamp) are archived.
+    :type cutoff: str
+    :param path: Path of the archive file.
+    :type path: str
+    :param batch_size: Rows moved per transaction, defaults to ``ARCHIVE_BATCH``.
+    :type batch_size: int, optional
+    :param inactive_students: Also archive the students this run leaves without live enrollments, defaults to True.
+    :type inactive_students: bool, optional
+    :param on_progress: Called with ``(table name, rows moved so far)`` after every batch, defaults to None.
+    :type on_progress: callable, optional
+    :return: Number of rows moved per table.
+    :rtype: dict
+    """
+    attach_archive(conn, path)
+    moved = {"enrollments": 0, "students": 0}
+    students = set()
+
+    while True:
+        rows = _move(conn, SELECT_OLD_ENROLLMENTS, (cutoff, batch_size), (COPY_ENROLLMENTS, DELETE_ENROLLMENTS))
+        if not rows:
+            break
+        students.update(student_id for _, student_id in rows)
+        moved["enrollments"] += len(rows)
+        if on_progress:
+            on_progress("enrollments", moved["enrollments"])
+
+    if inactive_students:
+        students = sorted(students)
+        for start in range(0, len(students), batch_size):
+            batch = json.dumps(students[start:start + batch_size])
+            rows = _move(conn, SELECT_INACTIVE_STUDENTS, (batch,), (COPY_STUDENTS, DELETE_STUDENTS))
+            moved["students"] += len(rows)
+            if on_progress:
+                on_progress("students", moved["students"])
+
+    return moved
+
+
+def search_archive(conn, search_term="", limit=ARCHIVE_SEARCH_LIMIT, path=None):
+    """
+    Searches archived students by name or ID, the same way ``tk_db_search.search_records`` searches
+    the live records. The archive is only attached when it is first searched.
+
+    :param conn: The open connection to the school database.
+    :type conn: sqlite3.Connection
+    :param search_term: The term used to filter the records, defaults to an empty string for no filter.
+    :type search_term: str, optional
+    :param limit: The maximum number of rows to return, defaults to ``ARCHIVE_SEARCH_LIMIT``.
+    :type limit: int, optional
+    :param path: Path of the archive file, needed if it is not attached yet.
+    :type path: str, optional
+    :return: Rows of ``("Student", name, age, id)``, best match first; empty if there is no archive.
+    :rtype: list
+    """
+    if not is_attached(conn):
+        if path is None or not os.path.exists(path):
+            return []
+        attach_archive(conn, path)
+
+    search_term = search_term.strip()
+    if not search_term:
+        return conn.execute(
+            f"SELECT 'Student', name, age, student_id FROM {ARCHIVE_SCHEMA}.archived_students "
+            "ORDER BY student_id LIMIT ?", (limit,)
+        ).fetchall()
+
+    if len(search_term) < MIN_INDEXED_TERM:
+        pattern = "%" + search_term.lower() + "%"
+        return conn.execute(
+            f"SELECT 'Student', name, age, student_id FROM {ARCHIVE_SCHEMA}.archived_students "
+            "WHERE LOWER(name) LIKE ? OR CAST(student_id AS TEXT) LIKE ? LIMIT ?", (pattern, pattern, limit)
+        ).fetchall()
+
+    return conn.execute(
+        f"SELECT 'Student', t.name, t.age, t.student_id FROM {ARCHIVE_SCHEMA}.archived_students_fts f "
+        f"JOIN {ARCHIVE_SCHEMA}.archived_students t ON t.student_id = f.rowid "
+        "WHERE archived_students_fts MATCH ? ORDER BY f.rank LIMIT ?", (match_expression(search_term), limit)
+    ).fetchall()
+
+
+def archived_enrollments(conn, student_id):
+    """
+    :return: Rows of ``(course_id, course_name, enrolled_at, archived_at)`` for an archived student,
+        oldest first. The archive must be attached.
+    :rtype: list
+    """
+    return conn.execute(SELECT_ARCHIVED_ENROLLMENTS, (student_id,)).fetchall()
+
+
+def time_hot_queries(conn, repeat=5):
+    """
+    Times each of ``HOT_QUERIES``.
+
+    :param conn: The open connection to the school database.
+    :type conn: sqlite3.Connection
+    :param repeat: Runs per query; the median is reported, defaults to 5.
+    :type repeat: int, optional
+    :return: Median milliseconds per query name.
+    :rtype: dict
+    """
+    timings = {}
+    for name, query in HOT_QUERIES.items():
+        runs = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            query(conn)
+            runs.append(1000 * (time.perf_counter() - start))
+        timings[name] = statistics.median(runs)
+    return timings
+
+
+def main():
+    """
+    Archives old enrollments and inactive students of a tk_db database and prints how much faster the
+    hot queries became.
+    """
+    default_cutoff = (datetime.now() - timedelta(days=ARCHIVE_AFTER_DAYS)).strftime('%Y-%m-%d')
+    parser = argparse.ArgumentParser(description="Move old tk_db enrollments and inactive students to an archive database.")
+    parser.add_argument('--db', default='school_management.db')
+    parser.add_argument('--archive', help="archive file, defaults to the database name with _archive added")
+    parser.add_argument('--before', default=default_cutoff, help="archive enrollments made before this date (YYYY-MM-DD)")
+    parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH)
+    parser.add_argument('--keep-students', action='store_true', help="only archive enrollments")
+    args = parser.parse_args()
+
+    conn = connect(args.db, timeout=BUSY_TIMEOUT)
+    migrate(conn)
+
+    before = time_hot_queries(conn)
+    moved = archive(conn, args.before, args.archive or archive_path(args.db), batch_size=args.batch_size,
+                    inactive_students=not args.keep_students,
+                    on_progress=lambda table, count: print(f"\r{table}: {count:,} archived", end="", flush=True))
+    print()
+    after = time_hot_queries(conn)
+    conn.close()
+
+    print(f"Archived {moved['enrollments']:,} enrollments and {moved['students']:,} students made before {args.before}")
+    for name in HOT_QUERIES:
+        print(f"{name:<24} {before[name]:>9.2f} ms -> {after[name]:>9.2f} ms  ({before[name] / max(after[name], 1e-6):.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+# Where timestamped backups are written and how many of them are kept
+BACKUP_DIR = 'backups'
+BACKUP_PREFIX = 'school_management_'
+BACKUP_SUFFIX = '.db'
+BACKUP_KEEP = 10
+
+# Pages copied per backup step; the source is unlocked between steps so the app can keep writing
+BACKUP_PAGES = 256
+BACKUP_STEP_SLEEP = 0.005
+
+
+class BackupManager:
+    """
+    Creates, rotates and restores online backups of a SQLite database file.
+
+    Backups are copied with the stepped SQLite backup API (``pages=``/``progress=``) on a worker
+    thread, so the application stays responsive and keeps writing while a copy is in progress.
+    Each backup goes to its own timestamped file and only the newest ``keep`` files are retained.
+
+    The worker threads use their own connections. Callbacks are invoked on the worker thread, so
+    GUI code must hand them over to its own thread (for example through a queue polled with ``after``).
+
+    :param db_path: Path of the live database file.
+    :type db_path: str
+    :param backup_dir: Directory that holds the backups, defaults to ``BACKUP_DIR``.
+    :type backup_dir: str, optional
+    :param keep: Number of backups kept by the retention policy, defaults to ``BACKUP_KEEP``.
+    :type keep: int, optional
+    :param pages: Pages copied per backup step, defaults to ``BACKUP_PAGES``.
+    :type pages: int, optional
+    """
+    def __init__(self, db_path, backup_dir=BACKUP_DIR, keep=BACKUP_KEEP, pages=BACKUP_PAGES):
+        """
+        Initialize a new BackupManager for the given database file.
+        """
+        if keep < 1:
+            raise ValueError("At least one backup must be kept")
+
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.keep = keep
+        self.pages = pages
+        self._lock = threading.Lock()
+
+    def list_backups(self):
+        """
+        Lists the backups in the backup directory, newest first.
+
+        :return: Paths of the backup files.
+        :rtype: list
+        """
+        if not os.path.isdir(self.backup_dir):
+            return []
+
+        names = [
+            name for name in os.listdir(self.backup_dir)
+            if name.startswith(BACKUP_PREFIX) and name.endswith(BACKUP_SUFFIX)
+        ]
+        # The timestamp (and collision counter) in the name sorts chronologically once the suffix is dropped
+        names.sort(key=lambda name: name[:-len(BACKUP_SUFFIX)], reverse=True)
+        return [os.path.join(self.backup_dir, name) for name in names]
+
+    def new_backup_path(self):
+        """
+        Returns an unused, timestamped path for the next backup.
+
+        :return: Path of the new backup file.
+        :rtype: str
+        """
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(self.backup_dir, f'{BACKUP_PREFIX}{stamp}{BACKUP_SUFFIX}')
+        counter = 1
+        while os.path.exists(path):
+            path = os.path.join(self.backup_dir, f'{BACKUP_PREFIX}{stamp}-{counter}{BACKUP_SUFFIX}')
+            counter += 1
+        return path
+
+    def backup(self, on_progress=None):
+        """
+        Copies the live database into a new timestamped backup file and applies the retention policy.
+        Blocks until the copy is complete; use ``start_backup`` to run it on a worker thread.
+
+        The copy is written to a temporary file and renamed once complete, so an interrupted backup
+        never shows up in ``list_backups``.
+
+        :param on_progress: Called with ``(copied_pages, total_pages)`` after every step, defaults to None.
+        :type on_progress: callable, optional
+        :raises sqlite3.Error: If the backup cannot be written.
+        :return: Path of the new backup file.
+        :rtype: str
+        """
+        with self._lock:
+            os.makedirs(self.backup_dir, exist_ok=True)
+            path = self.new_backup_path()
+            partial_path = path + '.partial'
+
+            try:
+                self._copy(self.db_path, partial_path, on_progress)
+            except Exception:
+                if os.path.exists(partial_path):
+                    os.remove(partial_path)
+                raise
+            os.replace(partial_path, path)
+            self.rotate()
+            return path
+
+    def restore(self, backup_path, on_progress=None):
+        """
+        Copies a backup over the live database. Other connections to the live file stay open and see
+        the restored data on their next query, so the application does not need to restart.
+
+        :param backup_path: The backup file to restore.
+        :type backup_path: str
+        :param on_progress: Called with ``(copied_pages, total_pages)`` after every step, defaults to None.
+        :type on_progress: callable, optional
+        :raises ValueError: If the backup file is missing or fails the integrity check.
+        :raises sqlite3.Error: If the restore cannot be written.
+        :return: None
+        :rtype: None
+        """
+        with self._lock:
+            if not os.path.isfile(backup_path):
+                raise ValueError(f"Backup not found: {backup_path}")
+
+            # Refuse to overwrite the live data with a damaged file
+            check_conn = sqlite3.connect(f'file:{backup_path}?mode=ro', uri=True)
+            try:
+                result = check_conn.execute("PRAGMA quick_check").fetchone()[0]
+            finally:
+                check_conn.close()
+            if result != 'ok':
+                raise ValueError(f"Backup failed the integrity check: {result}")
+
+            self._copy(backup_path, self.db_path, on_progress)
+
+    def rotate(self):
+        """
+        Deletes the oldest backups so that at most ``keep`` remain.
+
+        :return: Paths of the deleted backups.
+        :rtype: list
+        """
+        expired = self.list_backups()[self.keep:]
+        for path in expired:
+            os.remove(path)
+        return expired
+
+    def start_backup(self, on_progress=None, on_done=None):
+        """
+        Runs ``backup`` on a worker thread.
+
+        :param on_progress: Called with ``(copied_pages, total_pages)`` after every step, defaults to None.
+        :type on_progress: callable, optional
+        :param on_done: Called with ``(backup_path, None)`` on success or ``(None, error)`` on failure, defaults to None.
+        :type on_done: callable, optional
+        :return: The started worker thread.
+        :rtype: threading.Thread
+        """
+        return self._start(self.backup, (on_progress,), on_done)
+
+    def start_restore(self, backup_path, on_progress=None, on_done=None):
+        """
+        Runs ``restore`` on a worker thread.
+
+        :param backup_path: The backup file to restore.
+        :type backup_path: str
+        :param on_progress: Called with ``(copied_pages, total_pages)`` after every step, defaults to None.
+        :type on_progress: callable, optional
+        :param on_done: Called with ``(backup_path, None)`` on success or ``(None, error)`` on failure, defaults to None.
+        :type on_done: callable, optional
+        :return: The started worker thread.
+        :rtype: threading.Thread
+        """
+        def restore():
+            self.restore(backup_path, on_progress)
+            return backup_path
+
+        return self._start(restore, (), on_done)
+
+    def _start(self, job, args, on_done):
+        def run():
+            try:
+                result = job(*args)
+            except Exception as e:
+                if on_done:
+                    on_done(None, e)
+                return
+            if on_done:
+                on_done(result, None)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def _copy(self, source_path, target_path, on_progress):
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(target_path)
+
+        def progress(status, remaining, total):
+            if on_progress:
+                on_progress(total - remaining, total)
+            # Give other connections a chance to take the lock between steps
+            time.sleep(BACKUP_STEP_SLEEP)
+
+        try:
+            source.backup(target, pages=self.pages, progress=progress)
+        finally:
+            target.close()
+            source.close()
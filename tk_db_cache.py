@@ -0,0 +1,96 @@
+from collections import OrderedDict, defaultdict
+
+# Entries kept before the least recently used one is evicted
+CACHE_MAX_ENTRIES = 256
+
+
+class QueryCache:
+    """
+    A read-through cache for query results, invalidated by table.
+
+    Every entry records the tables its query reads. Write paths call ``invalidate`` with the tables
+    they modify and every entry that depends on one of them is dropped, so the next read goes back
+    to the database. Hits and misses are counted to show how often the UI is served from memory.
+
+    The cache only sees writes made through this process. Changes made by other processes must be
+    reported with ``invalidate`` (or ``clear``) by whoever notices them.
+
+    :param max_entries: Number of results kept before the least recently used one is evicted, defaults to ``CACHE_MAX_ENTRIES``.
+    :type max_entries: int, optional
+    """
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        """
+        Initialize a new, empty QueryCache.
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._keys_by_table = defaultdict(set)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, tables, loader):
+        """
+        Returns the cached result for ``key``, calling ``loader`` to compute and store it on a miss.
+
+        :param key: Identifies the query and its parameters; must be hashable.
+        :type key: tuple
+        :param tables: Names of the tables the query reads.
+        :type tables: iterable
+        :param loader: Runs the query; called without arguments.
+        :type loader: callable
+        :return: The query result.
+        """
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+        self.misses += 1
+        value = loader()
+        tables = frozenset(tables)
+        self._entries[key] = (value, tables)
+        for table in tables:
+            self._keys_by_table[table].add(key)
+        if len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+        return value
+
+    def _drop(self, key):
+        # Removes an entry and its key from the index of every table it reads
+        _, tables = self._entries.pop(key)
+        for table in tables:
+            keys = self._keys_by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_table[table]
+
+    def invalidate(self, *tables):
+        """
+        Drops every cached result that reads one of the given tables.
+
+        :param tables: Names of the modified tables.
+        :type tables: str
+        :return: None
+        :rtype: None
+        """
+        for table in tables:
+            for key in list(self._keys_by_table.get(table, ())):
+                self._drop(key)
+
+    def clear(self):
+        """
+        Drops every cached result, for example after the whole database was restored.
+
+        :return: None
+        :rtype: None
+        """
+        self._entries.clear()
+        self._keys_by_table.clear()
+
+    def stats(self):
+        """
+        :return: The number of ``hits``, ``misses`` and cached ``entries``.
+        :rtype: dict
+        """
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
@@ -0,0 +1,176 @@
+try:
+    import numpy as np
+except ImportError:
+    # numpy is only needed for the analytics readers; the application itself does not use it
+    np = None
+
+# Rows read per chunk; each chunk is converted into the same preallocated buffer
+CHUNK_ROWS = 65536
+
+# Stored for NULL in integer columns and for NULL strings in dictionary-encoded columns
+NULL_INTEGER = -1
+
+# Code type of dictionary-encoded string columns
+STRING = "str"
+
+# Column names and types of each table; STRING columns are dictionary-encoded into int32 codes
+TABLE_COLUMNS = {
+    "students": (("student_id", "int64"), ("name", STRING), ("age", "int16"), ("email", STRING)),
+    "instructors": (("instructor_id", "int64"), ("name", STRING), ("age", "int16"), ("email", STRING)),
+    "courses": (("course_id", "int64"), ("course_name", STRING), ("instructor_id", "int64")),
+    "enrollments": (("course_id", "int64"), ("student_id", "int64"), ("enrolled_at", STRING)),
+}
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("numpy is required for columnar reads; install it with 'pip install numpy'")
+
+
+class ColumnarReader:
+    """
+    Reads the result of a query in chunks into a NumPy structured array, one typed field per column.
+
+    Integer columns are stored as the given integer type with ``NULL_INTEGER`` for NULL. String columns
+    are dictionary-encoded: the field holds ``int32`` codes into ``dictionaries[column]``, so a repeated
+    name or date is stored once however many rows contain it. SQLite does the encoding itself: each
+    string column's distinct values are first collected into a temporary table, and the rows are then
+    read joined to it, so every row reaches Python as a tuple of integers that NumPy copies straight
+    into the buffer and no string object is created per row.
+
+    Every chunk is written into the same preallocated buffer. The array yielded by ``chunks`` is a view
+    of that buffer and is overwritten by the next chunk; call ``copy()`` on it to keep it.
+
+    :param conn: The open connection to the school database.
+    :type conn: sqlite3.Connection
+    :param query: The SELECT to read; its result column names must match ``columns``. Queries with string
+        columns run twice (once to collect the dictionaries), so they should be deterministic.
+    :type query: str
+    :param columns: Pairs of ``(column name, type)``, where the type is a NumPy integer or float dtype such
+        as ``"int64"``, or ``STRING`` for dictionary encoding.
+    :type columns: tuple
+    :param params: The query's parameters, defaults to none.
+    :type params: tuple, optional
+    :param chunk_size: Rows per chunk, defaults to ``CHUNK_ROWS``.
+    :type chunk_size: int, optional
+    :raises ImportError: If numpy is not installed.
+    """
+    def __init__(self, conn, query, columns, params=(), chunk_size=CHUNK_ROWS):
+        """
+        Initialize a new ColumnarReader and allocate its buffer.
+        """
+        _require_numpy()
+        self.conn = conn
+        self.source = query
+        self.columns = tuple(columns)
+        self.params = tuple(params)
+        self.chunk_size = chunk_size
+        self.dtype = np.dtype([(name, "int32" if kind == STRING else kind) for name, kind in self.columns])
+        self.dictionaries = {name: [] for name, kind in self.columns if kind == STRING}
+        self._buffer = np.empty(chunk_size, dtype=self.dtype)
+
+        # One temporary dictionary table per string column, named after this reader
+        self._tables = {name: f"tk_columnar_{id(self)}_{i}" for i, name in enumerate(self.dictionaries)}
+
+        selected = []
+        joins = []
+        for name, kind in self.columns:
+            if kind == STRING:
+                table = self._tables[name]
+                selected.append(f"COALESCE({table}.code, {NULL_INTEGER})")
+                joins.append(f'LEFT JOIN temp.{table} ON {table}.value = q."{name}"')
+            elif np.dtype(kind).kind in "iu":
+                selected.append(f'COALESCE(q."{name}", {NULL_INTEGER})')
+            else:
+                selected.append(f'q."{name}"')
+        self.query = f"SELECT {', '.join(selected)} FROM ({query}) q {' '.join(joins)}"
+
+    def _build_dictionaries(self):
+        in_transaction = self.conn.in_transaction
+        for name, table in self._tables.items():
+            self.conn.execute(f"DROP TABLE IF EXISTS temp.{table}")
+            # Codes start at 0, in the order the values were first collected
+            self.conn.execute(f"CREATE TEMP TABLE {table} (code INTEGER PRIMARY KEY, value UNIQUE)")
+            self.conn.execute(
+                f'INSERT INTO temp.{table} (code, value) '
+                f'SELECT ROW_NUMBER() OVER () - 1, value FROM (SELECT DISTINCT "{name}" AS value FROM ({self.source}) '
+                f'WHERE "{name}" IS NOT NULL)',
+                self.params,
+            )
+            self.dictionaries[name] = [row[0] for row in self.conn.execute(f"SELECT value FROM temp.{table} ORDER BY code")]
+        if not in_transaction and self.conn.in_transaction:
+            self.conn.commit()
+
+    def _drop_dictionaries(self):
+        for table in self._tables.values():
+            self.conn.execute(f"DROP TABLE IF EXISTS temp.{table}")
+
+    def chunks(self):
+        """
+        Runs the query and yields its rows chunk by chunk.
+
+        :return: Views of the reused buffer holding up to ``chunk_size`` rows each.
+        :rtype: generator
+        """
+        self._build_dictionaries()
+        try:
+            cursor = self.conn.execute(self.query, self.params)
+            while True:
+                rows = cursor.fetchmany(self.chunk_size)
+                if not rows:
+                    return
+                chunk = self._buffer[:len(rows)]
+                # Tuples of numbers convert to records without any Python-level work per row
+                chunk[...] = rows
+                yield chunk
+        finally:
+            self._drop_dictionaries()
+
+    def read(self):
+        """
+        Reads the whole result into one array.
+
+        :return: The rows, in their own array.
+        :rtype: numpy.ndarray
+        """
+        parts = [chunk.copy() for chunk in self.chunks()]
+        if not parts:
+            return np.empty(0, dtype=self.dtype)
+        return np.concatenate(parts)
+
+    def decode(self, name, codes):
+        """
+        Turns the codes of a dictionary-encoded column back into values.
+
+        :param name: The column name.
+        :type name: str
+        :param codes: Codes read from that column.
+        :type codes: numpy.ndarray
+        :return: The values, with None for NULL.
+        :rtype: numpy.ndarray
+        """
+        values = np.array(self.dictionaries[name] + [None], dtype=object)
+        # NULL_INTEGER (-1) indexes the trailing None
+        return values[codes]
+
+
+def read_table(conn, table, chunk_size=CHUNK_ROWS):
+    """
+    Returns a reader for a whole tk_db table, typed according to ``TABLE_COLUMNS``.
+
+    :param conn: The open connection to the school database.
+    :type conn: sqlite3.Connection
+    :param table: "students", "instructors", "courses" or "enrollments".
+    :type table: str
+    :param chunk_size: Rows per chunk, defaults to ``CHUNK_ROWS``.
+    :type chunk_size: int, optional
+    :raises ValueError: If the table is not one of the tk_db tables.
+    :raises ImportError: If numpy is not installed.
+    :return: The reader; iterate ``chunks()`` or call ``read()``.
+    :rtype: ColumnarReader
+    """
+    if table not in TABLE_COLUMNS:
+        raise ValueError(f"Unknown table: {table}")
+    columns = TABLE_COLUMNS[table]
+    query = f"SELECT {', '.join(name for name, _ in columns)} FROM {table}"
+    return ColumnarReader(conn, query, columns, chunk_size=chunk_size)
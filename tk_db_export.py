@@ -0,0 +1,175 @@
+import csv
+import gzip
+import json
+import sqlite3
+import threading
+
+# Rows fetched from the cursor and written per step; memory use depends on this, not on table size
+EXPORT_BATCH = 1000
+
+# Export name -> (query, column names, table whose row count equals the number of exported rows)
+EXPORTS = {
+    "students": (
+        "SELECT student_id, name, age, email FROM students ORDER BY student_id",
+        ("student_id", "name", "age", "email"),
+        "students",
+    ),
+    "instructors": (
+        "SELECT instructor_id, name, age, email FROM instructors ORDER BY instructor_id",
+        ("instructor_id", "name", "age", "email"),
+        "instructors",
+    ),
+    "courses": (
+        '''SELECT c.course_id, c.course_name, c.instructor_id, i.name
+           FROM courses c LEFT JOIN instructors i ON i.instructor_id = c.instructor_id
+           ORDER BY c.course_id''',
+        ("course_id", "course_name", "instructor_id", "instructor_name"),
+        "courses",
+    ),
+    "rosters": (
+        '''SELECT c.course_id, c.course_name, s.student_id, s.name, s.email
+           FROM enrollments e
+           JOIN courses c ON c.course_id = e.course_id
+           JOIN students s ON s.student_id = e.student_id
+           ORDER BY c.course_id, s.student_id''',
+        ("course_id", "course_name", "student_id", "student_name", "student_email"),
+        "enrollments",
+    ),
+}
+
+FORMATS = ("csv", "jsonl")
+
+
+def export_format(path):
+    """
+    Works out the format and compression of an export from its file name.
+
+    :param path: File name ending in ``.csv``, ``.jsonl`` or either followed by ``.gz``.
+    :type path: str
+    :raises ValueError: If the extension is not recognised.
+    :return: The format ("csv" or "jsonl") and whether to gzip the file.
+    :rtype: tuple
+    """
+    name = path.lower()
+    compress = name.endswith(".gz")
+    if compress:
+        name = name[:-3]
+    for fmt in FORMATS:
+        if name.endswith("." + fmt):
+            return fmt, compress
+    raise ValueError(f"Cannot tell the export format of {path}; use .csv, .jsonl, .csv.gz or .jsonl.gz")
+
+
+def iter_batches(cursor, batch_size=EXPORT_BATCH):
+    """
+    Yields the rows of an executed cursor in lists of at most ``batch_size``.
+
+    :param cursor: A cursor on which a query was executed.
+    :type cursor: sqlite3.Cursor
+    :param batch_size: Rows per batch, defaults to ``EXPORT_BATCH``.
+    :type batch_size: int, optional
+    :return: Batches of rows.
+    :rtype: generator
+    """
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+
+
+def export(conn, name, path, fmt=None, compress=None, batch_size=EXPORT_BATCH, on_progress=None):
+    """
+    Streams one export to a file, reading the cursor with ``fetchmany`` and writing each batch before
+    the next one is fetched, so memory use stays flat regardless of the number of rows.
+
+    :param conn: The open connection to the school database.
+    :type conn: sqlite3.Connection
+    :param name: The export: "students", "instructors", "courses" or "rosters".
+    :type name: str
+    :param path: The file to write.
+    :type path: str
+    :param fmt: "csv" or "jsonl", defaults to the format implied by the file name.
+    :type fmt: str, optional
+    :param compress: Gzip the output, defaults to True when the file name ends in ``.gz``.
+    :type compress: bool, optional
+    :param batch_size: Rows fetched and written per step, defaults to ``EXPORT_BATCH``.
+    :type batch_size: int, optional
+    :param on_progress: Called with the number of rows written so far after every batch, defaults to None.
+    :type on_progress: callable, optional
+    :raises ValueError: If the export name or format is not recognised.
+    :return: The number of rows written.
+    :rtype: int
+    """
+    if name not in EXPORTS:
+        raise ValueError(f"Unknown export: {name}")
+    query, columns, _ = EXPORTS[name]
+
+    if fmt is None or compress is None:
+        implied_fmt, implied_compress = export_format(path)
+        fmt = implied_fmt if fmt is None else fmt
+        compress = implied_compress if compress is None else compress
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    if compress:
+        f = gzip.open(path, "wt", encoding="utf-8", newline="")
+    else:
+        f = open(path, "w", encoding="utf-8", newline="")
+
+    written = 0
+    with f:
+        cursor = conn.execute(query)
+        if fmt == "csv":
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for rows in iter_batches(cursor, batch_size):
+                writer.writerows(rows)
+                written += len(rows)
+                if on_progress:
+                    on_progress(written)
+        else:
+            for rows in iter_batches(cursor, batch_size):
+                f.write("".join(json.dumps(dict(zip(columns, row))) + "\n" for row in rows))
+                written += len(rows)
+                if on_progress:
+                    on_progress(written)
+
+    return written
+
+
+def start_export(db_path, name, path, on_progress=None, on_done=None, batch_size=EXPORT_BATCH):
+    """
+    Runs ``export`` on a worker thread with its own read-only connection, so a large export does not
+    block the UI or hold the UI connection.
+
+    :param db_path: Path of the database file.
+    :type db_path: str
+    :param name: The export: "students", "instructors", "courses" or "rosters".
+    :type name: str
+    :param path: The file to write; the format and compression follow from its extension.
+    :type path: str
+    :param on_progress: Called with the number of rows written so far after every batch, defaults to None.
+    :type on_progress: callable, optional
+    :param on_done: Called with ``(path, None)`` on success or ``(None, error)`` on failure, defaults to None.
+    :type on_done: callable, optional
+    :return: The started worker thread.
+    :rtype: threading.Thread
+    """
+    def run():
+        try:
+            conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+            try:
+                export(conn, name, path, batch_size=batch_size, on_progress=on_progress)
+            finally:
+                conn.close()
+        except Exception as e:
+            if on_done:
+                on_done(None, e)
+            return
+        if on_done:
+            on_done(path, None)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,344 @@
+import atexit
+import logging
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+# Statements slower than this (execution plus fetching) are logged with their query plan
+SLOW_QUERY_MS = 100
+
+# Statements listed in the summary report
+REPORT_TOP = 20
+
+logger = logging.getLogger("tk_db.sql")
+
+# Only these statements have a query plan worth capturing
+_PLANNED = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|REPLACE|WITH)\b", re.IGNORECASE)
+
+
+def _is_table_scan(line):
+    # Scans of subqueries, index-only scans and FTS lookups are not full table scans
+    return (line.startswith("SCAN ") and "USING" not in line and "VIRTUAL TABLE" not in line
+            and not line.startswith("SCAN (") and "CONSTANT ROW" not in line)
+
+
+def normalize(sql):
+    """
+    Collapses the whitespace of a statement, so the same query written on several lines is counted once.
+
+    :param sql: The statement.
+    :type sql: str
+    :return: The statement on a single line.
+    :rtype: str
+    """
+    return " ".join(sql.split())
+
+
+class StatementStats:
+    """
+    Counters for one distinct SQL statement.
+    """
+    def __init__(self, sql):
+        """
+        Initialize empty counters for ``sql``.
+        """
+        self.sql = sql
+        self.calls = 0
+        self.rows = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.slow_calls = 0
+        self.plan = None
+
+    @property
+    def scans(self):
+        """
+        :return: True if the captured query plan reads a whole table ("SCAN" without an index).
+        :rtype: bool
+        """
+        return bool(self.plan) and any(_is_table_scan(line) for line in self.plan)
+
+
+class QueryStats:
+    """
+    Collects per-statement call counts, latencies and row counts, and logs statements slower than
+    ``slow_ms`` together with their ``EXPLAIN QUERY PLAN`` output.
+
+    :param slow_ms: Slow-query threshold in milliseconds, defaults to ``SLOW_QUERY_MS``.
+    :type slow_ms: float, optional
+    """
+    def __init__(self, slow_ms=SLOW_QUERY_MS):
+        """
+        Initialize an empty QueryStats.
+        """
+        self.slow_ms = slow_ms
+        self.statements = {}
+        self._lock = threading.Lock()
+
+    def record(self, sql, elapsed, rows, new_call):
+        """
+        Adds time and rows to a statement's counters.
+
+        :param sql: The normalized statement.
+        :type sql: str
+        :param elapsed: Seconds spent executing or fetching.
+        :type elapsed: float
+        :param rows: Rows fetched or changed.
+        :type rows: int
+        :param new_call: True when this starts a new execution of the statement.
+        :type new_call: bool
+        :return: The statement's counters.
+        :rtype: StatementStats
+        """
+        with self._lock:
+            stats = self.statements.get(sql)
+            if stats is None:
+                stats = self.statements[sql] = StatementStats(sql)
+            if new_call:
+                stats.calls += 1
+            stats.rows += rows
+            stats.total_time += elapsed
+            return stats
+
+    def finish(self, conn, sql, params, elapsed):
+        """
+        Closes one execution of a statement: updates its maximum latency and logs it if it was slow.
+
+        :param conn: The connection that ran the statement, used to capture its query plan.
+        :type conn: sqlite3.Connection
+        :param sql: The normalized statement.
+        :type sql: str
+        :param params: The parameters it ran with, or None if unknown.
+        :param elapsed: Seconds spent executing and fetching.
+        :type elapsed: float
+        :return: None
+        :rtype: None
+        """
+        stats = self.statements.get(sql)
+        if stats is None:
+            return
+        stats.max_time = max(stats.max_time, elapsed)
+        if elapsed * 1000 < self.slow_ms:
+            return
+
+        stats.slow_calls += 1
+        if stats.plan is None and params is not None and _PLANNED.match(sql):
+            stats.plan = self.explain(conn, sql, params)
+        logger.warning(
+            "Slow query (%.1f ms): %s\n%s", elapsed * 1000, sql,
+            "\n".join("    " + line for line in stats.plan or ["    (no plan captured)"]),
+        )
+
+    def explain(self, conn, sql, params):
+        """
+        Runs ``EXPLAIN QUERY PLAN`` for a statement without recording it.
+
+        :return: The plan, one line per step, or an empty list if it could not be captured.
+        :rtype: list
+        """
+        try:
+            # Bypass the instrumented execute so the plan does not show up in the statistics
+            rows = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, params).fetchall()
+        except sqlite3.Error:
+            return []
+        return [row[-1] for row in rows]
+
+    def report(self, top=REPORT_TOP):
+        """
+        Formats the statements with the most total time as a table.
+
+        :param top: Number of statements listed, defaults to ``REPORT_TOP``.
+        :type top: int, optional
+        :return: The report.
+        :rtype: str
+        """
+        with self._lock:
+            ranked = sorted(self.statements.values(), key=lambda s: s.total_time, reverse=True)[:top]
+
+        lines = [
+            f"{'calls':>8} {'total ms':>10} {'avg ms':>8} {'max ms':>8} {'rows':>10} {'slow':>5}  statement",
+        ]
+        for stats in ranked:
+            flag = "  [table scan]" if stats.scans else ""
+            lines.append(
+                f"{stats.calls:>8} {stats.total_time * 1000:>10.1f} "
+                f"{stats.total_time * 1000 / max(stats.calls, 1):>8.2f} {stats.max_time * 1000:>8.2f} "
+                f"{stats.rows:>10} {stats.slow_calls:>5}  {stats.sql[:120]}{flag}"
+            )
+        return "\n".join(lines)
+
+    def print_report_at_exit(self, stream=None):
+        """
+        Prints ``report`` when the interpreter exits.
+
+        :param stream: Where to print, defaults to standard error.
+        :type stream: file, optional
+        :return: None
+        :rtype: None
+        """
+        def print_report():
+            if self.statements:
+                print("SQL statement summary\n" + self.report(), file=stream or sys.stderr)
+
+        atexit.register(print_report)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    A cursor that times each statement from ``execute`` until its last row is fetched, or until its
+    first ``fetchone``.
+    """
+    def __init__(self, conn):
+        """
+        Initialize a cursor on an ``InstrumentedConnection``.
+        """
+        super().__init__(conn)
+        self._stats = conn.stats
+        self._sql = None
+        self._params = None
+        self._elapsed = 0.0
+        self._finished = False
+
+    def _start(self, sql, params, run):
+        self._finish()
+        self._sql = normalize(sql)
+        self._params = params
+        self._finished = False
+        start = time.perf_counter()
+        try:
+            run()
+        finally:
+            elapsed = time.perf_counter() - start
+            self._elapsed = elapsed
+            # Statements that return no rows are complete once execute returns
+            changed = self.rowcount if self.description is None and self.rowcount > 0 else 0
+            self._stats.record(self._sql, elapsed, changed, True)
+            if self.description is None:
+                self._finish()
+        return self
+
+    def _fetched(self, rows, elapsed, exhausted):
+        if self._sql is None:
+            return
+        self._elapsed += elapsed
+        self._stats.record(self._sql, elapsed, rows, False)
+        if exhausted:
+            self._finish()
+
+    def _finish(self):
+        # Rows fetched after a statement is finished still count, but it is only logged once
+        if self._sql is not None and not self._finished:
+            self._finished = True
+            self._stats.finish(self.connection, self._sql, self._params, self._elapsed)
+
+    def execute(self, sql, parameters=()):
+        """
+        Executes a statement and starts timing it.
+        """
+        return self._start(sql, parameters, lambda: super(InstrumentedCursor, self).execute(sql, parameters))
+
+    def executemany(self, sql, seq_of_parameters):
+        """
+        Executes a statement for every parameter set and times the whole batch.
+        """
+        return self._start(sql, None, lambda: super(InstrumentedCursor, self).executemany(sql, seq_of_parameters))
+
+    def fetchone(self):
+        """
+        Fetches the next row and adds the time to the running statement. The statement is finished
+        after its first ``fetchone``, since single-row lookups never exhaust their cursor.
+        """
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(0 if row is None else 1, time.perf_counter() - start, True)
+        return row
+
+    def fetchmany(self, size=None):
+        """
+        Fetches the next rows and adds the time to the running statement.
+        """
+        size = self.arraysize if size is None else size
+        start = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._fetched(len(rows), time.perf_counter() - start, len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        """
+        Fetches the remaining rows and completes the running statement.
+        """
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(len(rows), time.perf_counter() - start, True)
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(0, time.perf_counter() - start, True)
+            raise
+        self._fetched(1, time.perf_counter() - start, False)
+        return row
+
+    def close(self):
+        """
+        Completes the running statement and closes the cursor.
+        """
+        self._finish()
+        self._sql = None
+        super().close()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    A connection whose statements are all timed by ``InstrumentedCursor``. Pass it as the ``factory``
+    of ``sqlite3.connect`` (or ``tk_db_repository.connect``) and set ``stats`` before use; a connection
+    without its own ``stats`` records into a private ``QueryStats``.
+    """
+    stats = None
+
+    def cursor(self, factory=InstrumentedCursor):
+        """
+        Returns a new instrumented cursor.
+        """
+        if self.stats is None:
+            self.stats = QueryStats()
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        """
+        Executes a statement on a new instrumented cursor.
+        """
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        """
+        Executes a statement for every parameter set on a new instrumented cursor.
+        """
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def instrument(conn, slow_ms=SLOW_QUERY_MS, report_at_exit=True):
+    """
+    Attaches a new ``QueryStats`` to an ``InstrumentedConnection``.
+
+    :param conn: A connection opened with ``factory=InstrumentedConnection``.
+    :type conn: InstrumentedConnection
+    :param slow_ms: Slow-query threshold in milliseconds, defaults to ``SLOW_QUERY_MS``.
+    :type slow_ms: float, optional
+    :param report_at_exit: Print the summary report when the program exits, defaults to True.
+    :type report_at_exit: bool, optional
+    :raises TypeError: If the connection was not opened with ``InstrumentedConnection``.
+    :return: The statistics the connection records into.
+    :rtype: QueryStats
+    """
+    if not isinstance(conn, InstrumentedConnection):
+        raise TypeError("Open the connection with factory=InstrumentedConnection to instrument it")
+    conn.stats = QueryStats(slow_ms)
+    if report_at_exit:
+        conn.stats.print_report_at_exit()
+    return conn.stats
@@ -0,0 +1,534 @@
+import json
+import sqlite3
+from contextlib import contextmanager
+
+from tk_db_cache import QueryCache
+
+# Size of sqlite3's per-connection prepared statement cache. The repository only ever issues the
+# fixed statements below, so every call after the first reuses an already prepared statement.
+CACHED_STATEMENTS = 128
+
+# Students
+INSERT_STUDENT = "INSERT INTO students (student_id, name, age, email) VALUES (?, ?, ?, ?)"
+SELECT_STUDENT = "SELECT student_id, name, age, email, version FROM students WHERE student_id = ?"
+SELECT_STUDENT_ID_BY_NAME = "SELECT student_id FROM students WHERE name = ?"
+# Every update bumps the row version; the versioned form only applies to the version that was read
+UPDATE_STUDENT = "UPDATE students SET name = ?, age = ?, email = ?, version = version + 1 WHERE student_id = ?"
+UPDATE_STUDENT_VERSIONED = UPDATE_STUDENT + " AND version = ?"
+# Bulk deletes take a JSON array of IDs so that any number of rows goes in one statement.
+# Enrollments and course assignments follow through the ON DELETE clauses (see tk_db_schema).
+DELETE_STUDENTS = "DELETE FROM students WHERE student_id IN (SELECT value FROM json_each(?))"
+
+# Instructors
+INSERT_INSTRUCTOR = "INSERT INTO instructors (instructor_id, name, age, email) VALUES (?, ?, ?, ?)"
+SELECT_INSTRUCTOR = "SELECT instructor_id, name, age, email, version FROM instructors WHERE instructor_id = ?"
+SELECT_INSTRUCTOR_ID_BY_NAME = "SELECT instructor_id FROM instructors WHERE name = ?"
+SELECT_FIRST_INSTRUCTOR_ID = "SELECT instructor_id FROM instructors LIMIT 1"
+UPDATE_INSTRUCTOR = "UPDATE instructors SET name = ?, age = ?, email = ?, version = version + 1 WHERE instructor_id = ?"
+UPDATE_INSTRUCTOR_VERSIONED = UPDATE_INSTRUCTOR + " AND version = ?"
+DELETE_INSTRUCTORS = "DELETE FROM instructors WHERE instructor_id IN (SELECT value FROM json_each(?))"
+
+# Courses
+INSERT_COURSE = "INSERT INTO courses (course_id, course_name, instructor_id) VALUES (?, ?, ?)"
+SELECT_COURSE = "SELECT course_id, course_name, instructor_id, version FROM courses WHERE course_id = ?"
+SELECT_COURSE_ID_BY_NAME = "SELECT course_id FROM courses WHERE course_name = ?"
+SELECT_COURSE_NAMES = "SELECT course_name FROM courses"
+SELECT_INSTRUCTOR_NAMES = "SELECT name FROM instructors ORDER BY name"
+UPDATE_COURSE_NAME = "UPDATE courses SET course_name = ?, version = version + 1 WHERE course_id = ?"
+UPDATE_COURSE_NAME_VERSIONED = UPDATE_COURSE_NAME + " AND version = ?"
+ASSIGN_INSTRUCTOR = "UPDATE courses SET instructor_id = ?, version = version + 1 WHERE course_id = ?"
+DELETE_COURSES = "DELETE FROM courses WHERE course_id IN (SELECT value FROM json_each(?))"
+
+# Enrollments
+INSERT_ENROLLMENT = "INSERT INTO enrollments (course_id, student_id, enrolled_at) VALUES (?, ?, CURRENT_TIMESTAMP)"
+SELECT_ENROLLMENT = "SELECT 1 FROM enrollments WHERE course_id = ? AND student_id = ?"
+
+# Row counts of every table, in one round trip
+SELECT_COUNTS = """
+    SELECT (SELECT COUNT(*) FROM students), (SELECT COUNT(*) FROM instructors),
+           (SELECT COUNT(*) FROM courses), (SELECT COUNT(*) FROM enrollments)
+"""
+
+# Reports read the trigger-maintained summary tables: one row per course or instructor
+SELECT_COURSE_REPORT = """
+    SELECT c.course_id, c.course_name, s.student_count,
+           CASE WHEN s.age_count > 0 THEN ROUND(CAST(s.age_sum AS REAL) / s.age_count, 1) END
+    FROM course_stats s JOIN courses c ON c.course_id = s.course_id
+    ORDER BY s.student_count DESC, c.course_name
+"""
+SELECT_INSTRUCTOR_REPORT = """
+    SELECT i.instructor_id, i.name, l.course_count
+    FROM instructor_load l JOIN instructors i ON i.instructor_id = l.instructor_id
+    ORDER BY l.course_count DESC, i.name
+"""
+
+
+class ConflictError(Exception):
+    """
+    Raised by a versioned update when another connection changed or deleted the row after it was read.
+
+    :param table: The table of the row.
+    :type table: str
+    :param record_id: The row's ID.
+    :type record_id: int
+    :param current: The row as it is now, in the shape returned by the matching ``get_*`` method, or None
+        if it was deleted.
+    :type current: tuple
+    """
+    def __init__(self, table, record_id, current):
+        """
+        Initialize a new ConflictError.
+        """
+        self.table = table
+        self.record_id = record_id
+        self.current = current
+        state = "deleted" if current is None else "changed"
+        super().__init__(f"Row {record_id} of {table} was {state} by another user")
+
+
+def connect(db_path, cached_statements=CACHED_STATEMENTS, **kwargs):
+    """
+    Opens a connection to the school database with a prepared statement cache large enough for
+    every statement the repository issues, and with foreign key enforcement switched on so that the
+    schema's ``ON DELETE`` actions apply.
+
+    :param db_path: Path of the database file.
+    :type db_path: str
+    :param cached_statements: Number of prepared statements sqlite3 keeps per connection, defaults to ``CACHED_STATEMENTS``.
+    :type cached_statements: int, optional
+    :param kwargs: Any other keyword arguments accepted by ``sqlite3.connect``.
+    :return: The open connection.
+    :rtype: sqlite3.Connection
+    """
+    conn = sqlite3.connect(db_path, cached_statements=cached_statements, **kwargs)
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+
+class Repository:
+    """
+    Data access for the tk_db tables. All SQL lives in the module-level statement constants, so
+    sqlite3's statement cache can reuse each prepared statement across calls.
+
+    Writes made outside ``unit_of_work`` are committed immediately, exactly like the original
+    per-click code. Inside a unit of work they are grouped into a single transaction that is
+    committed when the outermost block exits and rolled back if it raises.
+
+    List and count lookups are served from a ``QueryCache``. Every write invalidates the tables it
+    touches, including the ones changed through ``ON DELETE`` actions.
+
+    :param conn: The open connection to the school database.
+    :type conn: sqlite3.Connection
+    :param cache: The cache for lookups, defaults to a new ``QueryCache``.
+    :type cache: QueryCache, optional
+    """
+    def __init__(self, conn, cache=None):
+        """
+        Initialize a new Repository on the given connection.
+        """
+        self.conn = conn
+        self.cache = cache if cache is not None else QueryCache()
+        self._depth = 0
+        self._written_tables = set()
+
+    @contextmanager
+    def unit_of_work(self):
+        """
+        Groups every write made inside the block into one transaction. Blocks may be nested; only
+        the outermost one commits.
+
+        :raises Exception: Re-raises any error from the block after rolling the transaction back.
+        :return: This repository.
+        :rtype: Repository
+        """
+        self._depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._depth -= 1
+            if self._depth == 0:
+                self.conn.rollback()
+                # Lookups cached inside the transaction saw rows that no longer exist
+                self.cache.invalidate(*self._written_tables)
+                self._written_tables.clear()
+            raise
+        self._depth -= 1
+        if self._depth == 0:
+            self.conn.commit()
+            self._written_tables.clear()
+
+    def _write(self, sql, params, tables):
+        cursor = self.conn.execute(sql, params)
+        self._wrote(tables)
+        return cursor
+
+    def _write_many(self, sql, rows, tables):
+        cursor = self.conn.executemany(sql, rows)
+        self._wrote(tables)
+        return cursor
+
+    def _wrote(self, tables):
+        self.cache.invalidate(*tables)
+        if self._depth == 0:
+            self.conn.commit()
+        else:
+            self._written_tables.update(tables)
+
+    def _update(self, sql, versioned_sql, params, record_id, version, select_sql, table):
+        if version is None:
+            self._write(sql, params + (record_id,), (table,))
+            return None
+
+        cursor = self._write(versioned_sql, params + (record_id, version), (table,))
+        if cursor.rowcount == 0:
+            raise ConflictError(table, record_id, self._fetch_one(select_sql, (record_id,)))
+        return version + 1
+
+    def _fetch_one(self, sql, params=()):
+        return self.conn.execute(sql, params).fetchone()
+
+    def _fetch_value(self, sql, params=()):
+        row = self.conn.execute(sql, params).fetchone()
+        return row[0] if row else None
+
+    # Students
+    def add_student(self, student_id, name, age, email):
+        """
+        Inserts a student.
+
+        :raises sqlite3.IntegrityError: If the student ID is already taken.
+        :return: None
+        :rtype: None
+        """
+        self._write(INSERT_STUDENT, (student_id, name, age, email), ("students",))
+
+    def add_students(self, rows):
+        """
+        Inserts many students with a single ``executemany``.
+
+        :param rows: Rows of ``(student_id, name, age, email)``.
+        :type rows: iterable
+        :return: None
+        :rtype: None
+        """
+        self._write_many(INSERT_STUDENT, rows, ("students",))
+
+    def get_student(self, student_id):
+        """
+        :return: ``(student_id, name, age, email, version)``, or None if there is no such student.
+        :rtype: tuple
+        """
+        return self._fetch_one(SELECT_STUDENT, (student_id,))
+
+    def find_student_id(self, name):
+        """
+        :return: The ID of the first student with the given name, or None.
+        :rtype: int
+        """
+        return self._fetch_value(SELECT_STUDENT_ID_BY_NAME, (name,))
+
+    def update_student(self, student_id, name, age, email, version=None):
+        """
+        Updates a student's details. With ``version``, the update only applies if the row still has
+        the version that was read.
+
+        :param version: The version returned by ``get_student``, defaults to None to update unconditionally.
+        :type version: int, optional
+        :raises ConflictError: If the student was changed or deleted since that version was read.
+        :return: The row's new version, or None for an unconditional update.
+        :rtype: int
+        """
+        return self._update(UPDATE_STUDENT, UPDATE_STUDENT_VERSIONED, (name, age, email), student_id, version,
+                            SELECT_STUDENT, "students")
+
+    def delete_student(self, student_id):
+        """
+        Deletes a student together with their enrollments.
+
+        :return: None
+        :rtype: None
+        """
+        self.delete_students([student_id])
+
+    def delete_students(self, student_ids):
+        """
+        Deletes any number of students, and through the cascade their enrollments, in one statement.
+
+        :param student_ids: IDs of the students to delete.
+        :type student_ids: iterable
+        :return: Number of students deleted.
+        :rtype: int
+        """
+        params = (json.dumps(list(student_ids)),)
+        return self._write(DELETE_STUDENTS, params, ("students", "enrollments")).rowcount
+
+    # Instructors
+    def add_instructor(self, instructor_id, name, age, email):
+        """
+        Inserts an instructor.
+
+        :raises sqlite3.IntegrityError: If the instructor ID is already taken.
+        :return: None
+        :rtype: None
+        """
+        self._write(INSERT_INSTRUCTOR, (instructor_id, name, age, email), ("instructors",))
+
+    def add_instructors(self, rows):
+        """
+        Inserts many instructors with a single ``executemany``.
+
+        :param rows: Rows of ``(instructor_id, name, age, email)``.
+        :type rows: iterable
+        :return: None
+        :rtype: None
+        """
+        self._write_many(INSERT_INSTRUCTOR, rows, ("instructors",))
+
+    def get_instructor(self, instructor_id):
+        """
+        :return: ``(instructor_id, name, age, email, version)``, or None if there is no such instructor.
+        :rtype: tuple
+        """
+        return self._fetch_one(SELECT_INSTRUCTOR, (instructor_id,))
+
+    def find_instructor_id(self, name):
+        """
+        :return: The ID of the first instructor with the given name, or None.
+        :rtype: int
+        """
+        return self._fetch_value(SELECT_INSTRUCTOR_ID_BY_NAME, (name,))
+
+    def instructor_names(self):
+        """
+        :return: The names of all instructors in alphabetical order (cached).
+        :rtype: list
+        """
+        return self.cache.get(
+            ("instructor_names",), ("instructors",),
+            lambda: [row[0] for row in self.conn.execute(SELECT_INSTRUCTOR_NAMES)],
+        )
+
+    def first_instructor_id(self):
+        """
+        :return: The ID of any one instructor, or None if there are none.
+        :rtype: int
+        """
+        return self._fetch_value(SELECT_FIRST_INSTRUCTOR_ID)
+
+    def update_instructor(self, instructor_id, name, age, email, version=None):
+        """
+        Updates an instructor's details. With ``version``, the update only applies if the row still has
+        the version that was read.
+
+        :param version: The version returned by ``get_instructor``, defaults to None to update unconditionally.
+        :type version: int, optional
+        :raises ConflictError: If the instructor was changed or deleted since that version was read.
+        :return: The row's new version, or None for an unconditional update.
+        :rtype: int
+        """
+        return self._update(UPDATE_INSTRUCTOR, UPDATE_INSTRUCTOR_VERSIONED, (name, age, email), instructor_id,
+                            version, SELECT_INSTRUCTOR, "instructors")
+
+    def delete_instructor(self, instructor_id):
+        """
+        Deletes an instructor and unassigns them from their courses.
+
+        :return: None
+        :rtype: None
+        """
+        self.delete_instructors([instructor_id])
+
+    def delete_instructors(self, instructor_ids):
+        """
+        Deletes any number of instructors in one statement; their courses are left without an instructor.
+
+        :param instructor_ids: IDs of the instructors to delete.
+        :type instructor_ids: iterable
+        :return: Number of instructors deleted.
+        :rtype: int
+        """
+        params = (json.dumps(list(instructor_ids)),)
+        return self._write(DELETE_INSTRUCTORS, params, ("instructors", "courses")).rowcount
+
+    # Courses
+    def add_course(self, course_id, course_name, instructor_id=None):
+        """
+        Inserts a course.
+
+        :raises sqlite3.IntegrityError: If the course ID is already taken.
+        :return: None
+        :rtype: None
+        """
+        self._write(INSERT_COURSE, (course_id, course_name, instructor_id), ("courses",))
+
+    def add_courses(self, rows):
+        """
+        Inserts many courses with a single ``executemany``.
+
+        :param rows: Rows of ``(course_id, course_name, instructor_id)``.
+        :type rows: iterable
+        :return: None
+        :rtype: None
+        """
+        self._write_many(INSERT_COURSE, rows, ("courses",))
+
+    def get_course(self, course_id):
+        """
+        :return: ``(course_id, course_name, instructor_id, version)``, or None if there is no such course.
+        :rtype: tuple
+        """
+        return self._fetch_one(SELECT_COURSE, (course_id,))
+
+    def find_course_id(self, course_name):
+        """
+        :return: The ID of the first course with the given name, or None.
+        :rtype: int
+        """
+        return self._fetch_value(SELECT_COURSE_ID_BY_NAME, (course_name,))
+
+    def course_names(self):
+        """
+        :return: The names of all courses (cached).
+        :rtype: list
+        """
+        return self.cache.get(
+            ("course_names",), ("courses",),
+            lambda: [row[0] for row in self.conn.execute(SELECT_COURSE_NAMES)],
+        )
+
+    def update_course_name(self, course_id, course_name, version=None):
+        """
+        Renames a course. With ``version``, the rename only applies if the row still has the version
+        that was read.
+
+        :param version: The version returned by ``get_course``, defaults to None to update unconditionally.
+        :type version: int, optional
+        :raises ConflictError: If the course was changed or deleted since that version was read.
+        :return: The row's new version, or None for an unconditional update.
+        :rtype: int
+        """
+        return self._update(UPDATE_COURSE_NAME, UPDATE_COURSE_NAME_VERSIONED, (course_name,), course_id, version,
+                            SELECT_COURSE, "courses")
+
+    def assign_instructor(self, course_id, instructor_id):
+        """
+        Makes the instructor the teacher of the course.
+
+        :return: None
+        :rtype: None
+        """
+        self._write(ASSIGN_INSTRUCTOR, (instructor_id, course_id), ("courses",))
+
+    def delete_course(self, course_id):
+        """
+        Deletes a course together with its enrollments.
+
+        :return: None
+        :rtype: None
+        """
+        self.delete_courses([course_id])
+
+    def delete_courses(self, course_ids):
+        """
+        Deletes any number of courses, and through the cascade their enrollments, in one statement.
+
+        :param course_ids: IDs of the courses to delete.
+        :type course_ids: iterable
+        :return: Number of courses deleted.
+        :rtype: int
+        """
+        params = (json.dumps(list(course_ids)),)
+        return self._write(DELETE_COURSES, params, ("courses", "enrollments")).rowcount
+
+    def delete_records(self, records):
+        """
+        Deletes a mixed selection of students, instructors and courses in a single transaction,
+        issuing one statement per record type.
+
+        :param records: Pairs of ``(record type, id)`` where the type is "Student", "Instructor" or "Course".
+        :type records: iterable
+        :raises ValueError: If a record type is not recognised.
+        :return: Number of records deleted.
+        :rtype: int
+        """
+        ids = {"Student": [], "Instructor": [], "Course": []}
+        for record_type, record_id in records:
+            if record_type not in ids:
+                raise ValueError(f"Unknown record type: {record_type}")
+            ids[record_type].append(int(record_id))
+
+        deleted = 0
+        with self.unit_of_work():
+            if ids["Student"]:
+                deleted += self.delete_students(ids["Student"])
+            if ids["Instructor"]:
+                deleted += self.delete_instructors(ids["Instructor"])
+            if ids["Course"]:
+                deleted += self.delete_courses(ids["Course"])
+        return deleted
+
+    # Enrollments
+    def is_enrolled(self, course_id, student_id):
+        """
+        :return: True if the student is registered for the course.
+        :rtype: bool
+        """
+        return self._fetch_one(SELECT_ENROLLMENT, (course_id, student_id)) is not None
+
+    def enroll(self, course_id, student_id):
+        """
+        Registers a student for a course.
+
+        :return: None
+        :rtype: None
+        """
+        self._write(INSERT_ENROLLMENT, (course_id, student_id), ("enrollments",))
+
+    def enroll_many(self, rows):
+        """
+        Registers many ``(course_id, student_id)`` pairs with a single ``executemany``.
+
+        :param rows: Rows of ``(course_id, student_id)``.
+        :type rows: iterable
+        :return: None
+        :rtype: None
+        """
+        self._write_many(INSERT_ENROLLMENT, rows, ("enrollments",))
+
+    # Reports
+    def counts(self):
+        """
+        :return: The number of rows in each table, keyed by table name (cached).
+        :rtype: dict
+        """
+        tables = ("students", "instructors", "courses", "enrollments")
+
+        def load():
+            return dict(zip(tables, self.conn.execute(SELECT_COUNTS).fetchone()))
+
+        return self.cache.get(("counts",), tables, load)
+
+    def course_report(self):
+        """
+        Students per course and their average age, read from the ``course_stats`` summary table.
+
+        :return: Rows of ``(course_id, course_name, student_count, average_age)``, largest course first;
+            the average is None for a course without students of known age (cached).
+        :rtype: list
+        """
+        return self.cache.get(
+            ("course_report",), ("courses", "enrollments", "students"),
+            lambda: self.conn.execute(SELECT_COURSE_REPORT).fetchall(),
+        )
+
+    def instructor_report(self):
+        """
+        Courses per instructor, read from the ``instructor_load`` summary table.
+
+        :return: Rows of ``(instructor_id, name, course_count)``, busiest instructor first (cached).
+        :rtype: list
+        """
+        return self.cache.get(
+            ("instructor_report",), ("instructors", "courses"),
+            lambda: self.conn.execute(SELECT_INSTRUCTOR_REPORT).fetchall(),
+        )
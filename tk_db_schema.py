@@ -0,0 +1,319 @@
+import sqlite3
+
+
+def _create_base_tables(conn):
+    """
+    Version 1: the original tables, created if they do not exist yet.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS students (
+            student_id INTEGER PRIMARY KEY,
+            name TEXT,
+            age INTEGER,
+            email TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS instructors (
+            instructor_id INTEGER PRIMARY KEY,
+            name TEXT,
+            age INTEGER,
+            email TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS courses (
+            course_id INTEGER PRIMARY KEY,
+            course_name TEXT,
+            instructor_id INTEGER,
+            FOREIGN KEY (instructor_id) REFERENCES instructors (instructor_id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS enrollments (
+            course_id INTEGER,
+            student_id INTEGER,
+            FOREIGN KEY (course_id) REFERENCES courses (course_id),
+            FOREIGN KEY (student_id) REFERENCES students (student_id)
+        )
+    ''')
+
+
+def _add_cascades(conn):
+    """
+    Version 2: rebuilds ``courses`` and ``enrollments`` with ``ON DELETE`` actions so that deleting a
+    student, instructor or course is a single statement, and indexes the child keys the cascades use.
+    Dangling references left behind by older versions are dropped (enrollments) or cleared (courses).
+    """
+    conn.execute('''
+        CREATE TABLE courses_new (
+            course_id INTEGER PRIMARY KEY,
+            course_name TEXT,
+            instructor_id INTEGER REFERENCES instructors (instructor_id) ON DELETE SET NULL
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO courses_new (course_id, course_name, instructor_id)
+        SELECT course_id, course_name,
+               CASE WHEN instructor_id IN (SELECT instructor_id FROM instructors) THEN instructor_id END
+        FROM courses
+    ''')
+
+    conn.execute('''
+        CREATE TABLE enrollments_new (
+            course_id INTEGER NOT NULL REFERENCES courses (course_id) ON DELETE CASCADE,
+            student_id INTEGER NOT NULL REFERENCES students (student_id) ON DELETE CASCADE,
+            UNIQUE (course_id, student_id)
+        )
+    ''')
+    conn.execute('''
+        INSERT OR IGNORE INTO enrollments_new (course_id, student_id)
+        SELECT course_id, student_id FROM enrollments
+        WHERE course_id IN (SELECT course_id FROM courses)
+          AND student_id IN (SELECT student_id FROM students)
+    ''')
+
+    conn.execute("DROP TABLE enrollments")
+    conn.execute("DROP TABLE courses")
+    conn.execute("ALTER TABLE courses_new RENAME TO courses")
+    conn.execute("ALTER TABLE enrollments_new RENAME TO enrollments")
+
+    # The UNIQUE constraint already indexes enrollments by course_id first
+    conn.execute("CREATE INDEX enrollments_student_id ON enrollments (student_id)")
+    conn.execute("CREATE INDEX courses_instructor_id ON courses (instructor_id)")
+
+
+def _add_summary_tables(conn):
+    """
+    Version 3: per-course enrollment statistics and per-instructor teaching load, kept current by
+    triggers so that reports read one row per course or instructor instead of aggregating enrollments.
+
+    A student's age is removed from ``course_stats`` by a BEFORE DELETE trigger on ``students``,
+    because by the time the cascade deletes their enrollments the student row is already gone.
+    """
+    conn.execute('''
+        CREATE TABLE course_stats (
+            course_id INTEGER PRIMARY KEY,
+            student_count INTEGER NOT NULL DEFAULT 0,
+            age_sum INTEGER NOT NULL DEFAULT 0,
+            age_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE instructor_load (
+            instructor_id INTEGER PRIMARY KEY,
+            course_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+
+    # Fill the summaries from the existing rows
+    conn.execute('''
+        INSERT INTO course_stats (course_id, student_count, age_sum, age_count)
+        SELECT c.course_id, COUNT(e.student_id), COALESCE(SUM(s.age), 0), COUNT(s.age)
+        FROM courses c
+        LEFT JOIN enrollments e ON e.course_id = c.course_id
+        LEFT JOIN students s ON s.student_id = e.student_id
+        GROUP BY c.course_id
+    ''')
+    conn.execute('''
+        INSERT INTO instructor_load (instructor_id, course_count)
+        SELECT i.instructor_id, COUNT(c.course_id)
+        FROM instructors i LEFT JOIN courses c ON c.instructor_id = i.instructor_id
+        GROUP BY i.instructor_id
+    ''')
+
+    for statement in (
+        # Courses
+        '''CREATE TRIGGER course_stats_course_ai AFTER INSERT ON courses BEGIN
+            INSERT INTO course_stats (course_id) VALUES (new.course_id);
+            UPDATE instructor_load SET course_count = course_count + 1 WHERE instructor_id = new.instructor_id;
+        END''',
+        '''CREATE TRIGGER course_stats_course_ad AFTER DELETE ON courses BEGIN
+            DELETE FROM course_stats WHERE course_id = old.course_id;
+            UPDATE instructor_load SET course_count = course_count - 1 WHERE instructor_id = old.instructor_id;
+        END''',
+        '''CREATE TRIGGER instructor_load_course_au AFTER UPDATE OF instructor_id ON courses
+        WHEN old.instructor_id IS NOT new.instructor_id BEGIN
+            UPDATE instructor_load SET course_count = course_count - 1 WHERE instructor_id = old.instructor_id;
+            UPDATE instructor_load SET course_count = course_count + 1 WHERE instructor_id = new.instructor_id;
+        END''',
+        # Instructors
+        '''CREATE TRIGGER instructor_load_instructor_ai AFTER INSERT ON instructors BEGIN
+            INSERT INTO instructor_load (instructor_id) VALUES (new.instructor_id);
+        END''',
+        '''CREATE TRIGGER instructor_load_instructor_ad AFTER DELETE ON instructors BEGIN
+            DELETE FROM instructor_load WHERE instructor_id = old.instructor_id;
+        END''',
+        # Enrollments
+        '''CREATE TRIGGER course_stats_enrollment_ai AFTER INSERT ON enrollments BEGIN
+            UPDATE course_stats SET
+                student_count = student_count + 1,
+                age_sum = age_sum + COALESCE((SELECT age FROM students WHERE student_id = new.student_id), 0),
+                age_count = age_count + COALESCE((SELECT age IS NOT NULL FROM students WHERE student_id = new.student_id), 0)
+            WHERE course_id = new.course_id;
+        END''',
+        '''CREATE TRIGGER course_stats_enrollment_ad AFTER DELETE ON enrollments BEGIN
+            UPDATE course_stats SET
+                student_count = student_count - 1,
+                age_sum = age_sum - COALESCE((SELECT age FROM students WHERE student_id = old.student_id), 0),
+                age_count = age_count - COALESCE((SELECT age IS NOT NULL FROM students WHERE student_id = old.student_id), 0)
+            WHERE course_id = old.course_id;
+        END''',
+        '''CREATE TRIGGER course_stats_enrollment_au AFTER UPDATE ON enrollments BEGIN
+            UPDATE course_stats SET
+                student_count = student_count - 1,
+                age_sum = age_sum - COALESCE((SELECT age FROM students WHERE student_id = old.student_id), 0),
+                age_count = age_count - COALESCE((SELECT age IS NOT NULL FROM students WHERE student_id = old.student_id), 0)
+            WHERE course_id = old.course_id;
+            UPDATE course_stats SET
+                student_count = student_count + 1,
+                age_sum = age_sum + COALESCE((SELECT age FROM students WHERE student_id = new.student_id), 0),
+                age_count = age_count + COALESCE((SELECT age IS NOT NULL FROM students WHERE student_id = new.student_id), 0)
+            WHERE course_id = new.course_id;
+        END''',
+        # Students
+        '''CREATE TRIGGER course_stats_student_au AFTER UPDATE OF age ON students
+        WHEN old.age IS NOT new.age BEGIN
+            UPDATE course_stats SET
+                age_sum = age_sum - COALESCE(old.age, 0) + COALESCE(new.age, 0),
+                age_count = age_count - (old.age IS NOT NULL) + (new.age IS NOT NULL)
+            WHERE course_id IN (SELECT course_id FROM enrollments WHERE student_id = new.student_id);
+        END''',
+        '''CREATE TRIGGER course_stats_student_bd BEFORE DELETE ON students BEGIN
+            UPDATE course_stats SET
+                age_sum = age_sum - COALESCE(old.age, 0),
+                age_count = age_count - (old.age IS NOT NULL)
+            WHERE course_id IN (SELECT course_id FROM enrollments WHERE student_id = old.student_id);
+        END''',
+    ):
+        conn.execute(statement)
+
+
+def _add_change_log(conn):
+    """
+    Version 4: a change log written by triggers, so that other instances sharing the database file
+    can poll for the rows that changed since they last looked instead of reloading every table.
+    ``AUTOINCREMENT`` keeps ``seq`` strictly increasing even after old entries are pruned.
+    """
+    conn.execute('''
+        CREATE TABLE change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            op TEXT NOT NULL CHECK (op IN ('I', 'U', 'D'))
+        )
+    ''')
+
+    # Enrollments have no key of their own; their rowid identifies the row
+    for table, key in (
+        ("students", "student_id"),
+        ("instructors", "instructor_id"),
+        ("courses", "course_id"),
+        ("enrollments", "rowid"),
+    ):
+        conn.execute(f'''
+            CREATE TRIGGER change_log_{table}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO change_log (table_name, row_id, op) VALUES ('{table}', new.{key}, 'I');
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER change_log_{table}_au AFTER UPDATE ON {table} BEGIN
+                INSERT INTO change_log (table_name, row_id, op) VALUES ('{table}', new.{key}, 'U');
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER change_log_{table}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO change_log (table_name, row_id, op) VALUES ('{table}', old.{key}, 'D');
+            END
+        ''')
+
+
+def _add_row_versions(conn):
+    """
+    Version 5: a ``version`` counter on every editable record, bumped by each update, so that an edit can
+    be saved with ``WHERE ... AND version = ?`` and detect that another instance changed the row since
+    it was read, without holding a lock while the user types.
+    """
+    for table in ("students", "instructors", "courses"):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+
+
+def _add_enrollment_dates(conn):
+    """
+    Version 6: the time each enrollment was made, so that old enrollments can be moved to the archive
+    (see tk_db_archive). Enrollments made before this version have no date and are never archived by age.
+    """
+    conn.execute("ALTER TABLE enrollments ADD COLUMN enrolled_at TEXT")
+    conn.execute("CREATE INDEX enrollments_enrolled_at ON enrollments (enrolled_at)")
+
+
+# Ordered (version, upgrade) pairs; append new versions at the end and never edit an applied one
+MIGRATIONS = [
+    (1, _create_base_tables),
+    (2, _add_cascades),
+    (3, _add_summary_tables),
+    (4, _add_change_log),
+    (5, _add_row_versions),
+    (6, _add_enrollment_dates),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    """
+    Returns the schema version recorded in the database file.
+
+    :param conn: The open connection to the school database.
+    :type conn: sqlite3.Connection
+    :return: The value of ``PRAGMA user_version``; 0 for a database that was never migrated.
+    :rtype: int
+    """
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """
+    Brings the database up to ``SCHEMA_VERSION`` by applying the pending migrations in order.
+
+    All pending migrations run in one transaction together with the ``user_version`` bump, so a failed
+    migration leaves the database untouched at its previous version. Foreign key enforcement is switched
+    off while tables are rebuilt, checked before committing, and switched back on afterwards.
+
+    :param conn: The open connection to the school database.
+    :type conn: sqlite3.Connection
+    :raises sqlite3.IntegrityError: If a migration would leave foreign key violations behind.
+    :raises ValueError: If the database was created by a newer version of the application.
+    :return: The list of versions that were applied.
+    :rtype: list
+    """
+    current = schema_version(conn)
+    if current > SCHEMA_VERSION:
+        raise ValueError(f"Database schema version {current} is newer than this application ({SCHEMA_VERSION})")
+
+    pending = [(version, upgrade) for version, upgrade in MIGRATIONS if version > current]
+    if not pending:
+        return []
+
+    # PRAGMA foreign_keys is a no-op inside a transaction
+    conn.commit()
+    foreign_keys = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+    conn.execute("PRAGMA foreign_keys = OFF")
+
+    try:
+        conn.execute("BEGIN")
+        try:
+            for version, upgrade in pending:
+                upgrade(conn)
+            violations = conn.execute("PRAGMA foreign_key_check").fetchall()
+            if violations:
+                raise sqlite3.IntegrityError(f"Migration leaves foreign key violations: {violations[:5]}")
+            conn.execute(f"PRAGMA user_version = {pending[-1][0]}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    finally:
+        conn.execute(f"PRAGMA foreign_keys = {'ON' if foreign_keys else 'OFF'}")
+
+    return [version for version, _ in pending]
@@ -0,0 +1,167 @@
+import sqlite3
+
+# The trigram tokenizer gives substring semantics (like the old LIKE '%term%') and
+# ships with SQLite 3.34+. Older libraries fall back to word-prefix matching.
+TRIGRAM_SUPPORTED = sqlite3.sqlite_version_info >= (3, 34, 0)
+TOKENIZER = "trigram" if TRIGRAM_SUPPORTED else "unicode61"
+
+# Trigram queries need at least three characters to use the index
+MIN_INDEXED_TERM = 3 if TRIGRAM_SUPPORTED else 1
+
+# Default number of rows returned by a search
+SEARCH_LIMIT = 500
+
+# (record type, base table, id column, name column, age column, index table)
+SEARCHABLE_TABLES = (
+    ("Student", "students", "student_id", "name", "age", "students_fts"),
+    ("Instructor", "instructors", "instructor_id", "name", "age", "instructors_fts"),
+    ("Course", "courses", "course_id", "course_name", None, "courses_fts"),
+)
+
+
+def install_search(conn):
+    """
+    Creates the FTS5 index tables for students, instructors and courses together with the triggers
+    that keep them in sync with the base tables. Safe to call on every start-up; indexes that are
+    created for the first time are populated from the existing rows.
+
+    :param conn: The open connection to the school database.
+    :type conn: sqlite3.Connection
+    :raises sqlite3.Error: If the index tables or triggers cannot be created.
+    :return: None
+    :rtype: None
+    """
+    cursor = conn.cursor()
+
+    for _, table, id_column, name_column, _, fts_table in SEARCHABLE_TABLES:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (fts_table,))
+        fts_table_exists = cursor.fetchone()
+
+        if not fts_table_exists:
+            cursor.execute(f'''
+                CREATE VIRTUAL TABLE {fts_table} USING fts5(name, ident, tokenize='{TOKENIZER}')
+            ''')
+            # Index the rows that were added before the index existed
+            cursor.execute(f'''
+                INSERT INTO {fts_table} (rowid, name, ident)
+                SELECT {id_column}, {name_column}, CAST({id_column} AS TEXT) FROM {table}
+            ''')
+
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts_table} (rowid, name, ident)
+                VALUES (new.{id_column}, new.{name_column}, CAST(new.{id_column} AS TEXT));
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN
+                DELETE FROM {fts_table} WHERE rowid = old.{id_column};
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE ON {table} BEGIN
+                DELETE FROM {fts_table} WHERE rowid = old.{id_column};
+                INSERT INTO {fts_table} (rowid, name, ident)
+                VALUES (new.{id_column}, new.{name_column}, CAST(new.{id_column} AS TEXT));
+            END
+        ''')
+
+    conn.commit()
+
+
+def rebuild_search(conn):
+    """
+    Drops and recreates every search index from the base tables. Only needed if the index tables
+    were modified by hand or the base tables were changed with the triggers missing.
+
+    :param conn: The open connection to the school database.
+    :type conn: sqlite3.Connection
+    :return: None
+    :rtype: None
+    """
+    cursor = conn.cursor()
+    for _, _, _, _, _, fts_table in SEARCHABLE_TABLES:
+        cursor.execute(f"DROP TABLE IF EXISTS {fts_table}")
+    conn.commit()
+    install_search(conn)
+
+
+def match_expression(search_term):
+    """
+    Turns free text typed by the user into an FTS5 query. The whole term is searched as one quoted
+    phrase so that operators such as ``AND`` or ``*`` in the input are treated as plain text.
+
+    :param search_term: The text typed in the search box.
+    :type search_term: str
+    :return: The FTS5 MATCH expression.
+    :rtype: str
+    """
+    phrase = '"' + search_term.replace('"', '""') + '"'
+    if not TRIGRAM_SUPPORTED:
+        phrase += " *"
+    return phrase
+
+
+def search_records(conn, search_term="", limit=SEARCH_LIMIT, schemas=None):
+    """
+    Searches students, instructors and courses by name or ID and returns the best matches first.
+
+    Terms long enough for the index are answered from the FTS5 tables and ordered by bm25 rank.
+    An empty term lists records in ID order, and terms shorter than the trigram size fall back to a
+    LIKE scan that stops as soon as ``limit`` rows have been found.
+
+    :param conn: The open connection to the school database.
+    :type conn: sqlite3.Connection
+    :param search_term: The term used to filter the records, defaults to an empty string for no filter.
+    :type search_term: str, optional
+    :param limit: The maximum number of rows to return, defaults to ``SEARCH_LIMIT``.
+    :type limit: int, optional
+    :param schemas: Names of attached databases to search together in one statement, defaults to None
+        to search the connection's own tables.
+    :type schemas: list, optional
+    :return: Rows of ``(record type, name, age, id)``, best match first. When ``schemas`` is given, each
+        row starts with the name of the schema it was found in.
+    :rtype: list
+    """
+    search_term = search_term.strip()
+    cursor = conn.cursor()
+
+    # (leading column, table prefix) per searched database
+    sources = [("", "")] if schemas is None else [(f"'{schema}', ", f"{schema}.") for schema in schemas]
+
+    if not search_term:
+        selects = [
+            f"SELECT * FROM (SELECT {source}'{record_type}', {name_column}, {age_column or 'NULL'}, {id_column} "
+            f"FROM {prefix}{table} ORDER BY {id_column} LIMIT :limit)"
+            for source, prefix in sources
+            for record_type, table, id_column, name_column, age_column, _ in SEARCHABLE_TABLES
+        ]
+        cursor.execute(" UNION ALL ".join(selects) + " LIMIT :limit", {"limit": limit})
+        return cursor.fetchall()
+
+    if len(search_term) < MIN_INDEXED_TERM:
+        selects = [
+            f"SELECT * FROM (SELECT {source}'{record_type}', {name_column}, {age_column or 'NULL'}, {id_column} "
+            f"FROM {prefix}{table} WHERE LOWER({name_column}) LIKE :pattern OR CAST({id_column} AS TEXT) LIKE :pattern "
+            f"LIMIT :limit)"
+            for source, prefix in sources
+            for record_type, table, id_column, name_column, age_column, _ in SEARCHABLE_TABLES
+        ]
+        cursor.execute(
+            " UNION ALL ".join(selects) + " LIMIT :limit",
+            {"pattern": "%" + search_term.lower() + "%", "limit": limit},
+        )
+        return cursor.fetchall()
+
+    selects = [
+        f"SELECT * FROM (SELECT {source}'{record_type}', t.{name_column}, {'t.' + age_column if age_column else 'NULL'}, "
+        f"t.{id_column}, f.rank AS rank FROM {prefix}{fts_table} f JOIN {prefix}{table} t ON t.{id_column} = f.rowid "
+        f"WHERE {fts_table} MATCH :query ORDER BY f.rank LIMIT :limit)"
+        for source, prefix in sources
+        for record_type, table, id_column, name_column, age_column, fts_table in SEARCHABLE_TABLES
+    ]
+    cursor.execute(
+        " UNION ALL ".join(selects) + " ORDER BY rank LIMIT :limit",
+        {"query": match_expression(search_term), "limit": limit},
+    )
+    return [row[:-1] for row in cursor.fetchall()]
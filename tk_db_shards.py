@@ -0,0 +1,255 @@
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+
+from tk_db_backup import BACKUP_DIR, BackupManager
+from tk_db_repository import Repository, connect
+from tk_db_schema import migrate
+from tk_db_search import SEARCH_LIMIT, install_search, search_records
+from tk_db_writer import BUSY_TIMEOUT
+
+# Directory holding one database file per shard
+SHARD_DIR = 'shards'
+SHARD_SUFFIX = '.db'
+
+# SQLite refuses to attach more databases than this to one connection (SQLITE_MAX_ATTACHED)
+MAX_ATTACHED = 10
+
+# Shard keys become file names, so only plain names such as "2024-fall" or "engineering" are allowed
+_SHARD_KEY = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]*$")
+
+# Per-shard statements run on an attached copy; {schema} is replaced by the attachment name
+SELECT_COUNTS = """
+    SELECT (SELECT COUNT(*) FROM {schema}.students), (SELECT COUNT(*) FROM {schema}.instructors),
+           (SELECT COUNT(*) FROM {schema}.courses), (SELECT COUNT(*) FROM {schema}.enrollments)
+"""
+SELECT_COURSE_REPORT = """
+    SELECT c.course_id, c.course_name, s.student_count, s.age_sum, s.age_count
+    FROM {schema}.course_stats s JOIN {schema}.courses c ON c.course_id = s.course_id
+"""
+SELECT_INSTRUCTOR_REPORT = """
+    SELECT i.instructor_id, i.name, l.course_count
+    FROM {schema}.instructor_load l JOIN {schema}.instructors i ON i.instructor_id = l.instructor_id
+"""
+
+
+class ShardRouter:
+    """
+    Splits the school data across one SQLite file per shard key, typically a term ("2024-fall") or a
+    department. Every shard has the complete tk_db schema, so the repository, migrations, search index
+    and summary tables work on each file unchanged, and old terms no longer slow down queries or
+    backups of the current one.
+
+    Writes are routed to the shard's own connection through ``repository``. Searches and reports fan
+    out: the shards are attached read-only to a scratch connection, at most ``MAX_ATTACHED`` at a
+    time, queried with one ``UNION ALL`` statement per group, and the results are merged.
+
+    Records are identified by ``(shard key, record ID)``; the same ID may exist in several shards.
+
+    :param directory: Directory holding the shard files, defaults to ``SHARD_DIR``.
+    :type directory: str, optional
+    :param busy_timeout: Busy timeout of the shard connections in seconds, defaults to ``BUSY_TIMEOUT``.
+    :type busy_timeout: float, optional
+    """
+    def __init__(self, directory=SHARD_DIR, busy_timeout=BUSY_TIMEOUT):
+        """
+        Initialize a new ShardRouter for the shard files in ``directory``.
+        """
+        self.directory = directory
+        self.busy_timeout = busy_timeout
+        self._repositories = {}
+
+    def path(self, key):
+        """
+        Returns the file of a shard.
+
+        :param key: The shard key.
+        :type key: str
+        :raises ValueError: If the key is not a plain name.
+        :return: Path of the shard's database file.
+        :rtype: str
+        """
+        if not _SHARD_KEY.match(key):
+            raise ValueError(f"Invalid shard key: {key!r}")
+        return os.path.join(self.directory, key + SHARD_SUFFIX)
+
+    def keys(self):
+        """
+        Lists the existing shards.
+
+        :return: The shard keys, in sorted order.
+        :rtype: list
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            name[:-len(SHARD_SUFFIX)] for name in os.listdir(self.directory)
+            if name.endswith(SHARD_SUFFIX) and _SHARD_KEY.match(name[:-len(SHARD_SUFFIX)])
+        )
+
+    def repository(self, key, create=False):
+        """
+        Returns the repository that writes to one shard. The shard's connection is opened, migrated and
+        indexed on first use and then kept open.
+
+        :param key: The shard key.
+        :type key: str
+        :param create: Create the shard if it does not exist yet, defaults to False.
+        :type create: bool, optional
+        :raises KeyError: If the shard does not exist and ``create`` is False.
+        :return: The shard's repository.
+        :rtype: Repository
+        """
+        repo = self._repositories.get(key)
+        if repo is not None:
+            return repo
+
+        path = self.path(key)
+        if not os.path.exists(path):
+            if not create:
+                raise KeyError(f"No such shard: {key}")
+            os.makedirs(self.directory, exist_ok=True)
+
+        conn = connect(path, timeout=self.busy_timeout)
+        migrate(conn)
+        install_search(conn)
+        repo = self._repositories[key] = Repository(conn)
+        return repo
+
+    def close(self):
+        """
+        Closes the connections opened by ``repository``.
+
+        :return: None
+        :rtype: None
+        """
+        for repo in self._repositories.values():
+            repo.conn.close()
+        self._repositories.clear()
+
+    def backup_manager(self, key, backup_dir=BACKUP_DIR):
+        """
+        Returns a backup manager for one shard. Each shard keeps its own rotated backups in a
+        subdirectory named after its key, so a small current term can be backed up often without
+        copying the older ones.
+
+        :param key: The shard key.
+        :type key: str
+        :param backup_dir: Directory holding the per-shard backup directories, defaults to ``BACKUP_DIR``.
+        :type backup_dir: str, optional
+        :return: The shard's backup manager.
+        :rtype: BackupManager
+        """
+        return BackupManager(self.path(key), backup_dir=os.path.join(backup_dir, key))
+
+    @contextmanager
+    def attached(self, keys):
+        """
+        Attaches up to ``MAX_ATTACHED`` shards read-only to a scratch connection.
+
+        :param keys: The shards to attach.
+        :type keys: list
+        :raises ValueError: If more than ``MAX_ATTACHED`` shards are given.
+        :return: The connection and a mapping of attachment name to shard key.
+        :rtype: tuple
+        """
+        if len(keys) > MAX_ATTACHED:
+            raise ValueError(f"At most {MAX_ATTACHED} shards can be attached at once")
+
+        conn = sqlite3.connect(":memory:", uri=True, timeout=self.busy_timeout)
+        try:
+            schemas = {}
+            for i, key in enumerate(keys):
+                schema = f"shard{i}"
+                path = os.path.abspath(self.path(key))
+                conn.execute("ATTACH DATABASE ? AS " + schema, (f"file:{path}?mode=ro",))
+                schemas[schema] = key
+            yield conn, schemas
+        finally:
+            conn.close()
+
+    def _groups(self, keys):
+        keys = self.keys() if keys is None else list(keys)
+        for start in range(0, len(keys), MAX_ATTACHED):
+            yield keys[start:start + MAX_ATTACHED]
+
+    def fan_out(self, select, params=(), keys=None):
+        """
+        Runs a statement on every shard and yields the rows, each prefixed with its shard key.
+
+        :param select: A SELECT whose table names are written as ``{schema}.table``.
+        :type select: str
+        :param params: The statement's parameters, shared by every shard, defaults to none.
+        :type params: tuple, optional
+        :param keys: The shards to query, defaults to all of them.
+        :type keys: list, optional
+        :return: Rows of ``(shard key, *row)``.
+        :rtype: generator
+        """
+        for group in self._groups(keys):
+            with self.attached(group) as (conn, schemas):
+                # The same parameters are repeated for every shard in the UNION ALL
+                statement = " UNION ALL ".join(
+                    f"SELECT '{schema}', * FROM ({select.format(schema=schema)})" for schema in schemas
+                )
+                for row in conn.execute(statement, tuple(params) * len(schemas)):
+                    yield (schemas[row[0]],) + row[1:]
+
+    def search(self, search_term="", limit=SEARCH_LIMIT, keys=None):
+        """
+        Searches every shard with ``tk_db_search.search_records``. Shards attached together are ranked
+        as one result set; further groups of shards only fill the rows left under ``limit``.
+
+        :param search_term: The term used to filter the records, defaults to an empty string for no filter.
+        :type search_term: str, optional
+        :param limit: The maximum number of rows to return, defaults to ``SEARCH_LIMIT``.
+        :type limit: int, optional
+        :param keys: The shards to search, in order of preference, defaults to all of them.
+        :type keys: list, optional
+        :return: Rows of ``(shard key, record type, name, age, id)``.
+        :rtype: list
+        """
+        rows = []
+        for group in self._groups(keys):
+            if len(rows) >= limit:
+                break
+            with self.attached(group) as (conn, schemas):
+                found = search_records(conn, search_term, limit - len(rows), schemas=list(schemas))
+                rows.extend((schemas[row[0]],) + row[1:] for row in found)
+        return rows
+
+    def counts(self, keys=None):
+        """
+        :return: Row counts of every table summed over the shards.
+        :rtype: dict
+        """
+        totals = {"students": 0, "instructors": 0, "courses": 0, "enrollments": 0}
+        for _, *counts in self.fan_out(SELECT_COUNTS, keys=keys):
+            for table, count in zip(totals, counts):
+                totals[table] += count
+        return totals
+
+    def course_report(self, keys=None):
+        """
+        :return: Rows of ``(shard key, course_id, course_name, student_count, average_age)``, most
+            students first; courses of different shards are listed separately.
+        :rtype: list
+        """
+        rows = [
+            (key, course_id, course_name, student_count, round(age_sum / age_count, 1) if age_count else None)
+            for key, course_id, course_name, student_count, age_sum, age_count
+            in self.fan_out(SELECT_COURSE_REPORT, keys=keys)
+        ]
+        rows.sort(key=lambda row: (-row[3], row[2] or ""))
+        return rows
+
+    def instructor_report(self, keys=None):
+        """
+        :return: Rows of ``(shard key, instructor_id, name, course_count)``, most courses first;
+            instructors of different shards are listed separately, even when they share an ID.
+        :rtype: list
+        """
+        rows = list(self.fan_out(SELECT_INSTRUCTOR_REPORT, keys=keys))
+        rows.sort(key=lambda row: (-row[3], row[2] or ""))
+        return rows
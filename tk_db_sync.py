@@ -0,0 +1,156 @@
+import json
+
+# How often each window polls for changes made by other instances
+POLL_INTERVAL_MS = 1000
+
+# Most changes fetched per poll; a longer backlog is drained over the following polls
+POLL_BATCH = 5000
+
+# Change log entries kept by prune_change_log
+CHANGE_LOG_KEEP = 100000
+
+# Record type shown in the Treeview for each logged table
+RECORD_TYPES = {"students": "Student", "instructors": "Instructor", "courses": "Course"}
+
+SELECT_CHANGES = "SELECT seq, table_name, row_id, op FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?"
+# AUTOINCREMENT records the last sequence number handed out, even once those entries are pruned
+SELECT_LATEST_SEQ = "SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'change_log'), 0)"
+SELECT_SEQ_RANGE = (
+    "SELECT MIN(seq), COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'change_log'), 0) FROM change_log"
+)
+
+# Current display values of changed rows, fetched in one statement per table
+SELECT_CHANGED_ROWS = {
+    "students": "SELECT student_id, name, age FROM students WHERE student_id IN (SELECT value FROM json_each(?))",
+    "instructors": "SELECT instructor_id, name, age FROM instructors WHERE instructor_id IN (SELECT value FROM json_each(?))",
+    "courses": "SELECT course_id, course_name, NULL FROM courses WHERE course_id IN (SELECT value FROM json_each(?))",
+}
+
+
+def record_iid(record_type, record_id):
+    """
+    Returns the Treeview item ID of a record, so that a change can find the row that shows it.
+
+    :param record_type: "Student", "Instructor" or "Course".
+    :type record_type: str
+    :param record_id: The record's ID.
+    :type record_id: int
+    :return: The item ID, for example ``"Student:12"``.
+    :rtype: str
+    """
+    return f"{record_type}:{record_id}"
+
+
+def prune_change_log(conn, keep=CHANGE_LOG_KEEP):
+    """
+    Deletes all but the newest ``keep`` change log entries. Instances that fall further behind than
+    this notice the gap on their next poll and reload everything.
+
+    :param conn: The open connection to the school database.
+    :type conn: sqlite3.Connection
+    :param keep: Number of entries to keep, defaults to ``CHANGE_LOG_KEEP``.
+    :type keep: int, optional
+    :return: Number of entries deleted.
+    :rtype: int
+    """
+    cursor = conn.execute("DELETE FROM change_log WHERE seq <= (SELECT MAX(seq) FROM change_log) - ?", (keep,))
+    conn.commit()
+    return cursor.rowcount
+
+
+class ChangeFeed:
+    """
+    Reads the changes other connections committed to the database since the last poll.
+
+    ``PRAGMA data_version`` changes only when another connection commits, so a poll with nothing new
+    costs a single pragma and never touches the change log.
+
+    :param conn: The open connection to the school database.
+    :type conn: sqlite3.Connection
+    :param batch_size: Most changes returned per poll, defaults to ``POLL_BATCH``.
+    :type batch_size: int, optional
+    """
+    def __init__(self, conn, batch_size=POLL_BATCH):
+        """
+        Initialize a new ChangeFeed that starts after the newest change currently logged.
+        """
+        self.conn = conn
+        self.batch_size = batch_size
+        self.last_seen = 0
+        self._data_version = None
+        self.skip_to_latest()
+
+    def skip_to_latest(self):
+        """
+        Marks every change logged so far as seen, typically right after a full reload.
+
+        :return: None
+        :rtype: None
+        """
+        self._data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        self.last_seen = self.conn.execute(SELECT_LATEST_SEQ).fetchone()[0]
+
+    def poll(self):
+        """
+        Returns the changes logged since the previous poll, at most ``batch_size`` of them.
+
+        :return: Tuples of ``(seq, table_name, row_id, op)`` in commit order, or None if entries the
+            feed had not seen yet were pruned, or the change log was replaced by an older one from a
+            restore, and the caller has to reload everything.
+        :rtype: list
+        """
+        data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return []
+
+        # Sequence numbers have no holes, so a later oldest entry means unseen ones were pruned, and
+        # a latest entry before the feed's position means the log was rolled back by a restore
+        oldest, latest = self.conn.execute(SELECT_SEQ_RANGE).fetchone()
+        if (oldest is not None and oldest > self.last_seen + 1) or latest < self.last_seen:
+            self.skip_to_latest()
+            return None
+
+        changes = self.conn.execute(SELECT_CHANGES, (self.last_seen, self.batch_size)).fetchall()
+        if changes:
+            self.last_seen = changes[-1][0]
+        if len(changes) < self.batch_size:
+            # Caught up; the next poll can rely on data_version again
+            self._data_version = data_version
+        return changes
+
+
+def compact_changes(changes):
+    """
+    Reduces a list of changes to the latest operation per row.
+
+    :param changes: Tuples of ``(seq, table_name, row_id, op)`` in commit order.
+    :type changes: list
+    :return: Mapping of table name to ``{row_id: op}``.
+    :rtype: dict
+    """
+    latest = {}
+    for _, table_name, row_id, op in changes:
+        rows = latest.setdefault(table_name, {})
+        if op == 'U' and rows.get(row_id) == 'I':
+            # Still new to this reader
+            continue
+        rows[row_id] = op
+    return latest
+
+
+def changed_rows(conn, table_name, row_ids):
+    """
+    Fetches the current display values of the given rows of a record table.
+
+    :param conn: The open connection to the school database.
+    :type conn: sqlite3.Connection
+    :param table_name: "students", "instructors" or "courses".
+    :type table_name: str
+    :param row_ids: IDs of the rows to fetch.
+    :type row_ids: iterable
+    :return: Mapping of row ID to ``(record type, name, age, id)``.
+    :rtype: dict
+    """
+    record_type = RECORD_TYPES[table_name]
+    cursor = conn.execute(SELECT_CHANGED_ROWS[table_name], (json.dumps(list(row_ids)),))
+    return {row[0]: (record_type, row[1], row[2], row[0]) for row in cursor}
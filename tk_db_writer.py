@@ -0,0 +1,213 @@
+import queue
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from tk_db_repository import Repository, connect
+
+# Seconds SQLite's busy handler waits for another connection's lock before giving up
+BUSY_TIMEOUT = 5.0
+
+# Retries of a write that still failed with "database is locked"
+RETRY_ATTEMPTS = 5
+RETRY_BASE_DELAY = 0.05
+RETRY_MAX_DELAY = 2.0
+
+# Most queued writes committed together by the writer thread
+WRITE_BATCH = 200
+
+
+def is_lock_error(error):
+    """
+    Tells whether an error means another connection held the lock, so the write may succeed if retried.
+
+    :param error: The error raised by sqlite3.
+    :type error: Exception
+    :return: True for "database is locked" and "database is busy" errors.
+    :rtype: bool
+    """
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+def backoff_delay(attempt, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY):
+    """
+    Returns a random delay between 0 and an exponentially growing cap ("full jitter"), so that
+    instances that collided once do not retry in lock step.
+
+    :param attempt: Number of failed attempts so far, starting at 0.
+    :type attempt: int
+    :return: Seconds to wait before the next attempt.
+    :rtype: float
+    """
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def retry_on_lock(operation, conn=None, attempts=RETRY_ATTEMPTS, base_delay=RETRY_BASE_DELAY,
+                  max_delay=RETRY_MAX_DELAY, on_retry=None):
+    """
+    Runs a write, retrying it with jittered exponential backoff while the database is locked.
+
+    The busy timeout already makes SQLite wait for a lock, but some conflicts (such as two deferred
+    transactions that both want to write) are reported at once, and a commit can still time out under
+    heavy load. If ``conn`` is given, its failed transaction is rolled back before each retry so the
+    operation starts again from a clean state; only pass it when the operation is the whole transaction.
+
+    :param operation: The write to run; called without arguments.
+    :type operation: callable
+    :param conn: The connection whose transaction is rolled back between attempts, defaults to None.
+    :type conn: sqlite3.Connection, optional
+    :param attempts: Number of attempts before giving up, defaults to ``RETRY_ATTEMPTS``.
+    :type attempts: int, optional
+    :param on_retry: Called with ``(attempt, error)`` before each retry, defaults to None.
+    :type on_retry: callable, optional
+    :raises sqlite3.OperationalError: If the database is still locked after the last attempt.
+    :return: Whatever ``operation`` returns.
+    """
+    for attempt in range(attempts):
+        try:
+            return operation()
+        except sqlite3.OperationalError as e:
+            if not is_lock_error(e) or attempt == attempts - 1:
+                raise
+            if conn is not None and conn.in_transaction:
+                conn.rollback()
+            if on_retry:
+                on_retry(attempt, e)
+            time.sleep(backoff_delay(attempt, base_delay, max_delay))
+
+
+class _Job:
+    def __init__(self, operation):
+        self.operation = operation
+        self.future = Future()
+
+
+class WriteQueue:
+    """
+    Serializes the writes of one process through a single writer thread with its own connection.
+
+    Jobs submitted from any thread are taken off the queue in batches of up to ``batch_size`` and
+    committed in one ``BEGIN IMMEDIATE`` transaction, so the process takes the write lock once per
+    batch instead of once per click. Every job runs in its own savepoint: a job that raises is rolled
+    back on its own and the rest of the batch still commits. If the batch hits a lock error, the
+    whole batch is rolled back and retried with backoff.
+
+    :param db_path: Path of the database file.
+    :type db_path: str
+    :param batch_size: Most jobs committed together, defaults to ``WRITE_BATCH``.
+    :type batch_size: int, optional
+    :param busy_timeout: Busy timeout of the writer connection in seconds, defaults to ``BUSY_TIMEOUT``.
+    :type busy_timeout: float, optional
+    :param attempts: Attempts per batch before its jobs fail with the lock error, defaults to ``RETRY_ATTEMPTS``.
+    :type attempts: int, optional
+    """
+    def __init__(self, db_path, batch_size=WRITE_BATCH, busy_timeout=BUSY_TIMEOUT, attempts=RETRY_ATTEMPTS):
+        """
+        Initialize a new WriteQueue and start its writer thread.
+        """
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.busy_timeout = busy_timeout
+        self.attempts = attempts
+        self.lock_errors = 0
+        self.batches = 0
+        self._jobs = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, operation):
+        """
+        Queues a write. The operation is called on the writer thread with a ``Repository`` bound to the
+        writer's connection, inside the batch transaction; it must not commit.
+
+        :param operation: The write, for example ``lambda repo: repo.add_student(1, "Ann", 20, "ann@aub.edu")``.
+        :type operation: callable
+        :raises RuntimeError: If the queue was closed.
+        :return: A future that receives the operation's return value once the batch is committed.
+        :rtype: concurrent.futures.Future
+        """
+        if self._closed:
+            raise RuntimeError("The write queue is closed")
+        job = _Job(operation)
+        self._jobs.put(job)
+        return job.future
+
+    def close(self, wait=True):
+        """
+        Stops accepting writes, lets the writer finish the queued ones and closes its connection.
+
+        :param wait: Block until the writer thread has finished, defaults to True.
+        :type wait: bool, optional
+        :return: None
+        :rtype: None
+        """
+        self._closed = True
+        self._jobs.put(None)
+        if wait:
+            self._thread.join()
+
+    def _run(self):
+        conn = connect(self.db_path, timeout=self.busy_timeout, check_same_thread=False)
+        repo = Repository(conn)
+        try:
+            while True:
+                batch = [self._jobs.get()]
+                while batch[-1] is not None and len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._jobs.get_nowait())
+                    except queue.Empty:
+                        break
+
+                stop = batch[-1] is None
+                jobs = [job for job in batch if job is not None]
+                if jobs:
+                    self._commit_batch(conn, repo, jobs)
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _commit_batch(self, conn, repo, jobs):
+        for attempt in range(self.attempts):
+            outcomes = []
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                with repo.unit_of_work():
+                    for job in jobs:
+                        conn.execute("SAVEPOINT job")
+                        try:
+                            outcomes.append((job, job.operation(repo), None))
+                        except Exception as e:
+                            conn.execute("ROLLBACK TO job")
+                            if is_lock_error(e):
+                                raise
+                            outcomes.append((job, None, e))
+                        conn.execute("RELEASE job")
+            except sqlite3.OperationalError as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                if not is_lock_error(e):
+                    for job in jobs:
+                        job.future.set_exception(e)
+                    return
+                self.lock_errors += 1
+                if attempt == self.attempts - 1:
+                    for job in jobs:
+                        job.future.set_exception(e)
+                    return
+                time.sleep(backoff_delay(attempt))
+                continue
+
+            self.batches += 1
+            for job, result, error in outcomes:
+                if error is not None:
+                    job.future.set_exception(error)
+                else:
+                    job.future.set_result(result)
+            return